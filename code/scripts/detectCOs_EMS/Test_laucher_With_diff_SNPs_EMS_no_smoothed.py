@@ -118,7 +118,9 @@ else:
         prefix_chr=config['prefix_chr'],
         geno_ref=config['genotype_ref'], 
         geno_alt=config['genotype_alt'],
-        analyze_id=config['analyze_id']
+        analyze_id=config['analyze_id'],
+        snps_log=config.get('snps_log', True),
+        compress_log=config.get('compress_snps_log', False)
         )
 
 print("\noffspring_snps[chr_pos] = [chr, pos,GT, ADref,ADalt, genotype]")
@@ -521,66 +523,13 @@ print("\n# STEP 9.bis. Precise COs")
 print("-------------------------------------")
 
 
-preciseCOs = OrderedDict()
-db_co_new = OrderedDict()
-
-for i in range (len(list(updated_candidates_co.keys()))):
-    start_co=updated_candidates_co[list(updated_candidates_co.keys())[i]][1] 
-    end_co=updated_candidates_co[list(updated_candidates_co.keys())[i]][2] 
-    chr = list(updated_candidates_co.keys())[i].split("_")[0]
-    before =OrderedDict()
-    after = OrderedDict()
-    
-    for key, snp_info in offspring_genotype_window_normalized.items():
-        candidate = key
-        chromosome = candidate.split("_")[0]
-        index = candidate.split("_")[1]
-        start,	stop, ratio_ADref, ratio_ADalt, genotype = snp_info
-
-        
-        if start < start_co and chromosome == chr and genotype != 'NA' :
-            before[candidate] = snp_info
-        if stop > end_co and chromosome == chr and genotype != 'NA' :
-            after[candidate] = snp_info
-    before = dict(list(before.items())[-3:])
-    after = dict(list(after.items())[:3])
-
-
-    start_co_2=before[list(before.keys())[0]][0]
-    if len(list(after.keys()))>2:
-        end_co_2= after[list(after.keys())[2]][1]
-    elif len(list(after.keys())) == 0:
-        end_co_2 = end_co
-    elif len(list(after.keys())) == 2:
-        end_co_2 = after[list(after.keys())[1]][1]
-    else:
-        end_co_2= after[list(after.keys())[0]][1]
-
-    new_offspring_genotype_window = OrderedDict()
-    for cle, valeur in offspring_genotype_window_normalized_new.items():
-        if valeur[0] >= start_co_2 + 1 and valeur[1] <= end_co_2 and cle.split("_")[0] == chr:
-            new_offspring_genotype_window[cle] = valeur
-            print(cle, valeur)
-    
-    start_window = int(list(new_offspring_genotype_window.keys())[0].split("_")[1])
-    end_window = int(list(new_offspring_genotype_window.keys())[-1].split("_")[1])
-    print(start_window, end_window)
-
-
-    candidates_co_2, db_co_2 = PreciseCOs_snps(new_offspring_genotype_window, start_window=start_window, end_window=end_window)
-    
-    if candidates_co_2 :
-        candidates_co_2 = candidates_co_2
-    else:
-        start_co=updated_candidates_co[list(updated_candidates_co.keys())[i]][1] 
-        end_co=updated_candidates_co[list(updated_candidates_co.keys())[i]][2]
-        pre_geno=updated_candidates_co[list(updated_candidates_co.keys())[i]][4]
-        cur_geno=updated_candidates_co[list(updated_candidates_co.keys())[i]][5]
-        cur_chr = list(updated_candidates_co.keys())[i].split("_")[0]
-        key = cur_chr + "_" + str(round((start_window + end_window) / 2, 1))
-        candidates_co_2[key] = [str(start_window) + ":" + str(end_window), start_co, end_co, pre_geno, cur_geno]
-    preciseCOs.update(candidates_co_2)
-    db_co_new.update(db_co_2)
+# the 3 informative windows on each side of each candidate CO are found with
+# an index of the windows (InformativeWindowIndex), see PreciseCOsEMS()
+preciseCOs, db_co_new = PreciseCOsEMS(
+    candidates_co=updated_candidates_co,
+    offspring_genotype_window=offspring_genotype_window_normalized,
+    offspring_genotype_window_new=offspring_genotype_window_normalized_new
+    )
 
 
 updated_preciseCOs = OrderedDict() # modify MY
@@ -0,0 +1,97 @@
+import os, sys, json
+import yaml
+
+from detectCOs_read_files_EMS import *
+from collections import OrderedDict
+
+#==============================================================================
+# Program		:	Catalog of the EMS mutations of the parental lines
+# Author		:	Mohamad Yassine [mohamad.yassine@inrae.fr]
+# Version		:	2.0
+#==============================================================================
+
+# Usage: python3 path/to/folder/detectCOs_ems_catalog.py build config_detectCOs.yaml
+#        python3 path/to/folder/detectCOs_ems_catalog.py info config_detectCOs.yaml
+#
+# build:    read the vcf of each EMS line of ems_lines (config file), keep the
+#           mutations in the allele frequency window [ems_min_freq,
+#           ems_max_freq] (default: 0.15-0.35) and the depth window
+#           [ems_min_depth, ems_max_depth] (default: no window), remove the
+#           mutations shared by several lines and save the catalog in
+#           ems_catalog_dir (see BuildEMSCatalog()). The directory
+#           ems_catalog_dir/line_name/ replaces the vcf of the EMS mutations
+#           of the line in ReadRecombinedOffspringVCF(), the catalog is
+#           built again when the vcf of a line changes (see UpdateEMSCatalog()).
+# info:     print the number of mutations of each line of the catalog
+
+SUBCOMMANDS = ["build", "info"]
+
+
+###############################################################################
+
+def CatalogDir(config:dict):
+    """
+    Description:    directory of the EMS catalog of the config file
+    """
+    return os.path.join(config['path_to_polyrec_project'], config['ems_catalog_dir'], "")
+
+#==============================================================================
+
+def BuildCatalog(config:dict):
+    """
+    Description:    run BuildEMSCatalog() with the parameters of the config file
+    Input:
+    - config:       config file of the launcher
+    Output:
+    - catalog, see BuildEMSCatalog()
+    """
+    return BuildEMSCatalog(
+        ems_lines=OrderedDict(config['ems_lines']),
+        catalog_dir=CatalogDir(config),
+        prefix_chr=config['prefix_chr'],
+        min_freq=config.get('ems_min_freq', 0.15),
+        max_freq=config.get('ems_max_freq', 0.35),
+        min_depth=config.get('ems_min_depth', 0),
+        max_depth=config.get('ems_max_depth', None)
+        )
+
+#==============================================================================
+
+def PrintCatalog(catalog:dict):
+    """
+    Description:    print the filters and the number of mutations of each line
+    Input:
+    - catalog:      content of catalog.json, see BuildEMSCatalog()
+    """
+    print("filters: " + ", ".join(key + "=" + str(value) for key, value in catalog['filters'].items()))
+    print("line\tnb_filtered\tnb_shared\tnb_mutations\tindex_dir")
+    for line_name, line in catalog['lines'].items():
+        print("\t".join([line_name, str(line['nb_filtered']), str(line['nb_shared']), \
+            str(line['nb_mutations']), line['index_dir']]))
+
+
+###############################################################################
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 3 or sys.argv[1] not in SUBCOMMANDS:
+        raise ImportError("Please give the subcommand (" + " or ".join(SUBCOMMANDS) + \
+            ") and the config file (.yaml) for detectCOs")
+
+    subcommand = sys.argv[1]
+    config_file = sys.argv[2]
+    with open(config_file, "r") as cf:
+        config = yaml.load(cf, Loader=yaml.FullLoader)
+
+    # Set current working directory at the root of polyrec project
+    os.chdir(config['path_to_polyrec_project'])
+
+    if subcommand == "build":
+        catalog = BuildCatalog(config)
+    else:
+        CheckInput(CatalogDir(config) + "catalog.json")
+        with open(CatalogDir(config) + "catalog.json") as input_catalog:
+            catalog = json.load(input_catalog)
+
+    print()
+    PrintCatalog(catalog)
@@ -14,9 +14,13 @@
 
 
 
-import hues
+import hues, os, sys
+import numpy as np
 from collections import OrderedDict
 from detectCOs_required_functions_EMS import *
+# detectCOs_genotype_track.py is shared by detectCOs_classic and detectCOs_EMS
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detectCOs_genotype_track import GenotypeTrack
 
 #==============================================================================
 
@@ -37,13 +41,37 @@ def log(message):
     logger.info(message)
 """
 
+def GenotypeWindowsByNum(offspring_genotype_window_smoothed, cur_chr:str, nb_win:int):
+	"""
+	Description:	borders and genotypes of the windows 1 to nb_win of cur_chr
+	Input:
+	- offspring_genotype_window_smoothed:	[chr_window] = [start, stop, ADref/DP, 
+						ADalt/DP, genotype] or GenotypeTrack of these windows
+	Output:
+	- starts, stops, genos:	dictionnaries, [num_win] = start, stop and 
+						genotype of the window num_win
+	"""
+	nums = range(1, nb_win + 1)
+	if isinstance(offspring_genotype_window_smoothed, GenotypeTrack):
+		starts, stops, codes, names = offspring_genotype_window_smoothed.window_arrays(cur_chr, 1, nb_win)
+		return dict(zip(nums, starts)), dict(zip(nums, stops)), \
+			dict(zip(nums, (names[code] for code in codes.tolist())))
+
+	windows = [offspring_genotype_window_smoothed[cur_chr + "_" + str(num_win)] for num_win in nums]
+	return dict(zip(nums, (window[0] for window in windows))), \
+		dict(zip(nums, (window[1] for window in windows))), \
+		dict(zip(nums, (window[4] for window in windows)))
+
+#==============================================================================
+
 def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr): 
 	"""
 	Description:	Find location of hypothetical cross-over according to the change of genotype
 	
 	Input:			- offspring_genotype_window_smoothed: Ordered dictionnary 
-					from SmoothNormalizedOsffspringSlidingWindow containing :
-					[chr_window] = [start, stop, ADref/DP, ADalt/DP, probHomoRef, probHetero, probHomoAlt, genotype]
+					from SmoothNormalizedOsffspringSlidingWindowsnps containing :
+					[chr_window] = [start, stop, ADref/DP, ADalt/DP, genotype]
+					or the GenotypeTrack of these windows
 					
 					- nb_windows_chr:	number of window per chromosome, determine with function
 					NormalizeOffspringSlidingWindow()
@@ -75,6 +103,10 @@ def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr):
 	for cur_chr, nb_win in nb_windows_chr.items(): ## iteration on each chromosome
 		#log(f"\nProcessing chromosome: {cur_chr} with {nb_win} windows.")
 		nb_win = int(nb_win)
+		if nb_win < 2:
+			continue
+		# [num_win] = start, stop and genotype of the window num_win
+		starts, stops, genos = GenotypeWindowsByNum(offspring_genotype_window_smoothed, cur_chr, nb_win)
 
 		# information about the window num_win
 		cur_support = 1 # number of window that support current genotype
@@ -96,12 +128,10 @@ def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr):
 			#log(f"\nAnalyzing window {num_win}/{nb_win} on chromosome {cur_chr}.")
 			# Define genotype for window start and stop
 			start_win = num_win # from 1 to the penultimate num_win (due to range function)
-			key_start = cur_chr + "_" + str(start_win)
-			geno_start = offspring_genotype_window_smoothed[key_start][4]
+			geno_start = genos[start_win]
 
 			stop_win = num_win + 1 # from 2 to the last num_win
-			key_stop = cur_chr + "_" + str(stop_win)
-			geno_stop = offspring_genotype_window_smoothed[key_stop][4]
+			geno_stop = genos[stop_win]
 			## Edit the thr_support = min number of window to validate a COs
 			# Handling the first 6 windows
 			if start_win <= 6:
@@ -109,7 +139,7 @@ def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr):
 				if stop_win == 7 and geno_stop == geno_start != "NA":
 					thr_support = 5  # Case where start and stop genotypes are the same and not "NA"
 				# Handling the first 3 windows
-				if start_win == 4 and geno_start == offspring_genotype_window_smoothed[cur_chr + "_" + str(3)][4] != "NA":
+				if start_win == 4 and geno_start == genos[3] != "NA":
 					thr_support = 1
 				elif start_win <= 3:
 					thr_support = 1  # cases in the first 3 windows
@@ -119,12 +149,12 @@ def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr):
 			# Handling the last 6 windows
 			elif start_win >= (nb_win - 6):
 				# Specific case where the current window is at least (nb_win-6) but not the penultimate
-				if start_win >= (nb_win - 6) and start_win <= (nb_win - 2) and geno_stop == geno_start == offspring_genotype_window_smoothed[cur_chr + "_" + str(nb_win - 6)][4] != "NA":
+				if start_win >= (nb_win - 6) and start_win <= (nb_win - 2) and geno_stop == geno_start == genos[nb_win - 6] != "NA":
 					thr_support = 5  # Start and stop genotypes of the window are identical, matching a previously smoothed value, not "NA"
 				elif start_win == (nb_win - 6) and geno_stop != geno_start != "NA":
 					thr_support = 5  # Specific to the (nb_win - 6) window with differing start and stop genotypes and not "NA"
 				elif start_win >= (nb_win - 3):
-					if start_win == (nb_win - 3) and offspring_genotype_window_smoothed[cur_chr + "_" + str(nb_win - 2)][4] == offspring_genotype_window_smoothed[cur_chr + "_" + str(nb_win - 3)][4] != "NA":
+					if start_win == (nb_win - 3) and genos[nb_win - 2] == genos[nb_win - 3] != "NA":
 						thr_support = 2
 					else:
 						thr_support = 1  # The last three windows with differing end genotypes from the previous smoothing and not "NA"
@@ -172,11 +202,9 @@ def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr):
 							cur_geno = geno_stop
 							stop_co_win = cur_win - cur_support - count_NA + 1 
 							
-							co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-							offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
+							co_start = int((starts[pre_win] + stops[pre_win]) / 2)
 
-							co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-		    				offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
+							co_stop = int((starts[stop_co_win] + stops[stop_co_win]) / 2)
 
 							key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
 							#log(f"key {key} supported by {cur_support} in candidateCO.")
@@ -237,11 +265,9 @@ def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr):
 					else : 
 						stop_co_win = cur_win - cur_support + 1
 
-					co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-						offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
+					co_start = int((starts[pre_win] + stops[pre_win]) / 2)
 
-					co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-		    			offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
+					co_stop = int((starts[stop_co_win] + stops[stop_co_win]) / 2)
 
 					## Edit candidate
 					key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
@@ -281,11 +307,9 @@ def IdentifyCOs_snps(offspring_genotype_window_smoothed, nb_windows_chr):
 					else : 
 						stop_co_win = cur_win - cur_support + 1
 
-					co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-						offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
+					co_start = int((starts[pre_win] + stops[pre_win]) / 2)
 
-					co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-		    			offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
+					co_stop = int((starts[stop_co_win] + stops[stop_co_win]) / 2)
 
 					## Edit candidate
 					key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
@@ -519,182 +543,336 @@ def PreciseCOs_snps(offspring_genotype_window_smoothed, start_window=None, end_w
 	
 	return candidates_co, db_co
 
+#==============================================================================
 
-###############################################################################
-
-def RefineCOBorders(CandidateCOs, Offspring_infoSNPs, window_size):
-	print()
-	hues.info("Refine crossover borders")
-
-	RefinedCOs = OrderedDict() 
-
-	for co_key, co_value in CandidateCOs.items():
-
-		cur_chr, cur_pos = co_key.split("_")
-		win, cur_start, cur_stop, pre_geno, cur_geno = co_value
-
-		cur_start = int(cur_start - window_size / 2 * 1000)
-		cur_stop = int(cur_stop + window_size / 2 * 1000)
-
-		if ("/" not in pre_geno) and ("/" in cur_geno):
-
-			cur_geno1, cur_geno2 = cur_geno.split("/")
-			pre_geno_3 = pre_geno
-			cur_geno_3 = ""
-			comm_geno = ""
+class InformativeWindowIndex:
+	"""
+	Description:	windows of each chromosome (in the order of geno_window)
+					indexed to find the k nearest informative windows 
+					(genotype != "NA") on each side of a position and the 
+					windows included in a region in O(log n + k), without 
+					scanning all the windows. For each chromosome:
+					- prev_informative[i], next_informative[i]: nearest 
+					informative window at or before, at or after window i
+					- min_starts, max_stops: minimum of the starts of the 
+					windows i to n, maximum of the stops of the windows 1 to i
+					(sorted arrays, searched with a binary search)
+					- max_starts, min_stops: maximum of the starts of the 
+					windows 1 to i, minimum of the stops of the windows i to n
+					When the windows are sorted, min_starts and max_starts are
+					the starts of the windows.
+	Input:
+	- windows[chr] = dictionary of the arrays of the chromosome
+	Usage:
+	index = InformativeWindowIndex.from_windows(geno_window)
+	index.before("Chr1", pos, 3)
+	index.after("Chr1", pos, 3)
+	index.region("Chr1", start, stop)
+	"""
+	def __init__(self, windows:OrderedDict):
+		self.windows = windows
+
+	@classmethod
+	def from_windows(cls, geno_window:OrderedDict):
+		"""
+		Description:	create the index from the genotypes of the windows
+		Input:
+		- geno_window:	[chr_window] = [start, stop, ADref/DP, ADalt/DP, genotype]
+						(output of SmoothNormalizedOsffspringSlidingWindowsnps())
+		Output:
+		- InformativeWindowIndex
+		"""
+		keys = OrderedDict()
+		for key in geno_window:
+			keys.setdefault(key.split("_")[0], []).append(key)
+
+		windows = OrderedDict()
+		for cur_chr, chr_keys in keys.items():
+			starts = np.array([geno_window[key][0] for key in chr_keys], dtype=np.int64)
+			stops = np.array([geno_window[key][1] for key in chr_keys], dtype=np.int64)
+			informative = np.array([geno_window[key][-1] != "NA" for key in chr_keys], dtype=bool)
+			nb_win = len(chr_keys)
+			num_win = np.arange(nb_win)
+
+			windows[cur_chr] = {
+				'keys': chr_keys,
+				'starts': starts.tolist(),
+				'stops': stops.tolist(),
+				'prev_informative': np.maximum.accumulate(np.where(informative, num_win, -1)).tolist(),
+				'next_informative': np.minimum.accumulate(np.where(informative, num_win, nb_win)[::-1])[::-1].tolist(),
+				'min_starts': np.minimum.accumulate(starts[::-1])[::-1],
+				'max_starts': np.maximum.accumulate(starts),
+				'min_stops': np.minimum.accumulate(stops[::-1])[::-1],
+				'max_stops': np.maximum.accumulate(stops)}
+
+		return cls(windows)
+
+	def before(self, cur_chr:str, pos:int, k:int=3):
+		"""
+		Description:	k last informative windows with start < pos
+		Output:			list of chr_window, in the order of the windows
+		"""
+		if cur_chr not in self.windows:
+			return []
+		chr_windows = self.windows[cur_chr]
+		found = []
+		# last window with start < pos
+		num_win = int(np.searchsorted(chr_windows['min_starts'], pos, side="left")) - 1
+		while num_win >= 0 and len(found) < k:
+			num_win = chr_windows['prev_informative'][num_win]
+			if num_win < 0:
+				break
+			if chr_windows['starts'][num_win] < pos:
+				found.append(num_win)
+			num_win -= 1
+		return [chr_windows['keys'][num_win] for num_win in reversed(found)]
+
+	def after(self, cur_chr:str, pos:int, k:int=3):
+		"""
+		Description:	k first informative windows with stop > pos
+		Output:			list of chr_window, in the order of the windows
+		"""
+		if cur_chr not in self.windows:
+			return []
+		chr_windows = self.windows[cur_chr]
+		nb_win = len(chr_windows['keys'])
+		found = []
+		# first window with stop > pos
+		num_win = int(np.searchsorted(chr_windows['max_stops'], pos, side="right"))
+		while num_win < nb_win and len(found) < k:
+			num_win = chr_windows['next_informative'][num_win]
+			if num_win >= nb_win:
+				break
+			if chr_windows['stops'][num_win] > pos:
+				found.append(num_win)
+			num_win += 1
+		return [chr_windows['keys'][num_win] for num_win in found]
+
+	def region(self, cur_chr:str, start:int, stop:int):
+		"""
+		Description:	windows (informative or not) with start >= start and 
+						stop <= stop
+		Output:			list of chr_window, in the order of the windows
+		"""
+		if cur_chr not in self.windows:
+			return []
+		chr_windows = self.windows[cur_chr]
+		# windows before first_win start before start, windows from last_win 
+		# stop after stop
+		first_win = int(np.searchsorted(chr_windows['max_starts'], start, side="left"))
+		last_win = int(np.searchsorted(chr_windows['min_stops'], stop, side="right"))
+		return [chr_windows['keys'][num_win] for num_win in range(first_win, last_win) \
+			if chr_windows['starts'][num_win] >= start and chr_windows['stops'][num_win] <= stop]
 
-			if pre_geno == cur_geno1:
-				cur_geno_3 = cur_geno2
-			else:
-				cur_geno_3 = cur_geno1
-			comm_geno = pre_geno
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-					if refined_info_start != cur_start:
-						break
-
-			if refined_info_stop < refined_info_start:
-				refined_info_start = cur_start - 2000
-				# hues.warn("ERROR-info-2, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-2: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-2: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
+#==============================================================================
 
-		elif ("/" in pre_geno) and ("/" not in cur_geno):
+def PreciseCOsEMS(candidates_co:OrderedDict, offspring_genotype_window:OrderedDict, \
+		offspring_genotype_window_new:OrderedDict, nb_informative:int=3):
+	"""
+	Description:	precise the position of all the candidate COs with the 
+					windows of new_snp_per_window SNPs. The region of a CO goes
+					from the start of the nb_informative-th informative window
+					before the CO to the stop of the nb_informative-th 
+					informative window after the CO (found with 
+					InformativeWindowIndex), and PreciseCOs_snps() is run on
+					the new windows of the region.
+	Input:
+	- candidates_co:	[chr_mean_win] = [start_win:stop_win, co_start, co_stop,
+						(stop_co-start_co,) pre_geno, cur_geno], output of 
+						IdentifyCOs_snps()
+	- offspring_genotype_window:	genotypes of the windows of the candidate COs
+	- offspring_genotype_window_new:	genotypes of the windows of 
+						new_snp_per_window SNPs
+	- nb_informative:	number of informative windows on each side of the CO
+	Output:
+	- preciseCOs[chr_mean_win] = [start_win:stop_win, co_start, co_stop, 
+								pre_geno, cur_geno]
+	- db_co:	double COs, see PreciseCOs_snps()
+	Notes: 
+	- A candidate CO is kept as it is when no new window is in its region.
+	- Without informative window before the CO, the region starts at co_start
+	(stops at co_stop without informative window after the CO).
+	"""
+	index = InformativeWindowIndex.from_windows(offspring_genotype_window)
+	index_new = InformativeWindowIndex.from_windows(offspring_genotype_window_new)
 
-			pre_geno1, pre_geno2 = pre_geno.split("/")
-			pre_geno_3 = ""
-			cur_geno_3 = cur_geno
-			comm_geno = ""
+	preciseCOs = OrderedDict()
+	db_co = OrderedDict()
+	for key, value in candidates_co.items():
+		cur_chr = key.split("_")[0]
+		co_start, co_stop = value[1], value[2]
+		pre_geno, cur_geno = value[-2], value[-1]
+
+		before = index.before(cur_chr, co_start, nb_informative)
+		after = index.after(cur_chr, co_stop, nb_informative)
+		start_region = offspring_genotype_window[before[0]][0] if before else co_start
+		stop_region = offspring_genotype_window[after[-1]][1] if after else co_stop
+
+		region = index_new.region(cur_chr, start_region + 1, stop_region)
+		if len(region) == 0:
+			preciseCOs[key] = [value[0], co_start, co_stop, pre_geno, cur_geno]
+			continue
+		new_genotype_window = OrderedDict((key_window, offspring_genotype_window_new[key_window]) \
+			for key_window in region)
+		start_window = int(region[0].split("_")[1])
+		end_window = int(region[-1].split("_")[1])
+
+		candidates_co_2, db_co_2 = PreciseCOs_snps(new_genotype_window, \
+			start_window=start_window, end_window=end_window)
+		if not candidates_co_2:
+			key_2 = cur_chr + "_" + str(round((start_window + end_window) / 2, 1))
+			candidates_co_2[key_2] = [str(start_window) + ":" + str(end_window), co_start, co_stop, \
+				pre_geno, cur_geno]
+		preciseCOs.update(candidates_co_2)
+		db_co.update(db_co_2)
+
+	return preciseCOs, db_co
 
-			if pre_geno1 == cur_geno:
-				pre_geno_3 = pre_geno2
-			else:
-				pre_geno_3 = pre_geno1
-			comm_geno = pre_geno1
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(refined_infosnp_cnt - 1, 0, -1):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
 
-					if refined_info_stop != cur_stop:
-						break
+###############################################################################
 
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
+def SnpGenotypesByChr(Offspring_infoSNPs):
+	"""
+	Description:	genotypes of the offspring SNPs sorted by position, by
+					chromosome, to find the SNPs of a CO with a binary search
+	Input:
+	- Offspring_infoSNPs:	output of ReadOffspringVCF() or SnpTable
+	Output:
+	- snp_genotypes[chr] = [positions, genotypes] numpy arrays
+	"""
+	snp_genotypes = OrderedDict()
+
+	if hasattr(Offspring_infoSNPs, "genotypes"):
+		# SnpTable: columns are already sorted by position
+		genotypes = np.array(Offspring_infoSNPs.genotypes)
+		for cur_chr, columns in Offspring_infoSNPs.columns.items():
+			snp_genotypes[cur_chr] = [columns[0], genotypes[columns[4]]]
+		return snp_genotypes
+
+	rows = OrderedDict()
+	for key, snp in Offspring_infoSNPs.items():
+		cur_chr, _, pos = key.rpartition("_")
+		if pos.isdigit():
+			rows.setdefault(cur_chr, [[], []])
+			rows[cur_chr][0].append(int(pos))
+			rows[cur_chr][1].append(snp[5])
+
+	for cur_chr, (positions, genotypes) in rows.items():
+		positions = np.array(positions, dtype=np.int64)
+		order = np.argsort(positions, kind="stable")
+		snp_genotypes[cur_chr] = [positions[order], np.array(genotypes)[order]]
+
+	return snp_genotypes
 
-			if refined_info_stop < refined_info_start:
-				refined_info_stop = cur_stop + 2000
-				hues.warn("ERROR-info-3, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-3: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-3: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
+#==============================================================================
 
+def RefineCOBorder(snp_genotypes, cur_chr, cur_start, cur_stop, pre_geno, cur_geno, window_size):
+	"""
+	Description:	refine the borders of one CO with the informative SNPs of
+					the CO interval widened by half a window on each side.
+					A SNP is of type 1 if it has the genotype specific to
+					the left side of the CO and of type 2 if it has the
+					genotype specific to the right side. The new start is the
+					last SNP of type 1 before the first SNP of type 2 and the
+					new stop is this SNP of type 2 (scan from the right for
+					a heterozygous to homozygous CO).
+	Input:
+	- snp_genotypes:	output of SnpGenotypesByChr()
+	- cur_chr:			chromosome of the CO
+	- cur_start:		start of the CO
+	- cur_stop:			stop of the CO
+	- pre_geno:			genotype on the left side of the CO
+	- cur_geno:			genotype on the right side of the CO
+	- window_size:		size of the sliding windows in kb
+	Output:
+	- [refined_start, refined_stop]
+	"""
+	cur_start = int(cur_start - window_size / 2 * 1000)
+	cur_stop = int(cur_stop + window_size / 2 * 1000)
+
+	if ("/" not in pre_geno) and ("/" in cur_geno):
+		case = 2
+		cur_geno1, cur_geno2 = cur_geno.split("/")
+		pre_geno_3 = pre_geno
+		cur_geno_3 = cur_geno2 if pre_geno == cur_geno1 else cur_geno1
+	elif ("/" in pre_geno) and ("/" not in cur_geno):
+		case = 3
+		pre_geno1, pre_geno2 = pre_geno.split("/")
+		pre_geno_3 = pre_geno2 if pre_geno1 == cur_geno else pre_geno1
+		cur_geno_3 = cur_geno
+	else:
+		case = 4
+		pre_geno_3 = pre_geno
+		cur_geno_3 = cur_geno
+
+	# informative SNPs of the interval [cur_start, cur_stop[
+	if cur_chr in snp_genotypes:
+		positions, genotypes = snp_genotypes[cur_chr]
+		first = np.searchsorted(positions, cur_start, side="left")
+		last = np.searchsorted(positions, cur_stop, side="left")
+		positions = positions[first:last]
+		genotypes = genotypes[first:last]
+	else:
+		positions = np.empty(0, dtype=np.int64)
+		genotypes = np.empty(0, dtype=str)
+	type1 = (genotypes == pre_geno_3) & (positions > cur_start)
+	type2 = genotypes == cur_geno_3
+	type1_index = np.flatnonzero(type1)
+	type2_index = np.flatnonzero(type2)
+
+	refined_info_start = cur_start
+	refined_info_stop = cur_stop
+	if case == 3:
+		# from the right: last SNP of type 1, then the first SNP of type 2
+		# at or after it, or the first SNP of type 2 if there is none
+		if len(type1_index):
+			last_type1 = type1_index[-1]
+			refined_info_start = int(positions[last_type1])
+			if type2[last_type1:].any():
+				type2_index = np.flatnonzero(type2[last_type1:]) + last_type1
+		if len(type2_index):
+			refined_info_stop = int(positions[type2_index[0]])
+	else:
+		# from the left: first SNP of type 2 and the last SNP of type 1 at
+		# or before it, or the last SNP of type 1 if there is none
+		if len(type2_index):
+			refined_info_stop = int(positions[type2_index[0]])
+			first_type2 = type2_index[0]
+			if type1[:first_type2 + 1].any():
+				type1_index = np.flatnonzero(type1[:first_type2 + 1])
+		if len(type1_index):
+			refined_info_start = int(positions[type1_index[-1]])
+
+	if refined_info_stop < refined_info_start:
+		if case == 2:
+			refined_info_start = cur_start - 2000
+			# hues.warn("ERROR-info-2, stop < start!")
+		elif case == 3:
+			refined_info_stop = cur_stop + 2000
+			hues.warn("ERROR-info-3, stop < start!")
 		else:
+			refined_info_start = int(cur_start + window_size / 2 * 1000)
+			refined_info_stop = int(cur_stop - window_size / 2 * 1000)
+			hues.warn("ERROR-info-4, stop < start!")
 
-			pre_geno_3 = pre_geno
-			cur_geno_3 = cur_geno
-			comm_geno = ""
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			refined_totalsnp = OrderedDict()
-			refined_totalsnp_cnt = 1
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-
-					if refined_info_start != cur_start:
-						break
+	if case == 4:
+		cur_start = int(cur_start + window_size / 2 * 1000)
+		cur_stop = int(cur_stop - window_size / 2 * 1000)
+		hues.info("#CandidateCOs-4: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
+		hues.info("#RefinedInfoCOs-4: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
 
-			if refined_info_stop < refined_info_start:
-				refined_info_start = int(cur_start + window_size / 2 * 1000)
-				refined_info_stop = int(cur_stop - window_size / 2 * 1000)
-				hues.warn("ERROR-info-4, stop < start!")
+	return [refined_info_start, refined_info_stop]
 
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			hues.info("#CandidateCOs-4: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			hues.info("#RefinedInfoCOs-4: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
+#==============================================================================
 
+def ReRefineCOs(RefinedCOs):
+	"""
+	Description:	merge the refined COs that overlap on a chromosome
+	Input:
+	- RefinedCOs[chr_win] = [start, stop, pre_geno, cur_geno]
+	Output:
+	- Re_RefinedCOs[chr_win] = [start, stop, pre_geno, cur_geno]
+	"""
 	hues.info("Re-refined crossovers")
 	Re_RefinedCOs = OrderedDict()
 	pre_co_chr = ""
@@ -765,6 +943,26 @@ def RefineCOBorders(CandidateCOs, Offspring_infoSNPs, window_size):
 		
 	return Re_RefinedCOs
 
+#==============================================================================
+
+def RefineCOBorders(CandidateCOs, Offspring_infoSNPs, window_size):
+	print()
+	hues.info("Refine crossover borders")
+
+	snp_genotypes = SnpGenotypesByChr(Offspring_infoSNPs)
+	RefinedCOs = OrderedDict()
+
+	for co_key, co_value in CandidateCOs.items():
+
+		cur_chr, cur_pos = co_key.split("_")
+		win, cur_start, cur_stop, pre_geno, cur_geno = co_value
+
+		RefinedCOs[co_key] = RefineCOBorder(snp_genotypes, cur_chr, cur_start, cur_stop, \
+			pre_geno, cur_geno, window_size) + [pre_geno, cur_geno]
+
+	return ReRefineCOs(RefinedCOs)
+
+
 
 ###############################################################################
 ###############################################################################
@@ -1076,243 +1274,17 @@ def RefineCOBordersQichao(CandidateCOs, Offspring_infoSNPs, window_size):
 	print()
 	hues.info("Refine crossover borders")
 
-	RefinedCOs = OrderedDict() 
+	snp_genotypes = SnpGenotypesByChr(Offspring_infoSNPs)
+	RefinedCOs = OrderedDict()
 
 	for co_key, co_value in CandidateCOs.items():
 
 		cur_chr, cur_pos = co_key.split("_")
 		cur_start, cur_stop, pre_geno, cur_geno = co_value
 
-		cur_start = int(cur_start - window_size / 2 * 1000)
-		cur_stop = int(cur_stop + window_size / 2 * 1000)
+		RefinedCOs[co_key] = RefineCOBorder(snp_genotypes, cur_chr, cur_start, cur_stop, \
+			pre_geno, cur_geno, window_size) + [pre_geno, cur_geno]
 
-		if ("/" not in pre_geno) and ("/" in cur_geno):
-
-			cur_geno1, cur_geno2 = cur_geno.split("/")
-			pre_geno_3 = pre_geno
-			cur_geno_3 = ""
-			comm_geno = ""
-
-			if pre_geno == cur_geno1:
-				cur_geno_3 = cur_geno2
-			else:
-				cur_geno_3 = cur_geno1
-			comm_geno = pre_geno
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-					if refined_info_start != cur_start:
-						break
-
-			if refined_info_stop < refined_info_start:
-				refined_info_start = cur_start - 2000
-				# hues.warn("ERROR-info-2, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-2: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-2: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
-
-		elif ("/" in pre_geno) and ("/" not in cur_geno):
-
-			pre_geno1, pre_geno2 = pre_geno.split("/")
-			pre_geno_3 = ""
-			cur_geno_3 = cur_geno
-			comm_geno = ""
-
-			if pre_geno1 == cur_geno:
-				pre_geno_3 = pre_geno2
-			else:
-				pre_geno_3 = pre_geno1
-			comm_geno = pre_geno1
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(refined_infosnp_cnt - 1, 0, -1):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-
-					if refined_info_stop != cur_stop:
-						break
-
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-
-			if refined_info_stop < refined_info_start:
-				refined_info_stop = cur_stop + 2000
-				hues.warn("ERROR-info-3, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-3: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-3: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
-
-		else:
-
-			pre_geno_3 = pre_geno
-			cur_geno_3 = cur_geno
-			comm_geno = ""
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			refined_totalsnp = OrderedDict()
-			refined_totalsnp_cnt = 1
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-
-					if refined_info_start != cur_start:
-						break
-
-			if refined_info_stop < refined_info_start:
-				refined_info_start = int(cur_start + window_size / 2 * 1000)
-				refined_info_stop = int(cur_stop - window_size / 2 * 1000)
-				hues.warn("ERROR-info-4, stop < start!")
-
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			hues.info("#CandidateCOs-4: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			hues.info("#RefinedInfoCOs-4: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
-
-	hues.info("Re-refined crossovers")
-	Re_RefinedCOs = OrderedDict()
-	pre_co_chr = ""
-	pre_co_pos = ""
-	pre_co_start = ""
-	pre_co_stop = ""
-	pre_co_geno1 = ""
-	pre_co_geno2 = ""
-	cur_item = 0
-	for co_key, co_value in RefinedCOs.items():
-
-		co_chr, co_pos = co_key.split("_")
-		co_start, co_stop, co_geno1, co_geno2 = co_value
-
-		if co_chr != pre_co_chr:
-			if pre_co_chr == "":
-				pass
-			else:
-				Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-
-			pre_co_chr = co_chr
-			pre_co_pos = float(co_pos)
-			pre_co_start = int(co_start)
-			pre_co_stop = int(co_stop)
-			pre_co_geno1 = co_geno1
-			pre_co_geno2 = co_geno2
-		else:
-			if co_start <= pre_co_stop:
-				if (pre_co_geno2 == co_geno1):
-					if pre_co_geno1 == co_geno2:
-						pre_co_chr = ""
-						pre_co_pos = ""
-						pre_co_start = ""
-						pre_co_stop = ""
-						pre_co_geno1 = ""
-						pre_co_geno2 = ""
-					else:
-						pre_co_chr = co_chr
-						pre_co_pos = round((pre_co_pos + float(co_pos)) / 2, 1)
-						pre_co_start = int(pre_co_start)
-						pre_co_stop = int(co_stop)
-						pre_co_geno1 = pre_co_geno1
-						pre_co_geno2 = co_geno2
-						Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-				else:
-					hues.error("#3#" + "\t" + "Diff GENO!")
-			else:
-				if (co_start % 1000 == 0) and (pre_co_geno1 in co_geno1) and (pre_co_geno2 in co_geno1) and (pre_co_geno2 == co_geno2):
-					pre_co_chr = co_chr
-					pre_co_pos = round((pre_co_pos + float(co_pos)) / 2, 1)
-					pre_co_start = int(pre_co_start)
-					pre_co_stop = int(pre_co_stop)
-					pre_co_geno1 = pre_co_geno1
-					pre_co_geno2 = co_geno2
-					Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-				else:
-					Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-					pre_co_chr = co_chr
-					pre_co_pos = round(float(co_pos), 1)
-					pre_co_start = int(co_start)
-					pre_co_stop = int(co_stop)
-					pre_co_geno1 = co_geno1
-					pre_co_geno2 = co_geno2
-
-		cur_item += 1
-		if cur_item == len(RefinedCOs.keys()):
-			Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-		
-	return Re_RefinedCOs
+	return ReRefineCOs(RefinedCOs)
  
  
@@ -11,8 +11,19 @@
 # Version		:	2.0
 #==============================================================================
 
-import hues,os,sys,re
+import hues,os,sys,re,gzip,hashlib,json
+import numpy as np
 from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+try:
+	import pysam # optional, to read a chromosome of an indexed vcf.gz
+except ImportError:
+	pysam = None
+try:
+	import pandas as pd # optional, to convert the RIL reference (.xlsx)
+except ImportError:
+	pd = None
 from detectCOs_required_functions_EMS import *
 
 #==============================================================================
@@ -48,6 +59,151 @@ def RemoveFile(output_file:str): #old name CheckOuput
 
 #==============================================================================
 
+@contextmanager
+def OpenVCF(input_vcf:str, region:str=None, prefix_chr:str="Chr"):
+	"""
+	Description:	open a vcf file, compressed (.vcf.gz, gzip or BGZF) or not,
+					and optionally keep only the lines of one chromosome.
+					If the file is BGZF compressed and pysam is installed, the 
+					chromosome is read directly from the tabix index (.tbi or 
+					.csi), the index is built next to the file if absent. 
+					Otherwise the whole file is scanned.
+	Input:
+	- input_vcf:	path-to-file/input_vcf
+	- region:		name of the chromosome to read (e.g. "Chr1" or "1"),
+					None to read the whole file
+	- prefix_chr:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	Output:
+	- iterator over the lines of the vcf (with header if region is None)
+	Usage:
+	with OpenVCF(input_vcf, region) as input_file:
+		for line in input_file:
+	"""
+	if region is not None:
+		if not region.startswith(prefix_chr):
+			region = prefix_chr + region
+		indexed_lines = FetchIndexedVCF(input_vcf, region, prefix_chr)
+		if indexed_lines is not None:
+			# the lines are read from the index, the file is not opened
+			yield indexed_lines
+			return
+
+	if input_vcf.endswith(".gz"):
+		input_file = gzip.open(input_vcf, "rt")
+	else:
+		input_file = open(input_vcf, "r")
+
+	try:
+		if region is None:
+			yield input_file
+		else:
+			yield (line for line in input_file if not line.startswith("#") and \
+				ChrName(line.split("\t", 1)[0], prefix_chr) == region)
+	finally:
+		input_file.close()
+
+#==============================================================================
+
+def ChrName(chr:str, prefix_chr:str="Chr"):
+	"""
+	Description:	add the prefix to the chromosome name if needed
+	Input:			chromosome name from the vcf (e.g. "1" or "Chr1")
+	Output:			chromosome name with prefix (e.g. "Chr1")
+	"""
+	if not chr.startswith(prefix_chr):
+		chr = prefix_chr + chr
+	return chr
+
+#==============================================================================
+
+def FetchIndexedVCF(input_vcf:str, region:str, prefix_chr:str="Chr"):
+	"""
+	Description:	read the lines of one chromosome of a BGZF compressed vcf 
+					with its tabix index, the index is built if absent.
+	Input:
+	- input_vcf:	path-to-file/input_vcf.gz
+	- region:		name of the chromosome with prefix (e.g. "Chr1")
+	- prefix_chr:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	Output:
+	- list of the lines of the chromosome, None if the vcf can not be read 
+	with an index (pysam not installed, not BGZF compressed...)
+	"""
+	if pysam is None or not input_vcf.endswith(".gz"):
+		return None
+
+	if not os.path.exists(input_vcf + ".tbi") and not os.path.exists(input_vcf + ".csi"):
+		try:
+			hues.log("Build index of\t" + input_vcf)
+			pysam.tabix_index(input_vcf, preset="vcf", keep_original=True)
+		except (OSError, ValueError) as error:
+			hues.warn("Can not index\t" + input_vcf + " (" + str(error) + "), scan the whole file")
+			return None
+
+	with pysam.TabixFile(input_vcf) as tabix_file:
+		# the chromosome name in the vcf may not have the prefix
+		for contig in tabix_file.contigs:
+			if ChrName(contig, prefix_chr) == region:
+				return [line + "\n" for line in tabix_file.fetch(contig)]
+
+	return []
+
+#==============================================================================
+
+class SnpLogFile:
+	"""
+	Description:	log file of the SNPs discarded by a vcf reader (one vcf 
+					line per SNP). The file is opened once, at the first SNP,
+					and the lines are buffered instead of reopening the file 
+					for each SNP.
+	Input:
+	- log_file:		path-to-file/log_file, removed if it already exists
+	- enabled:		write the SNPs in the log file, if False the SNPs are only
+					counted (no file is created)
+	- compress:		write a gzip compressed log file (log_file.gz)
+	- buffer_size:	size of the write buffer in bytes (default: 1 Mb)
+	Usage:
+	with SnpLogFile(log_file) as snps_log:
+		snps_log.write(line)
+	"""
+	def __init__(self, log_file:str, enabled:bool=True, compress:bool=False, \
+		buffer_size:int=1048576):
+		self.log_file = log_file + ".gz" if compress else log_file
+		self.enabled = enabled
+		self.compress = compress
+		self.buffer_size = buffer_size
+		self.count = 0
+		self.output = None
+
+		RemoveFile(log_file)
+		RemoveFile(log_file + ".gz")
+
+	def write(self, line:str):
+		self.count += 1
+		if not self.enabled:
+			return
+
+		if self.output is None:
+			os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+			if self.compress:
+				self.output = gzip.open(self.log_file, "wt")
+			else:
+				self.output = open(self.log_file, "w", buffering=self.buffer_size)
+		self.output.write(line)
+
+	def close(self):
+		if self.output is not None:
+			self.output.close()
+			self.output = None
+			hues.log(str(self.count) + " SNPs written in\t" + self.log_file)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+#==============================================================================
+
 def load_file_in_dict(input_file:str, prefix_chr:str="Chr"):
 	"""
 	Description:	convert file in dictionnary
@@ -123,6 +279,351 @@ def export_dict_in_file(my_dict:OrderedDict, output_file:str, header:str, overwr
 
 #==============================================================================
 
+def FileChecksum(input_file:str, checksums_file:str=None):
+	"""
+	Description:	sha256 checksum of the content of a file. The checksums are 
+					cached in checksums_file with the size and the last 
+					modification of each file, so a file is read again only 
+					if it changed.
+	Input:
+	- input_file:		path-to-file/input_file
+	- checksums_file:	path to the cache of the checksums (json), None to 
+						not use a cache
+	Output:
+	- checksum (hexadecimal string)
+	"""
+	input_file = os.path.abspath(input_file)
+	stat = os.stat(input_file)
+	checksums = dict()
+
+	if checksums_file is not None and os.path.exists(checksums_file):
+		with open(checksums_file) as input:
+			checksums = json.load(input)
+		if checksums.get(input_file, [None, None, None])[:2] == [stat.st_size, stat.st_mtime_ns]:
+			return checksums[input_file][2]
+
+	file_hash = hashlib.sha256()
+	with open(input_file, "rb") as input:
+		for block in iter(lambda: input.read(1048576), b""):
+			file_hash.update(block)
+	checksum = file_hash.hexdigest()
+
+	if checksums_file is not None:
+		checksums[input_file] = [stat.st_size, stat.st_mtime_ns, checksum]
+		if os.path.dirname(checksums_file) != "":
+			os.makedirs(os.path.dirname(checksums_file), exist_ok=True)
+		# written in a temporary file then renamed, so an interrupted or a
+		# concurrent run never leaves a truncated cache
+		tmp_file = checksums_file + "." + str(os.getpid()) + ".tmp"
+		with open(tmp_file, "w") as output:
+			json.dump(checksums, output, indent=1)
+		os.replace(tmp_file, checksums_file)
+
+	return checksum
+
+#==============================================================================
+
+def StageManifest(input_files:list=None, params:dict=None, checksums_file:str=None):
+	"""
+	Description:	manifest of a stage of the launcher: checksum of each input
+					file and parameters of the stage. The key of an upstream 
+					stage (see CheckpointKey()) can be given in params to 
+					invalidate the downstream stages with it.
+	Input:
+	- input_files:		list of path-to-file/input_file (default: none)
+	- params:			parameters of the stage, params[name] = value (default: none)
+	- checksums_file:	cache of the checksums (see FileChecksum())
+	Output:
+	- manifest = {"input_files": {input_file: checksum}, "params": params}
+	"""
+	if input_files is None:
+		input_files = []
+	if params is None:
+		params = dict()
+	return {"input_files": OrderedDict((input_file, FileChecksum(input_file, checksums_file)) \
+				for input_file in input_files),
+			"params": params}
+
+#==============================================================================
+
+def CheckpointKey(manifest:dict):
+	"""
+	Description:	key of a checkpoint, hash of the manifest of its stage
+	Input:			output of StageManifest()
+	Output:			checkpoint_key (hexadecimal string)
+	"""
+	return hashlib.sha1(json.dumps(manifest, sort_keys=True, default=str).encode()).hexdigest()
+
+#==============================================================================
+
+def ColumnToArrays(values:list, name:str):
+	"""
+	Description:	convert a column of values in a typed numpy array: int64, 
+					float64, string or bool. None is saved as NaN. If the 
+					column mixes types, the values are saved as strings with 
+					the type of each value. The other types (tuple, list, 
+					dict...) would not be read back: they raise a TypeError.
+	Input:
+	- values:	list of int, float, str, bool or None
+	- name:		name of the array
+	Output:
+	- arrays[name] = numpy array (and arrays[name + "_type"] if mixed types)
+	"""
+	types = []
+	column = []
+	for value in values:
+		# bool before int: bool is a subclass of int
+		if isinstance(value, (bool, np.bool_)):
+			types.append(3)
+			column.append(bool(value))
+		elif isinstance(value, (int, np.integer)):
+			types.append(0)
+			column.append(value)
+		elif isinstance(value, (float, np.floating)):
+			types.append(1)
+			column.append(value)
+		elif value is None:
+			types.append(1)
+			column.append(np.nan)
+		elif isinstance(value, str):
+			types.append(2)
+			column.append(value)
+		else:
+			raise TypeError("Cannot save the value " + repr(value) + " of type " + \
+				type(value).__name__ + " in the column " + name + \
+				": only int, float, str, bool or None")
+
+	if len(set(types)) <= 1:
+		dtype = [np.int64, np.float64, np.str_, np.bool_][types[0]] if types else np.int64
+		return {name: np.array(column, dtype=dtype)}
+
+	# repr() of a float gives back the same float
+	return {name: np.array([repr(float(value)) if value_type == 1 else str(value) \
+			for value, value_type in zip(column, types)], dtype=np.str_), 
+		name + "_type": np.array(types, dtype=np.int8)}
+
+#==============================================================================
+
+def ArraysToColumn(arrays, name:str):
+	"""
+	Description:	opposite of ColumnToArrays()
+	Output:			list of int, float, str or bool
+	"""
+	values = arrays[name].tolist()
+	if name + "_type" in arrays:
+		values = [DecodeColumnValue(value, value_type) for value, value_type in \
+			zip(values, arrays[name + "_type"].tolist())]
+
+	return values
+
+#==============================================================================
+
+def StrToBool(value:str):
+	"""
+	Description:	bool saved as a string by ColumnToArrays()
+	"""
+	return value == "True"
+
+#==============================================================================
+
+def DecodeColumnValue(value:str, value_type:int):
+	"""
+	Description:	value of a column of mixed types of ColumnToArrays(),
+					from its string and its type (type code of ColumnToArrays():
+					0 int, 1 float or None, 2 str, 3 bool)
+	"""
+	return [int, float, str, StrToBool][value_type](value)
+
+#==============================================================================
+
+def SaveCheckpoint(my_dicts:list, checkpoint_file:str, manifest:dict):
+	"""
+	Description:	save dictionnaries in a binary checkpoint (.npz, numpy 
+					arrays without pickle), each value of the dictionnaries is 
+					a list of int, float or str or a single value. The 
+					manifest of the stage is saved in the checkpoint and in 
+					checkpoint.manifest.json.
+	Input: 
+	- my_dicts:			list of dictionnaries to save
+	- checkpoint_file:	path to the checkpoint (.npz)
+	- manifest:			output of StageManifest() for the inputs of the stage
+	"""
+	manifest_json = json.dumps(manifest, indent=1, sort_keys=True, default=str)
+	arrays = {"checkpoint_key": np.array(CheckpointKey(manifest)), 
+		"manifest": np.array(manifest_json), "nb_dicts": np.array(len(my_dicts))}
+
+	for num_dict, my_dict in enumerate(my_dicts):
+		prefix = "dict" + str(num_dict) + "_"
+		values = list(my_dict.values())
+		# length of each value, -1 for a single value (not a list)
+		lengths = [len(value) if isinstance(value, list) else -1 for value in values]
+		arrays.update(ColumnToArrays(list(my_dict.keys()), prefix + "keys"))
+		arrays[prefix + "lengths"] = np.array(lengths, dtype=np.int64)
+
+		for num_col in range(max([1] + lengths)):
+			column = [value[num_col] if length > num_col else value for value, length \
+				in zip(values, lengths) if length > num_col or (length == -1 and num_col == 0)]
+			arrays.update(ColumnToArrays(column, prefix + "col" + str(num_col)))
+
+	if os.path.dirname(checkpoint_file) != "":
+		os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+	# write in a temporary file first to never leave a partial checkpoint
+	tmp_file = checkpoint_file[:-len(".npz")] + ".tmp.npz"
+	np.savez(tmp_file, **arrays)
+	os.replace(tmp_file, checkpoint_file)
+	with open(checkpoint_file[:-len(".npz")] + ".manifest.json", "w") as output:
+		output.write(manifest_json + "\n")
+	print(checkpoint_file, "created.")
+
+#==============================================================================
+
+def LoadCheckpoint(checkpoint_file:str, manifest:dict):
+	"""
+	Description:	load the dictionnaries of a checkpoint saved by 
+					SaveCheckpoint() if it was computed with the same inputs 
+					and parameters, otherwise the differences are logged.
+	Input: 
+	- checkpoint_file:	path to the checkpoint (.npz)
+	- manifest:			output of StageManifest() for the inputs of the stage
+	Output:
+	- list of dictionnaries, None if the checkpoint does not exist or if it 
+	was computed with other inputs or parameters
+	"""
+	if not os.path.exists(checkpoint_file):
+		return None
+
+	with np.load(checkpoint_file, allow_pickle=False) as arrays:
+		if str(arrays["checkpoint_key"]) != CheckpointKey(manifest):
+			hues.warn("Outdated checkpoint:\t" + checkpoint_file)
+			saved_manifest = json.loads(str(arrays["manifest"]))
+			for field in ["input_files", "params"]:
+				cur_values = json.loads(json.dumps(manifest[field], default=str))
+				for name in sorted(set(cur_values) | set(saved_manifest[field])):
+					if cur_values.get(name) != saved_manifest[field].get(name):
+						hues.log("Changed " + name + ":\t" + str(saved_manifest[field].get(name)) + \
+							" -> " + str(cur_values.get(name)))
+			return None
+
+		my_dicts = []
+		for num_dict in range(int(arrays["nb_dicts"])):
+			prefix = "dict" + str(num_dict) + "_"
+			keys = ArraysToColumn(arrays, prefix + "keys")
+			lengths = arrays[prefix + "lengths"].tolist()
+			values = [[] if length >= 0 else None for length in lengths]
+
+			for num_col in range(max([1] + lengths)):
+				rows = [row for row, length in enumerate(lengths) \
+					if length > num_col or (length == -1 and num_col == 0)]
+				for row, value in zip(rows, ArraysToColumn(arrays, prefix + "col" + str(num_col))):
+					if lengths[row] == -1:
+						values[row] = value
+					else:
+						values[row].append(value)
+
+			my_dicts.append(OrderedDict(zip(keys, values)))
+
+	return my_dicts
+
+#==============================================================================
+
+class RILReference(Mapping):
+	"""
+	Description:	window calls of the RIL saved by ReadRILReference(), one
+					numpy array (memory-mapped .npy file) by column.
+					reference["Chr1_1"] returns the values of the row of the
+					window as a list, like the rows of the workbook.
+	Input:
+	- cache_dir:	directory of the cache
+	- meta:			content of cache_dir/meta.json
+	"""
+	def __init__(self, cache_dir:str, meta:dict):
+		self.meta = meta
+		self.arrays = dict()
+		for name in meta["arrays"]:
+			self.arrays[name] = np.load(cache_dir + name + ".npy", mmap_mode="r", allow_pickle=False)
+		# row of each chr_window (the last row if a window is found twice)
+		self.rows = dict()
+		for row, key in enumerate(self.arrays["keys"].tolist()):
+			self.rows[key] = row
+
+	def __getitem__(self, key:str):
+		row = self.rows[key]
+		values = []
+		for num_col in range(self.meta["nb_columns"]):
+			name = "col" + str(num_col)
+			value = self.arrays[name][row].item()
+			if name + "_type" in self.arrays:
+				value = DecodeColumnValue(value, int(self.arrays[name + "_type"][row]))
+			values.append(value)
+		return values
+
+	def __contains__(self, key):
+		return key in self.rows
+
+	def __iter__(self):
+		return iter(self.rows)
+
+	def __len__(self):
+		return len(self.rows)
+
+#==============================================================================
+
+def ReadRILReference(input_xlsx:str, cache_dir:str=None):
+	"""
+	Description:	read the window calls of the RIL (.xlsx, the first row is
+					a title and the second the header, windows in column
+					chr_window). The workbook is converted once in a cache of
+					typed .npy columns, used while the workbook does not
+					change (same sha256, see FileChecksum()).
+	Input:
+	- input_xlsx:	path-to-file/input_xlsx
+	- cache_dir:	directory of the cache, input_xlsx without extension +
+					"_cache/" by default
+	Output:
+	- RILReference: info_RIL[chr_window] = [values of the other columns]
+	"""
+	CheckInput(input_xlsx)
+	if cache_dir is None:
+		cache_dir = os.path.splitext(input_xlsx)[0] + "_cache/"
+	cache_dir = os.path.join(cache_dir, "")
+	meta_file = cache_dir + "meta.json"
+	checksum = FileChecksum(input_xlsx, checksums_file=cache_dir + "checksums.json")
+
+	if os.path.exists(meta_file):
+		with open(meta_file) as input:
+			meta = json.load(input)
+		if meta.get("sha256") == checksum:
+			hues.log("Load RIL reference from cache:\t" + cache_dir)
+			return RILReference(cache_dir, meta)
+		hues.warn("RIL reference changed, update the cache:\t" + cache_dir)
+
+	if pd is None:
+		raise ImportError("pandas (and openpyxl) is required to read " + input_xlsx)
+	hues.log("Convert RIL reference:\t" + input_xlsx)
+	data = pd.read_excel(input_xlsx)
+	# Set the column names to the values of the first row
+	data.columns = data.iloc[0]
+	df = data.iloc[1:].reset_index(drop=True).set_index("chr_window")
+
+	arrays = ColumnToArrays(df.index.tolist(), "keys")
+	for num_col in range(df.shape[1]):
+		arrays.update(ColumnToArrays(df.iloc[:, num_col].tolist(), "col" + str(num_col)))
+
+	os.makedirs(cache_dir, exist_ok=True)
+	for name, array in arrays.items():
+		np.save(cache_dir + name + ".npy", array, allow_pickle=False)
+	meta = {"workbook": os.path.abspath(input_xlsx), "sha256": checksum, 
+		"columns": [str(name) for name in df.columns], "nb_columns": df.shape[1], 
+		"arrays": sorted(arrays)}
+	# meta.json is written last: the cache is used only if it is complete
+	with open(meta_file + ".tmp", "w") as output:
+		json.dump(meta, output, indent=1)
+	os.replace(meta_file + ".tmp", meta_file)
+
+	return RILReference(cache_dir, meta)
+
+#==============================================================================
+
 def ReadChrLen(input_chr_len:str, prefix_chr:str="Chr"):
 	"""
 	Description:	create a dictionnary containing the length of each 
@@ -195,13 +696,14 @@ def ReadCentroReg(input_centro_reg:str, prefix_chr="Chr"):
 
 #==============================================================================
 
-def ReadParentalVCF(input_vcf:str, prefix_chr:str="Chr"):
+def ReadParentalVCF(input_vcf:str, prefix_chr:str="Chr", region:str=None):
 	"""
 	Description:	create 2 dictionnaries containing all SNPs per chromosome 
 					and the last SNPs per chromosome
 	Input: 
 	- input_vcf:	SNP markers between parental lines (vcf format).
 	- prefix_str:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- region:		chromosome to read (see OpenVCF()), None to read all
 	Output:	
 	- snps[chr_pos] = [chr,pos,GT]
 	- last_snps[chr]  = position-last-snp-per-chr 
@@ -215,7 +717,7 @@ def ReadParentalVCF(input_vcf:str, prefix_chr:str="Chr"):
 	if prefix_chr == "":
 		raise ValueError("Invalid prefix chromosome")
 
-	with open(input_vcf, 'r') as input_file:
+	with OpenVCF(input_vcf, region, prefix_chr) as input_file:
 		for line in input_file:
 			if line.startswith("#"):
 				continue
@@ -250,7 +752,8 @@ def ReadParentalVCF(input_vcf:str, prefix_chr:str="Chr"):
 #==============================================================================
 
 def ReadOffspringVCF(input_vcf:str, parental_snps:OrderedDict, \
-	geno_ref:str, geno_alt:str, analyze_id:str, prefix_chr:str="Chr"):
+	geno_ref:str, geno_alt:str, analyze_id:str, prefix_chr:str="Chr", region:str=None, \
+	snps_log:bool=True, compress_log:bool=False):
 	"""
 	Description: create 2 dictionnaries containing all SNPs per chromosome and 
 	the last SNPs per chromosome
@@ -260,6 +763,9 @@ def ReadOffspringVCF(input_vcf:str, parental_snps:OrderedDict, \
 	- geno_ref: 			reference genotype 
 	- geno_alt: 			alternative genotype
 	- prefix_chr: 		Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- region:			chromosome to read (see OpenVCF()), None to read all
+	- snps_log:		write the offspring specific and weird SNPs in log files
+	- compress_log:		gzip the log files (see SnpLogFile())
 	Output:
 	- info_snps[chr_pos] = [chr,pos,GT,ADref,ADalt,genotype]
 	- info_last_snps[chr] = position-last-snp-per-chr 
@@ -272,8 +778,6 @@ def ReadOffspringVCF(input_vcf:str, parental_snps:OrderedDict, \
 	# Prepare log directory and remove files if already exist
 	log_path = os.path.dirname(__file__) + "/log/" + analyze_id + "/"
 
-	RemoveFile(log_path + "ReadOffsrpingVCF_new_snps.log")
-	RemoveFile(log_path + "ReadOffsrpingVCF_weird_snps.log")
 	CheckInput(input_vcf)
 
 	info_snps = OrderedDict()
@@ -283,7 +787,11 @@ def ReadOffspringVCF(input_vcf:str, parental_snps:OrderedDict, \
 	new_snp = 0
 	count_dp0 = 0
 
-	with open(input_vcf, 'r') as input_file:
+	# the log files are closed (and flushed) when the reading stops, even on 
+	# an error or when a stream is not read to the end
+	with SnpLogFile(log_path + "ReadOffsrpingVCF_new_snps.log", snps_log, compress_log) as new_snps_log, \
+		SnpLogFile(log_path + "ReadOffsrpingVCF_weird_snps.log", snps_log, compress_log) as weird_snps_log, \
+		OpenVCF(input_vcf, region, prefix_chr) as input_file:
 		for line in input_file:
 			if line.startswith("#"):
 				# ignore all comments and header from vcf file
@@ -322,20 +830,10 @@ def ReadOffspringVCF(input_vcf:str, parental_snps:OrderedDict, \
 					info_snps[key] = [chr, pos, geno, ref_supp, alt_supp, geno_alt]
 				else:
 					weird_snp += 1
-					try:
-						os.makedirs(log_path)
-					except FileExistsError: ## pass if directory already exists
-						pass
-					with open(log_path + "ReadOffsrpingVCF_weird_snps.log","a+") as logfile:
-						logfile.write(line) 		
+					weird_snps_log.write(line)
 			else:
 				new_snp +=1
-				try:
-					os.makedirs(log_path)
-				except FileExistsError: ## pass if directory already exists
-					pass
-				with open(log_path + "ReadOffsrpingVCF_new_snps.log","a+") as logfile:
-					logfile.write(line) 
+				new_snps_log.write(line)
 
 			if chr in info_last_snps.keys():
 				if pos > info_last_snps[chr]:
@@ -353,48 +851,642 @@ def ReadOffspringVCF(input_vcf:str, parental_snps:OrderedDict, \
 
 #==============================================================================
 
-def ReadEMSline(input:str, prefix_chr:str):
+def FormatIndexes(format_field:str, format_indexes:dict):
 	"""
-	Description: 
+	Description:	find the index of the GT and AD values in the sample column 
+					of a vcf line from its FORMAT column. The indexes are 
+					cached in format_indexes so each FORMAT string is parsed 
+					once per file.
 	Input:
+	- format_field:		FORMAT column of the vcf line (e.g. "GT:AD:DP")
+	- format_indexes:	cache, format_indexes[format_field] = [GT_index, AD_index]
 	Output:
+	- [GT_index, AD_index] (AD_index = None if AD is not in the FORMAT column)
 	"""
-	hues.info("Reading Offspring SNPs file")
+	if format_field not in format_indexes:
+		keys = format_field.split(":")
+		if "GT" not in keys:
+			raise ValueError("GT field not found in FORMAT column: " + format_field)
+		format_indexes[format_field] = [keys.index("GT"), \
+			keys.index("AD") if "AD" in keys else None]
+
+	return format_indexes[format_field]
+
+#==============================================================================
+
+def StreamParentalVCF(input_vcf:str, prefix_chr:str="Chr", region:str=None):
+	"""
+	Description:	read the parental vcf one chromosome at a time, only the 
+					positions of the SNPs of the current chromosome are kept 
+					in memory. The vcf must be grouped by chromosome.
+	Input: 
+	- input_vcf:	SNP markers between parental lines (vcf format).
+	- prefix_str:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- region:		chromosome to read (see OpenVCF()), None to read all
+	Output (generator), one batch per chromosome:
+	- [chr, positions, last_snp_pos]: positions is a sorted numpy array 
+									of the SNPs positions of chr
+	"""
+	hues.info("Streaming Parental SNPs file")
+
+	CheckInput(input_vcf)
+	if prefix_chr == "":
+		raise ValueError("Invalid prefix chromosome")
+
+	seen_chr = set()
+	cur_chr = None
+	positions = []
+	total_snp_num = 0
+
+	with OpenVCF(input_vcf, region, prefix_chr) as input_file:
+		for line in input_file:
+			if line.startswith("#"):
+				continue
+			chr, pos = line.split("\t", 2)[:2]
+
+			# correct chr if needed
+			if not chr.startswith(prefix_chr):
+				chr = prefix_chr + chr
+
+			if chr != cur_chr:
+				if cur_chr is not None:
+					positions = np.unique(np.array(positions, dtype=np.int64))
+					yield [cur_chr, positions, int(positions[-1])]
+				if chr in seen_chr:
+					raise ValueError("The vcf file must be grouped by chromosome: " + \
+						chr + " found twice in " + input_vcf)
+				seen_chr.add(chr)
+				cur_chr = chr
+				positions = []
+
+			positions.append(int(pos))
+			total_snp_num += 1
+
+	if cur_chr is not None:
+		positions = np.unique(np.array(positions, dtype=np.int64))
+		yield [cur_chr, positions, int(positions[-1])]
+
+	hues.log(str(total_snp_num) + " Parental SNP markers streamed!")
+
+#==============================================================================
+
+def StreamOffspringVCF(input_vcf:str, parental_positions:OrderedDict, \
+	analyze_id:str, prefix_chr:str="Chr", region:str=None, \
+	snps_log:bool=True, compress_log:bool=False):
+	"""
+	Description:	read the offspring vcf one chromosome at a time and keep the
+					informative SNPs (found in parents, GT = 0/0, 0/1 or 1/1) 
+					in compact numpy arrays, as ReadOffspringVCF() does with 
+					dictionnaries. The vcf must be grouped by chromosome.
+	Input: 
+	- input_vcf:			SNP markers between offspring lines (vcf format).
+	- parental_positions:	parental_positions[chr] = sorted numpy array of the
+							parental SNPs positions (see StreamParentalVCF())
+	- analyze_id:			name of the log directory
+	- prefix_chr: 		Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- region:			chromosome to read (see OpenVCF()), None to read all
+	- snps_log:		write the offspring specific and weird SNPs in log files
+	- compress_log:		gzip the log files (see SnpLogFile())
+	Output (generator), one batch per chromosome:
+	- [chr, [positions, ADref, ADalt, GT_code], last_snp_pos]: arrays of the 
+				informative SNPs sorted by position (see GT_CODES), 
+				last_snp_pos is the position of the last SNP of chr 
+				(informative or not)
+	"""
+	hues.info("Streaming Offspring SNPs file")
+
+	if prefix_chr == "":
+		raise ValueError("Invalid prefix chromosome")
+
+	# Prepare log directory and remove files if already exist
+	log_path = os.path.dirname(__file__) + "/log/" + analyze_id + "/"
+
+	CheckInput(input_vcf)
+
+	format_indexes = dict()
+	seen_chr = set()
+	cur_chr = None
+	total_snp_num = 0
+	informative_snp = 0
+	weird_snp = 0
+	new_snp = 0
+	count_dp0 = 0
+
+	# the log files are closed (and flushed) when the reading stops, even on 
+	# an error or when a stream is not read to the end
+	with SnpLogFile(log_path + "ReadOffsrpingVCF_new_snps.log", snps_log, compress_log) as new_snps_log, \
+		SnpLogFile(log_path + "ReadOffsrpingVCF_weird_snps.log", snps_log, compress_log) as weird_snps_log, \
+		OpenVCF(input_vcf, region, prefix_chr) as input_file:
+		for line in input_file:
+			if line.startswith("#"):
+				# ignore all comments and header from vcf file
+				continue
+
+			if "DP=0" in line:
+				count_dp0 +=1
+
+			total_snp_num += 1
+			lines = line.strip("\n").split("\t")
+
+			chr = lines[0]
+			pos = int(lines[1])
+
+			# correct chr if needed
+			if not chr.startswith(prefix_chr):
+				chr = prefix_chr + chr
+
+			if chr != cur_chr:
+				if cur_chr is not None:
+					informative_snp += len(batch[0])
+					yield [cur_chr, OffspringBatchColumns(batch), last_snp_pos]
+				if chr in seen_chr:
+					raise ValueError("The vcf file must be grouped by chromosome: " + \
+						chr + " found twice in " + input_vcf)
+				seen_chr.add(chr)
+				cur_chr = chr
+				cur_parental = set(parental_positions[chr].tolist()) \
+					if chr in parental_positions else set()
+				batch = [[], [], [], []]
+				last_snp_pos = pos
+
+			if pos > last_snp_pos:
+				last_snp_pos = pos
+
+			if pos not in cur_parental:
+				new_snp +=1
+				new_snps_log.write(line)
+				continue
+
+			# GT and AD values from the sample column
+			gt_index, ad_index = FormatIndexes(lines[8], format_indexes)
+			info = lines[9].split(":")
+			gt_code = GT_CODES.get(info[gt_index], GT_OTHER)
+
+			if gt_code == GT_OTHER:
+				weird_snp += 1
+				weird_snps_log.write(line)
+				continue
+
+			if ad_index is None:
+				raise ValueError("AD field not found in FORMAT column: " + lines[8])
+			ad = info[ad_index].split(",")
+			batch[0].append(pos)
+			batch[1].append(int(ad[0]))
+			batch[2].append(int(ad[1]))
+			batch[3].append(gt_code)
+
+	if cur_chr is not None:
+		informative_snp += len(batch[0])
+		yield [cur_chr, OffspringBatchColumns(batch), last_snp_pos]
+
+	hues.log(str(total_snp_num) + " Offspring genotyped SNP markers streamed!")
+	hues.log(str(informative_snp) + " Offspring genotyped informative SNP markers kept!")
+	hues.warn(str(new_snp) + " Offspring specific SNPs (not found in parent)")
+	hues.warn(str(weird_snp) + " Weird genotype (1/2): heterozygous genotype composed of two different ALT alleles")
+	hues.warn(str(count_dp0) + " snps with a depth coverage = 0")
+
+#==============================================================================
+
+def OffspringBatchColumns(batch:list):
+	"""
+	Description:	convert the lists of a chromosome batch of 
+					StreamOffspringVCF() in numpy arrays sorted by position. 
+					If a position is found several times, the last SNP is kept 
+					as in ReadOffspringVCF().
+	Input:
+	- batch:	[positions, ADref, ADalt, GT_code] lists
+	Output:
+	- [positions, ADref, ADalt, GT_code] numpy arrays
+	"""
+	positions = np.array(batch[0], dtype=np.int64)
+	order = np.argsort(positions, kind="stable")
+	positions = positions[order]
+
+	# keep the last SNP of each position
+	last = np.ones(len(positions), dtype=bool)
+	last[:-1] = positions[1:] != positions[:-1]
+	order = order[last]
+
+	return [positions[last], np.array(batch[1], dtype=np.int32)[order], \
+		np.array(batch[2], dtype=np.int32)[order], np.array(batch[3], dtype=np.int8)[order]]
+
+#==============================================================================
+
+class EMSMutationIndex:
+	"""
+	Description:	EMS mutations of a line saved by SaveEMSIndex(): 
+					chromosome, position and ALT allele of each mutation, one
+					numpy array (memory-mapped .npy file) by column, sorted by
+					chromosome and position. (chr, pos, alt) in index searches
+					the position in the rows of the chromosome 
+					(np.searchsorted()), the arrays are not loaded in memory.
+	Input:
+	- index_dir:	directory of the index
+	- meta:			content of index_dir/meta.json
+	"""
+	def __init__(self, index_dir:str, meta:dict):
+		self.meta = meta
+		self.arrays = dict()
+		for name in ["chrs", "positions", "alts"]:
+			self.arrays[name] = np.load(index_dir + name + ".npy", mmap_mode="r", allow_pickle=False)
+		# chr_offsets[chr] = [first row, last row + 1] of the chromosome
+		self.chr_offsets = meta["chr_offsets"]
+
+	def __contains__(self, mutation):
+		chr, pos, alt = mutation
+		if chr not in self.chr_offsets:
+			return False
+		start, stop = self.chr_offsets[chr]
+		positions = self.arrays["positions"][start:stop]
+		first = start + np.searchsorted(positions, pos, side="left")
+		last = start + np.searchsorted(positions, pos, side="right")
+		return alt in self.arrays["alts"][first:last].tolist()
+
+	def __len__(self):
+		return len(self.arrays["positions"])
+
+#==============================================================================
+
+def EMSIndexDir(input_vcf:str):
+	"""
+	Description:	default directory of the index of an EMS line, next to 
+					the vcf: input_vcf without .vcf(.gz) + "_ems_index/"
+	"""
+	index_dir = input_vcf
+	for extension in [".gz", ".vcf"]:
+		if index_dir.endswith(extension):
+			index_dir = index_dir[:-len(extension)]
+	return index_dir + "_ems_index/"
+
+#==============================================================================
+
+def BuildEMSIndex(input_vcf:str, prefix_chr:str, index_dir:str=None):
+	"""
+	Description:	save the EMS mutations of a line (vcf format) in an index
+					read by ReadEMSline(). The index is tagged with the 
+					sha256 of the vcf (see FileChecksum()).
+	Input:
+	- input_vcf:	EMS mutations of the line (vcf format), a mutation per 
+					ALT allele of each line
+	- prefix_chr:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- index_dir:	directory of the index (default: see EMSIndexDir())
+	Output:
+	- index_dir, meta (content of index_dir/meta.json)
+	"""
+	CheckInput(input_vcf)
+	if prefix_chr == "":
+		raise ValueError("Invalid prefix chromosome")
+	if index_dir is None:
+		index_dir = EMSIndexDir(input_vcf)
+	index_dir = os.path.join(index_dir, "")
+
+	chrs = []
+	positions = []
+	alts = []
+	with OpenVCF(input_vcf) as input_file:
+		for lines in input_file:
+			if lines.startswith("#"):
+				# ignore all comments and header from vcf file
+				continue
+
+			line = lines.strip("\n").split("\t")
+			# correct chr if needed
+			chr = ChrName(line[0], prefix_chr)
+			pos = int(line[1])
+
+			for alt in line[4].split(","):
+				chrs.append(chr)
+				positions.append(pos)
+				alts.append(alt)
+
+	meta = {"vcf": os.path.abspath(input_vcf), 
+		"sha256": FileChecksum(input_vcf, checksums_file=index_dir + "checksums.json"), 
+		"prefix_chr": prefix_chr}
+	meta = SaveEMSIndex(index_dir, chrs, positions, alts, meta)
+
+	return index_dir, meta
+
+#==============================================================================
+
+def SaveEMSIndex(index_dir:str, chrs, positions, alts, meta:dict):
+	"""
+	Description:	save the EMS mutations of a line in index_dir, one numpy 
+					array (.npy) by column sorted by chromosome and position,
+					read by EMSMutationIndex
+	Input:
+	- index_dir:	directory of the index (ends with "/")
+	- chrs, positions, alts:	chromosome, position and ALT allele of each
+					mutation (lists or numpy arrays)
+	- meta:			information saved in index_dir/meta.json
+	Output:
+	- meta, with the number of mutations (nb_mutations) and the rows of 
+	each chromosome (chr_offsets)
+	"""
+	chrs = np.asarray(chrs, dtype=np.str_)
+	positions = np.asarray(positions, dtype=np.int64)
+	alts = np.asarray(alts, dtype=np.str_)
+	# rows sorted by chromosome and position for np.searchsorted()
+	order = np.lexsort((positions, chrs))
+	chrs, positions, alts = chrs[order], positions[order], alts[order]
+	chr_names, chr_starts = np.unique(chrs, return_index=True)
+	chr_stops = np.append(chr_starts[1:], len(chrs))
+	chr_offsets = {str(chr): [int(start), int(stop)] for chr, start, stop in \
+		zip(chr_names, chr_starts, chr_stops)}
+
+	os.makedirs(index_dir, exist_ok=True)
+	np.save(index_dir + "chrs.npy", chrs, allow_pickle=False)
+	np.save(index_dir + "positions.npy", positions, allow_pickle=False)
+	np.save(index_dir + "alts.npy", alts, allow_pickle=False)
+	meta = dict(meta, nb_mutations=len(positions), chr_offsets=chr_offsets)
+	# meta.json is written last: the index is used only if it is complete
+	with open(index_dir + "meta.json.tmp", "w") as output:
+		json.dump(meta, output, indent=1)
+	os.replace(index_dir + "meta.json.tmp", index_dir + "meta.json")
+	hues.log(str(len(positions)) + " EMS mutations saved in\t" + index_dir)
+
+	return meta
+
+#==============================================================================
+
+def ReadEMSline(input:str, prefix_chr:str, index_dir:str=None):
+	"""
+	Description:	load the EMS mutations of a line. The index of the line is
+					built once (see BuildEMSIndex()) and reused while the vcf
+					does not change (same sha256).
+	Input:
+	- input:		EMS mutations of the line (vcf format), or directory of 
+					the line in a catalog built by BuildEMSCatalog() (built 
+					again if a vcf changed, see UpdateEMSCatalog())
+	- prefix_chr:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- index_dir:	directory of the index (default: see EMSIndexDir())
+	Output:
+	- EMSMutationIndex: (chr, pos, alt) in ems_line
+	"""
+	hues.info("Reading EMS mutations file")
+	if prefix_chr == "":
+		raise ValueError("Invalid prefix chromosome")
+
+	if os.path.isdir(input):
+		# line of a catalog built by BuildEMSCatalog()
+		index_dir = os.path.join(input, "")
+		catalog_dir = os.path.join(os.path.dirname(os.path.dirname(index_dir)), "")
+		if os.path.exists(catalog_dir + "catalog.json"):
+			UpdateEMSCatalog(catalog_dir)
+		else:
+			hues.warn("No catalog.json next to " + index_dir + ", the EMS mutations are not checked")
+		CheckInput(index_dir + "meta.json")
+		with open(index_dir + "meta.json") as input_meta:
+			meta = json.load(input_meta)
+		if meta.get("prefix_chr") != prefix_chr:
+			raise ValueError("The EMS catalog " + index_dir + " was built with the prefix chromosome " + \
+				str(meta.get("prefix_chr")) + ", not " + prefix_chr)
+		if "chr_offsets" not in meta:
+			raise ValueError("The EMS catalog " + index_dir + " was built by an older version, " + \
+				"please build it again (detectCOs_ems_catalog.py build)")
+		hues.log("Load EMS mutations from catalog:\t" + index_dir)
+		return EMSMutationIndex(index_dir, meta)
+
 	CheckInput(input)
+	if index_dir is None:
+		index_dir = EMSIndexDir(input)
+	index_dir = os.path.join(index_dir, "")
+	meta_file = index_dir + "meta.json"
+
+	if os.path.exists(meta_file):
+		with open(meta_file) as input_meta:
+			meta = json.load(input_meta)
+		if meta.get("prefix_chr") == prefix_chr and "chr_offsets" in meta and \
+			meta.get("sha256") == FileChecksum(input, checksums_file=index_dir + "checksums.json"):
+			hues.log("Load EMS mutations from index:\t" + index_dir)
+			return EMSMutationIndex(index_dir, meta)
+		hues.warn("EMS mutations changed, update the index:\t" + index_dir)
+
+	index_dir, meta = BuildEMSIndex(input, prefix_chr, index_dir)
+	return EMSMutationIndex(index_dir, meta)
 
-	snps_list = list()
-	snps_list2 = list()
+#==============================================================================
+
+def StreamEMSLineVCF(input_vcf:str, prefix_chr:str="Chr", batch_size:int=100000):
+	"""
+	Description:	read the candidate EMS mutations of a line (vcf of the 
+					sequenced line, AD in the FORMAT column of the first 
+					sample) by batches of lines, a row by ALT allele
+	Input:
+	- input_vcf:	variants of the line (vcf format)
+	- prefix_chr:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- batch_size:	number of vcf lines by batch
+	Output (generator), one batch per batch_size lines:
+	- [chrs, positions, alts, ADalt, depth] numpy arrays, depth is the sum 
+	of the AD of the line
+	"""
+	CheckInput(input_vcf)
 	if prefix_chr == "":
 		raise ValueError("Invalid prefix chromosome")
-	
-	with open(input, 'r') as input_file:
+
+	format_indexes = dict()
+	batch = [[], [], [], [], []]
+	nb_lines = 0
+
+	with OpenVCF(input_vcf) as input_file:
 		for lines in input_file:
 			if lines.startswith("#"):
 				# ignore all comments and header from vcf file
 				continue
 
-			line = lines.strip("\n").split("\t")		
-			chr = line[0]
+			line = lines.strip("\n").split("\t")
+			gt_index, ad_index = FormatIndexes(line[8], format_indexes)
+			if ad_index is None:
+				raise ValueError("AD field not found in FORMAT column: " + line[8])
+			info = line[9].split(":")
+			ad = [int(value) if value.isdigit() else 0 for value in info[ad_index].split(",")] \
+				if ad_index < len(info) else [0]
+			depth = sum(ad)
+			chr = ChrName(line[0], prefix_chr)
 			pos = int(line[1])
-			alt = line[3]
 
-			# correct chr if needed
-			if not chr.startswith(prefix_chr):
-				chr = prefix_chr + chr
+			for num_alt, alt in enumerate(line[4].split(","), 1):
+				batch[0].append(chr)
+				batch[1].append(pos)
+				batch[2].append(alt)
+				batch[3].append(ad[num_alt] if num_alt < len(ad) else 0)
+				batch[4].append(depth)
 
-			snp_key = chr + "_" + str(pos) + "_" + alt
-			snp_key2 = chr + "_" + str(pos)
-			snps_list.append(snp_key)
-			snps_list2.append(snp_key2)
-	
+			nb_lines += 1
+			if nb_lines == batch_size:
+				yield EMSBatchColumns(batch)
+				batch = [[], [], [], [], []]
+				nb_lines = 0
+
+	if nb_lines > 0:
+		yield EMSBatchColumns(batch)
+
+#==============================================================================
+
+def EMSBatchColumns(batch:list):
+	"""
+	Description:	convert the lists of a batch of StreamEMSLineVCF() in 
+					numpy arrays
+	Input:
+	- batch:	[chrs, positions, alts, ADalt, depth] lists
+	Output:
+	- [chrs, positions, alts, ADalt, depth] numpy arrays
+	"""
+	return [np.array(batch[0], dtype=np.str_), np.array(batch[1], dtype=np.int64), \
+		np.array(batch[2], dtype=np.str_), np.array(batch[3], dtype=np.int64), \
+		np.array(batch[4], dtype=np.int64)]
+
+#==============================================================================
+
+def EMSMutationFilter(ad_alt, depth, min_freq:float=0.15, max_freq:float=0.35, \
+	min_depth:int=0, max_depth:int=None):
+	"""
+	Description:	mutations of a batch of StreamEMSLineVCF() kept in the 
+					catalog: ADalt/depth in [min_freq, max_freq] and depth in 
+					[min_depth, max_depth]
+	Input:
+	- ad_alt, depth:	numpy arrays
+	- min_freq, max_freq:	allele frequency window (e.g. 15-35 %)
+	- min_depth, max_depth:	depth window, max_depth = None for no maximum
+	Output:
+	- boolean numpy array
+	"""
+	if min_freq < 0 or max_freq > 1 or min_freq > max_freq:
+		raise ValueError("Invalid allele frequency window. The values must be between 0 and 1, min_freq <= max_freq !")
+
+	freq = np.divide(ad_alt, depth, out=np.zeros(len(depth), dtype=np.float64), where=depth > 0)
+	keep = (depth > 0) & (depth >= min_depth) & (freq >= min_freq) & (freq <= max_freq)
+	if max_depth is not None:
+		keep &= depth <= max_depth
+
+	return keep
+
+#==============================================================================
+
+def EMSMutationKeys(chrs, positions, alts):
+	"""
+	Description:	"chr\tpos\talt" key of each mutation (numpy array of 
+					strings), to compare the mutations of several lines
+	"""
+	keys = np.char.add(np.asarray(chrs, dtype=np.str_), "\t")
+	keys = np.char.add(keys, np.asarray(positions, dtype=np.int64).astype(np.str_))
+	keys = np.char.add(keys, "\t")
+	return np.char.add(keys, np.asarray(alts, dtype=np.str_))
+
+#==============================================================================
+
+def BuildEMSCatalog(ems_lines:OrderedDict, catalog_dir:str, prefix_chr:str, \
+	min_freq:float=0.15, max_freq:float=0.35, min_depth:int=0, max_depth:int=None, \
+	batch_size:int=100000):
+	"""
+	Description:	build the catalog of the EMS mutations of one or several 
+					lines from their vcf: the mutations are filtered on their
+					allele frequency and their depth (see EMSMutationFilter()),
+					the mutations found in several lines are removed. Each 
+					line is saved in catalog_dir/line_name/ in the format of
+					BuildEMSIndex(), this directory is given to 
+					ReadRecombinedOffspringVCF() instead of the vcf of the 
+					filtered EMS mutations.
+	Input:
+	- ems_lines[line_name] = vcf of the line (see StreamEMSLineVCF())
+	- catalog_dir:	output directory
+	- prefix_chr:	Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- min_freq, max_freq, min_depth, max_depth:	see EMSMutationFilter()
+	- batch_size:	see StreamEMSLineVCF()
+	Output:
+	- catalog, content of catalog_dir/catalog.json: 
+	{"prefix_chr", "filters", "lines": {line_name: {"vcf", "sha256", 
+	"index_dir", "nb_filtered", "nb_shared", "nb_mutations"}}}
+	"""
+	hues.info("Build EMS catalog")
+	catalog_dir = os.path.join(catalog_dir, "")
+	filters = {"min_freq": min_freq, "max_freq": max_freq, "min_depth": min_depth, "max_depth": max_depth}
+
+	# filtered mutations of each line, a mutation once by line
+	mutations = OrderedDict()
+	for line_name, input_vcf in ems_lines.items():
+		columns = [[], [], []]
+		for chrs, positions, alts, ad_alt, depth in StreamEMSLineVCF(input_vcf, prefix_chr, batch_size):
+			keep = EMSMutationFilter(ad_alt, depth, min_freq, max_freq, min_depth, max_depth)
+			for column, values in zip(columns, [chrs, positions, alts]):
+				column.append(values[keep])
+		chrs, positions, alts = [np.concatenate(column) if len(column) else np.array([], dtype=dtype) \
+			for column, dtype in zip(columns, [np.str_, np.int64, np.str_])]
+		keys = EMSMutationKeys(chrs, positions, alts)
+		# first occurrence of each mutation, in the order of the vcf
+		first = np.sort(np.unique(keys, return_index=True)[1])
+		mutations[line_name] = [chrs[first], positions[first], alts[first], keys[first]]
+		hues.log(str(len(first)) + " EMS mutations of " + line_name + " in the frequency and depth windows")
+
+	# mutations found in several lines
+	all_keys = np.concatenate([line_mutations[3] for line_mutations in mutations.values()]) \
+		if len(mutations) else np.array([], dtype=np.str_)
+	unique_keys, counts = np.unique(all_keys, return_counts=True)
+	shared_keys = unique_keys[counts > 1]
+
+	catalog = {"prefix_chr": prefix_chr, "filters": filters, "lines": OrderedDict()}
+	for line_name, (chrs, positions, alts, keys) in mutations.items():
+		specific = ~np.isin(keys, shared_keys)
+		index_dir = catalog_dir + line_name + "/"
+		input_vcf = ems_lines[line_name]
+		meta = {"vcf": os.path.abspath(input_vcf), 
+			"sha256": FileChecksum(input_vcf, checksums_file=catalog_dir + "checksums.json"), 
+			"prefix_chr": prefix_chr, "line": line_name, "filters": filters}
+		meta = SaveEMSIndex(index_dir, chrs[specific], positions[specific], alts[specific], meta)
+		catalog["lines"][line_name] = {"vcf": meta["vcf"], "sha256": meta["sha256"], 
+			"index_dir": index_dir, "nb_filtered": len(keys), 
+			"nb_shared": int(len(keys) - specific.sum()), "nb_mutations": meta["nb_mutations"]}
+		hues.log(str(len(keys) - specific.sum()) + " EMS mutations of " + line_name + " shared with other lines removed")
+
+	with open(catalog_dir + "catalog.json", "w") as output:
+		json.dump(catalog, output, indent=1)
+	hues.log("EMS catalog saved in\t" + catalog_dir)
+
+	return catalog
+
+#==============================================================================
+
+def UpdateEMSCatalog(catalog_dir:str):
+	"""
+	Description:	build again a catalog of BuildEMSCatalog(), with the same 
+					lines and filters, if the vcf of one of its lines changed 
+					(other sha256 than in catalog.json). All the lines are 
+					built again: the mutations shared with the changed line 
+					may change. A line whose vcf was removed is not checked.
+	Input:
+	- catalog_dir:	directory of the catalog
+	Output:
+	- catalog, content of catalog_dir/catalog.json
+	"""
+	catalog_dir = os.path.join(catalog_dir, "")
+	CheckInput(catalog_dir + "catalog.json")
+	with open(catalog_dir + "catalog.json") as input_catalog:
+		catalog = json.load(input_catalog, object_pairs_hook=OrderedDict)
+
+	changed = [line_name for line_name, line in catalog["lines"].items() \
+		if os.path.exists(line["vcf"]) and line["sha256"] != \
+		FileChecksum(line["vcf"], checksums_file=catalog_dir + "checksums.json")]
+	if not changed:
+		return catalog
+
+	hues.warn("EMS mutations of " + ", ".join(changed) + " changed, update the catalog:\t" + catalog_dir)
+	return BuildEMSCatalog(OrderedDict((line_name, line["vcf"]) for line_name, line \
+		in catalog["lines"].items()), catalog_dir, catalog["prefix_chr"], **catalog["filters"])
 
-	return snps_list, snps_list2
 
 ###############################################################################
 
-def IdentifyGeno(chr, pos, alt_list, geno, snps_list_line1, snps_list_line2, 
+def IdentifyGeno(chr, pos, alt_list, geno, ems_line1, ems_line2, 
 				 geno_ref, geno_alt, geno_line1, geno_line2):
-	
+	"""
+	Description:	genotype of an offspring SNP, the ALT alleles that are 
+					EMS mutations of a line give the genotype of the line
+	Input:
+	- alt_list:		ALT alleles of the SNP (ALT column of the vcf)
+	- geno:			GT of the offspring
+	- ems_line1, ems_line2:	output of ReadEMSline()
+	Output:
+	- final_geno
+	"""
 	if geno == "./.":
 		final_geno = "NA"
 	
@@ -406,18 +1498,12 @@ def IdentifyGeno(chr, pos, alt_list, geno, snps_list_line1, snps_list_line2,
 			if gt == "0":
 				genotype.append(geno_ref)
 			else :
-				# define snp_key
-				if gt =="1":
-					snp_key = chr + "_" + str(pos) + "_" + alt_list[0]
-				elif gt =="2":
-					snp_key = chr + "_" + str(pos) + "_" + alt_list[1]
-				elif gt =="3":
-					snp_key = chr + "_" + str(pos) + "_" + alt_list[2]
+				alt = alt_list[int(gt) - 1]
 				
 				# define associated genotype
-				if snp_key in snps_list_line1:
-						genotype.append(geno_line1)
-				elif snp_key in snps_list_line2:
+				if (chr, pos, alt) in ems_line1:
+					genotype.append(geno_line1)
+				elif (chr, pos, alt) in ems_line2:
 					genotype.append(geno_line2)
 				else:
 					genotype.append(geno_alt)
@@ -434,18 +1520,25 @@ def IdentifyGeno(chr, pos, alt_list, geno, snps_list_line1, snps_list_line2,
 
 def ReadRecombinedOffspringVCF(input_vcf:str, input_ems_line1: str, input_ems_line2: str, 
 	parental_snps:OrderedDict, geno_ref:str, geno_alt:str, geno_line1:str, geno_line2:str, 
-	analyze_id:str, prefix_chr:str="Chr"):
+	analyze_id:str, prefix_chr:str="Chr", region:str=None, \
+	snps_log:bool=True, compress_log:bool=False):
 	"""
 	Description: create 2 dictionnaries containing all SNPs per chromosome and 
 	the last SNPs per chromosome
 	Input: 
 	- input_vcf:		SNP markers between offspring lines (vcf format).
+	- input_ems_line1, input_ems_line2:	EMS mutations of each line (vcf 
+						format, indexed once by ReadEMSline()) or directory of 
+						the line in a catalog (see BuildEMSCatalog())
 	- parental_snps:	first element in output of ReadParentalVCF()
 	- geno_ref: 		reference genotype 
 	- geno_alt: 		alternative genotype
 	- geno_line1:		genotype of EMS line 1
 	- geno_line2:		genotype of EMS line 2
 	- prefix_chr: 		Prefix of the chromosome number (e.g. "Chr", "chr", etc.)
+	- region:			chromosome to read (see OpenVCF()), None to read all
+	- snps_log:		write the offspring specific SNPs in a log file
+	- compress_log:		gzip the log file (see SnpLogFile())
 	Output:
 	- info_snps[chr_pos] = [chr,pos,GT,ADref,ADalt,genotype]
 	- info_last_snps[chr] = position-last-snp-per-chr 
@@ -458,7 +1551,6 @@ def ReadRecombinedOffspringVCF(input_vcf:str, input_ems_line1: str, input_ems_li
 	# Prepare log directory and remove files if already exist
 	log_path = os.path.dirname(__file__) + "/log/" + analyze_id + "/"
 
-	RemoveFile(log_path + "ReadOffsrpingVCF_new_snps.log")
 	RemoveFile(log_path + "ReadOffsrpingVCF_weird_snps.log")
 	CheckInput(input_vcf)
 
@@ -468,10 +1560,11 @@ def ReadRecombinedOffspringVCF(input_vcf:str, input_ems_line1: str, input_ems_li
 	new_snp = 0
 	unknown_snps = 0
 
-	snps_list_line1 = ReadEMSline(input_ems_line1, prefix_chr)
-	snps_list_line2 = ReadEMSline(input_ems_line2, prefix_chr)
+	ems_line1 = ReadEMSline(input_ems_line1, prefix_chr)
+	ems_line2 = ReadEMSline(input_ems_line2, prefix_chr)
 
-	with open(input_vcf, 'r') as input_file:
+	with SnpLogFile(log_path + "ReadOffsrpingVCF_new_snps.log", snps_log, compress_log) as new_snps_log, \
+		OpenVCF(input_vcf, region, prefix_chr) as input_file:
 		for line in input_file:
 			if line.startswith("#"):
 				# ignore all comments and header from vcf file
@@ -494,20 +1587,16 @@ def ReadRecombinedOffspringVCF(input_vcf:str, input_ems_line1: str, input_ems_li
 			geno = lines[9].split(":")[0]
 
 			ref_supp = lines[9].split(":")[1].split(",")[0]
-			alt_list = lines[9].split(":")[1].split(",")[1:]
+			alt_supp = lines[9].split(":")[1].split(",")[1:]
+			alt_list = lines[4].split(",")
 
 			if key in parental_snps.keys():
-				info_snps[key] = [chr, pos, geno, ref_supp, ",".join(alt_list), 
-						IdentifyGeno(chr, pos, alt_list, geno, snps_list_line1, snps_list_line2, 
+				info_snps[key] = [chr, pos, geno, ref_supp, ",".join(alt_supp), 
+						IdentifyGeno(chr, pos, alt_list, geno, ems_line1, ems_line2, 
 				   		geno_ref, geno_alt, geno_line1, geno_line2)]
 			else:
 				new_snp +=1
-				try:
-					os.makedirs(log_path)
-				except FileExistsError: ## pass if directory already exists
-					pass
-				with open(log_path + "ReadOffsrpingVCF_new_snps.log","a+") as logfile:
-					logfile.write(line) 
+				new_snps_log.write(line)
 
 			if chr in info_last_snps.keys():
 				if pos > info_last_snps[chr]:
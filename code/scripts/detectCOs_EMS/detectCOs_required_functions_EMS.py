@@ -18,6 +18,79 @@ import math
 
 #==============================================================================
 
+# Integer code of the genotype (GT field of the vcf) of each SNP, used to store
+# SNPs in numpy arrays instead of strings
+GT_OTHER = -1 # e.g. "1/2" or "./."
+GT_HOMO_REF = 0 # "0/0"
+GT_HETERO = 1 # "0/1"
+GT_HOMO_ALT = 2 # "1/1"
+GT_CODES = {"0/0": GT_HOMO_REF, "0/1": GT_HETERO, "1/1": GT_HOMO_ALT}
+
+#==============================================================================
+
+# Integer code of the genotype of a window, output of GetGenoWindowsnpsArray()
+GENO_NA = -1
+GENO_HOMO_REF = 0
+GENO_HETERO = 1
+GENO_HOMO_ALT = 2
+
+def GenoNames(genoRef:str, genoAlt:str):
+    """
+    Description:    names of the genotype codes of the windows
+    Output: geno_names[code] = genotype, with geno_names[GENO_NA] = 'NA'
+    """
+    return [genoRef, genoRef + "/" + genoAlt, genoAlt, 'NA']
+
+#==============================================================================
+
+def RoundArray(values, decimals:int=3):
+    """
+    Description:    round each value like the builtin round(value, decimals).
+                    np.round() scales the values by 10**decimals, which can
+                    move a value close to a tie (e.g. 0.0005) on the wrong
+                    side: these values are rounded one by one with round().
+    Input:  values = numpy array of floats
+    Output: numpy array of the rounded values
+    """
+    rounded = np.round(values, decimals)
+    scaled = values * 10**decimals
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in near_tie:
+        rounded[i] = round(float(values[i]), decimals)
+    return rounded
+
+#==============================================================================
+
+def GetGenoWindowsnpsArray(ADref, ADalt, depth, No_EMS_freq: float = 0.1, depth_division_th: float = 1.0):
+    """
+    Determine the genotype of several windows at once, see GetGenoWindowsnps().
+
+    Parameters:
+    - ADref, ADalt, depth: numpy arrays (one value by window).
+    - No_EMS_freq: Frequency threshold below which a genotype is considered not EMS (mutated).
+    - depth_division_th: Depth threshold to consider for genotyping.
+
+    Returns:
+    - [ratio_ADref_DP, ratio_ADalt_DP, geno_codes]: numpy arrays, geno_codes = GENO_HOMO_REF
+      (genoRef), GENO_HOMO_ALT (genoAlt) or GENO_NA (see GenoNames()).
+    """
+    ADref = np.asarray(ADref, dtype=np.float64)
+    ADalt = np.asarray(ADalt, dtype=np.float64)
+    depth = np.asarray(depth, dtype=np.float64)
+
+    # Calculate the allele frequency ratios (0.0 if DP == 0)
+    covered = depth != 0
+    safe_depth = np.where(covered, depth, 1.0)
+    ratio_ADref_DP = np.where(covered, RoundArray(ADref / safe_depth, 3), 0.0)
+    ratio_ADalt_DP = np.where(covered, RoundArray(ADalt / safe_depth, 3), 0.0)
+
+    # Determine the genotype based on the ratios and depth threshold
+    geno_codes = np.where(ratio_ADalt_DP >= No_EMS_freq, GENO_HOMO_REF, GENO_HOMO_ALT)
+    geno_codes[depth < 10 * depth_division_th] = GENO_NA
+
+    return [ratio_ADref_DP, ratio_ADalt_DP, geno_codes]
+
+
 def GetGenoWindowsnps(cur_window: list, genoRef: str, genoAlt: str, No_EMS_freq: float = 0.1, depth_division_th: float = 1.0):
     """
     Determine the genotype based on the allele frequency ratios (ADref/DP and ADalt/DP).
@@ -32,28 +105,12 @@ def GetGenoWindowsnps(cur_window: list, genoRef: str, genoAlt: str, No_EMS_freq:
     Returns:
     - cur_geno: List with start, stop positions, ADref/DP, ADalt/DP, and inferred genotype.
     """
-    # Unpack the current window details
     start, stop, ADref, ADalt, depth = cur_window
+    ratio_ADref_DP, ratio_ADalt_DP, geno_codes = GetGenoWindowsnpsArray([ADref], [ADalt], [depth], \
+        No_EMS_freq, depth_division_th)
 
-    # Calculate the allele frequency ratios
-    if depth == 0:
-        ratio_ADref_DP = ratio_ADalt_DP = 0.0
-    else:
-        ratio_ADref_DP = round(ADref / depth, 3)
-        ratio_ADalt_DP = round(ADalt / depth, 3)
-
-    # Initialize the genotype determination as 'NA'
-    genotype = 'NA'
-
-    # Determine the genotype based on the ratios and depth threshold
-    if depth >= 10 * depth_division_th:  # Adjust the multiplier as needed
-        if  ratio_ADalt_DP >= No_EMS_freq:
-            genotype = genoRef
-        else:
-            genotype = genoAlt
-
-    # Compile the current genotype information
-    cur_geno = [start, stop, ratio_ADref_DP, ratio_ADalt_DP, genotype]
+    cur_geno = [start, stop, ratio_ADref_DP[0].item(), ratio_ADalt_DP[0].item(), \
+        GenoNames(genoRef, genoAlt)[geno_codes[0]]]
 
     return cur_geno
 
@@ -10,178 +10,218 @@
 # Version		:	2.0
 #==============================================================================
 
-import hues
+import hues, os, sys
+import numpy as np
 from collections import OrderedDict
+# detectCOs_genotype_track.py is shared by detectCOs_classic and detectCOs_EMS
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detectCOs_genotype_track import GenotypeTrack
 from detectCOs_required_functions_EMS import *
 
 #==============================================================================
 
-def ParentalSlidingWindowSNPs(parental_snps: OrderedDict, snps_per_window: int = 20):
+def SnpCountWindowsBorders(nb_snps: int, snps_per_window: int = 20):
+    '''
+    Description: borders of the sliding windows of a fixed number of SNPs on a chromosome.
+    Input: 
+        - nb_snps: number of SNPs of the chromosome
+        - snps_per_window: fixed number of SNPs (at least 2)
+
+    Output: 
+        - first, last: numpy arrays, window i contains the SNPs first[i] to last[i] - 1
+        - tail: message of the last windows ("" if no SNP is left)
+    
+    The first two windows contain half_window_size SNPs each. The next windows contain
+    snps_per_window SNPs and start half_window_size SNPs after the previous window. The
+    remaining SNPs give one or two last windows of at most half_window_size SNPs.
+    '''
+    half_window_size = snps_per_window // 2
+    if half_window_size < 1:
+        raise ValueError("Invalid number of SNPs per window. This value must be at least 2 !")
+
+    # first two half-sized windows
+    nb_half = min(nb_snps // half_window_size, 2)
+    first = [np.arange(nb_half) * half_window_size]
+    last = [first[0] + half_window_size]
+    remaining = nb_half * half_window_size
+
+    # full windows starting at the midpoint of the previous window
+    if nb_half == 2:
+        nb_full = max(0, (nb_snps - 2 * half_window_size - snps_per_window) // half_window_size + 1)
+        first.append(2 * half_window_size + np.arange(nb_full) * half_window_size)
+        last.append(first[1] + snps_per_window)
+        remaining += nb_full * half_window_size
+
+    # last windows with the remaining SNPs
+    nb_remaining = nb_snps - remaining
+    tail = ""
+    if nb_remaining >= 2 * half_window_size:
+        tail = "Creating two half-sized windows"
+        tail_first = [remaining, remaining + half_window_size]
+        tail_last = [remaining + half_window_size, remaining + 2 * half_window_size]
+    elif nb_remaining >= half_window_size:
+        tail = "Creating one half-sized window"
+        tail_first = [remaining, remaining + half_window_size][:1 + (nb_remaining > half_window_size)]
+        tail_last = [remaining + half_window_size, nb_snps][:1 + (nb_remaining > half_window_size)]
+    elif nb_remaining > 0:
+        tail = "Creating last window with remaining SNPs"
+        tail_first = [remaining]
+        tail_last = [nb_snps]
+    else:
+        tail_first = tail_last = []
+    first.append(np.array(tail_first, dtype=np.int64))
+    last.append(np.array(tail_last, dtype=np.int64))
+
+    return np.concatenate(first).astype(np.int64), np.concatenate(last).astype(np.int64), tail
+
+#==============================================================================
+
+def ChromosomeRuns(chrs: list):
+    '''
+    Description: consecutive SNPs of the same chromosome.
+    Input: 
+        - chrs: chromosome of each SNP
+    Output: 
+        - list of [chr, first SNP, last SNP + 1]
+    '''
+    if len(chrs) == 0:
+        return []
+    chrs = np.array(chrs)
+    borders = [0] + (np.flatnonzero(chrs[1:] != chrs[:-1]) + 1).tolist() + [len(chrs)]
+    return [[str(chrs[begin]), begin, end] for begin, end in zip(borders[:-1], borders[1:])]
+
+#==============================================================================
+
+def ParentalSnpRuns(parental_snps: OrderedDict):
+    '''
+    Description: positions and chromosomes of the parental SNPs, shared by the
+                 windows of any number of SNPs.
+    Input: 
+        - parental_snps:	first element of the output of ReadParentalVCF()
+    Output: 
+        - [runs, positions], runs: output of ChromosomeRuns(), positions: position of each SNP
+    '''
+    values = list(parental_snps.values())
+    return [ChromosomeRuns([snp_info[0] for snp_info in values]), [snp_info[1] for snp_info in values]]
+
+#==============================================================================
+
+def ParentalSlidingWindowSNPs(parental_snps: OrderedDict, snps_per_window: int = 20, parental_runs: list = None):
     '''
     Description: determine the number of SNPs per window (key= chr_window). 
     Input: 
         - parental_snps:	first element of the output of ReadParentalVCF()
         - snps_per_window: fixed number of SNPs
+        - parental_runs: output of ParentalSnpRuns(), computed from parental_snps if None
 
     Output: 
         - snps_window[chr_num-window] = [start, stop, nb-snps] 
     
     Determine the SNP distribution over sliding windows, each containing a fixed number of SNPs,
-    with each new window starting at the midpoint of the previous window in terms of SNP count.
+    with each new window starting at the midpoint of the previous window in terms of SNP count
+    (see SnpCountWindowsBorders()).
     '''
+    if parental_runs is None:
+        parental_runs = ParentalSnpRuns(parental_snps)
+    runs, positions = parental_runs
+
     snps_window = OrderedDict()
-    current_snps = []  # To keep track of SNPs in the current window
-    cur_chr = ""  # Current chromosome
-    window_index = 1  # Window index for naming
-    half_window_size = snps_per_window // 2
-    initial_window = True  # To control the first two special windows
-    special_window_count = 0  # To keep track of the first two windows
-
-    for key, snp_info in parental_snps.items():
-        chr, pos, _ = snp_info
-
-        if chr != cur_chr:
-            if current_snps:
-                try:
-                    if len(current_snps) > half_window_size:
-                        snps_window[f"{cur_chr}_{window_index}"] = [current_snps[0], current_snps[half_window_size-1], half_window_size]
-                        window_index += 1
-                        snps_window[f"{cur_chr}_{window_index}"] = [current_snps[half_window_size], current_snps[-1], len(current_snps) - half_window_size]
-                    else:
-                        snps_window[f"{cur_chr}_{window_index}"] = [current_snps[0], current_snps[-1], len(current_snps)]
-                except IndexError as e:
-                    print(f"Error handling remaining SNPs on chromosome change: {str(e)}")
-            cur_chr = chr
-            current_snps = []
-            window_index = 1
-            initial_window = True
-            special_window_count = 0
-
-        current_snps.append(pos)
-
-        current_window_size = half_window_size if initial_window or special_window_count < 2 else snps_per_window
-        if len(current_snps) == current_window_size:
-            start_pos = current_snps[0]
-            stop_pos = current_snps[-1]
-            snps_window[f"{chr}_{window_index}"] = [start_pos, stop_pos, len(current_snps)]
-            window_index += 1
-            if initial_window:
-                if special_window_count < 1:
-                    current_snps = current_snps[half_window_size:]
-                else:
-                    initial_window = False
-                    current_snps = []
-                special_window_count += 1
-            else:
-                current_snps = current_snps[half_window_size:]
-
-    if current_snps:
-        try:
-            if len(current_snps) > half_window_size:
-                snps_window[f"{cur_chr}_{window_index}"] = [current_snps[0], current_snps[half_window_size-1], half_window_size]
-                window_index += 1
-                snps_window[f"{cur_chr}_{window_index}"] = [current_snps[half_window_size], current_snps[-1], len(current_snps) - half_window_size]
-            else:
-                snps_window[f"{cur_chr}_{window_index}"] = [current_snps[0], current_snps[-1], len(current_snps)]
-        except IndexError as e:
-            print(f"Error handling final SNPs: {str(e)}")
+    for cur_chr, begin, end in runs:
+        first, last, tail = SnpCountWindowsBorders(end - begin, snps_per_window)
+        for window_index, (start, stop) in enumerate(zip((begin + first).tolist(), (begin + last).tolist()), 1):
+            snps_window[f"{cur_chr}_{window_index}"] = [positions[start], positions[stop - 1], stop - start]
 
     return snps_window
 
 #==============================================================================
 
-def OffspringSlidingWindowBySNPs(offspring_snps: OrderedDict, snps_per_window: int = 20):
+def OffspringCumulativeSNPs(offspring_snps: OrderedDict):
+    '''
+    Description: cumulative sums of the offspring SNPs, shared by the windows of
+                 any number of SNPs.
+    Input: 
+        - offspring_snps:	first element of the output of ReadOffspringVCF()
+    Output: 
+        - [runs, positions, cumsum], runs: output of ChromosomeRuns(), positions: position
+          of each SNP, cumsum[i] = sums of [ADref, ADalt, nbSNP_Aref, nbSNP_Aalt] of the
+          first i SNPs (numpy array of shape (nb_snps + 1, 4))
+    '''
+    values = list(offspring_snps.values())
+    gts = np.array([snp_info[2] for snp_info in values], dtype=np.str_)
+    # ADref, ADalt, SNP with a reference allele, SNP with an alternative allele
+    snps_values = np.zeros((len(values), 4), dtype=np.int64)
+    snps_values[:, 0] = [int(snp_info[3]) for snp_info in values]
+    snps_values[:, 1] = [int(snp_info[4]) for snp_info in values]
+    if len(values) > 0:
+        snps_values[:, 2] = np.char.find(gts, "0") >= 0
+        snps_values[:, 3] = np.char.find(gts, "1") >= 0
+    cumsum = np.zeros((len(values) + 1, 4), dtype=np.int64)
+    np.cumsum(snps_values, axis=0, out=cumsum[1:])
+
+    return [ChromosomeRuns([snp_info[0] for snp_info in values]), [snp_info[1] for snp_info in values], cumsum]
+
+#==============================================================================
+
+def OffspringSlidingWindowBySNPs(offspring_snps: OrderedDict, snps_per_window: int = 20, \
+        offspring_cumsum: list = None):
     '''
     Description: determine the number of SNPs per window (key= chr_window). 
     Input: 
         - offspring_snps:	first element of the output of ReadOffspringVCF()
         - snps_per_window: fixed number of SNPs
+        - offspring_cumsum: output of OffspringCumulativeSNPs(), computed from 
+          offspring_snps if None
 
     Output: 
-        - snps_window[chr_num-window] = [start, stop, nb-snps] 
+        - snps_window[chr_num-window] = [start, stop, ADref, ADalt, DP, nbSNP_Aref, nbSNP_Aalt, nb-snps] 
     
     Determine the SNP distribution over sliding windows, each containing a fixed number of SNPs,
-    with each new window starting at the midpoint of the previous window in terms of SNP count.
+    with each new window starting at the midpoint of the previous window in terms of SNP count
+    (see SnpCountWindowsBorders()). The values of the windows are differences of cumulative
+    sums of the SNPs.
     '''    
+    if offspring_cumsum is None:
+        offspring_cumsum = OffspringCumulativeSNPs(offspring_snps)
+    runs, positions, cumsum = offspring_cumsum
+
     snps_window = OrderedDict()
-    current_snps = []
-    cur_chr = ""
-    window_index = 1
-    initial_window = True
-    special_window_count = 0
-
-    for key, snp_info in offspring_snps.items():
-        chr, pos, GT, ADref, ADalt, genotype = snp_info
-        ADref, ADalt = int(ADref), int(ADalt)
-
-        if chr != cur_chr:
-            if current_snps:  # Handle the last two windows of the previous chromosome
-                process_final_windows(current_snps, snps_window, cur_chr, window_index, snps_per_window)
-                current_snps = []  # Ensure no carry-over of SNPs
-            # Reset for new chromosome
-            cur_chr = chr
-            window_index = 1
-            initial_window = True
-            special_window_count = 0
-
-        current_snps.append((pos, ADref, ADalt, GT))
-
-        # Determine if current window should be processed
-        if initial_window:
-            if len(current_snps) == snps_per_window // 2:
-                snps_window[f"{chr}_{window_index}"] = create_window_output(current_snps, chr, window_index)
-                window_index += 1
-                current_snps = []
-                special_window_count += 1
-                if special_window_count == 2:
-                    initial_window = False
-        elif len(current_snps) >= snps_per_window:
-            snps_window[f"{chr}_{window_index}"] = create_window_output(current_snps, chr, window_index)
-            window_index += 1
-            current_snps = current_snps[len(current_snps) // 2:]  # Start next window at midpoint of current
-
-    # Handle any remaining SNPs for the last window of the last chromosome
-    if current_snps:
-        process_final_windows(current_snps, snps_window, cur_chr, window_index, snps_per_window)
-        current_snps = []  # Ensure no carry-over of SNPs
+    for cur_chr, begin, end in runs:
+        first, last, tail = SnpCountWindowsBorders(end - begin, snps_per_window)
+        if tail != "":
+            print(tail)
+        first += begin
+        last += begin
+        sums = (cumsum[last] - cumsum[first]).tolist()
+        for window_index, (start, stop, (ad_ref, ad_alt, nb_ref, nb_alt)) in enumerate(zip(first.tolist(), \
+                last.tolist(), sums), 1):
+            snps_window[f"{cur_chr}_{window_index}"] = [positions[start], positions[stop - 1], \
+                ad_ref, ad_alt, ad_ref + ad_alt, nb_ref, nb_alt, stop - start]
 
     return snps_window
 
-def create_window_output(snps, chr, window_index):
-    ADref_sum = sum(snp[1] for snp in snps)
-    ADalt_sum = sum(snp[2] for snp in snps)
-    DP_sum = ADref_sum + ADalt_sum
-    return [
-        snps[0][0],  # start_pos
-        snps[-1][0],  # stop_pos
-        ADref_sum, 
-        ADalt_sum, 
-        DP_sum,
-        sum("0" in snp[3] for snp in snps),  # nbSNP_Aref
-        sum("1" in snp[3] for snp in snps),  # nbSNP_Aalt
-        len(snps)  # count of SNPs
-    ]
-
-def process_final_windows(current_snps, snps_window, chr, window_index, snps_per_window):
-    half_window_size = snps_per_window // 2
-    try:
-        if len(current_snps) >= 2 * half_window_size:
-            print("Creating two half-sized windows")
-            snps_window[f"{chr}_{window_index}"] = create_window_output(current_snps[:half_window_size], chr, window_index)
-            window_index += 1
-            snps_window[f"{chr}_{window_index}"] = create_window_output(current_snps[half_window_size:2*half_window_size], chr, window_index)
-        elif len(current_snps) >= half_window_size:
-            print("Creating one half-sized window")
-            snps_window[f"{chr}_{window_index}"] = create_window_output(current_snps[:half_window_size], chr, window_index)
-            window_index += 1
-            if len(current_snps) > half_window_size:
-                snps_window[f"{chr}_{window_index}"] = create_window_output(current_snps[half_window_size:], chr, window_index)
-                window_index += 1
-        else:
-            print("Creating last window with remaining SNPs")
-            snps_window[f"{chr}_{window_index}"] = create_window_output(current_snps, chr, window_index)
-    except IndexError as e:
-        print(f"Error processing final windows: {str(e)}")
+#==============================================================================
+
+def GenoSnpsWindowsnps(snps_window:OrderedDict, geno_ref:str, geno_alt:str, \
+		ratio_min_homo:float=0.1, depth_division_th:float=1.0):
+	"""
+	Description:	GetGenoWindowsnps() of all windows, computed with one call 
+					of GetGenoWindowsnpsArray()
+	Input:
+	- snps_window[chr_num-window] = [start, stop, ADref, ADalt, DP]
+	Output:
+	- geno_window[chr_num-window] = [start, stop, ratio_ADref/DP, 
+									ratio_ADalt_DP, genotype]
+	"""
+	values = list(snps_window.values())
+	ratio_ref, ratio_alt, geno_codes = GetGenoWindowsnpsArray([value[2] for value in values], \
+		[value[3] for value in values], [value[4] for value in values], ratio_min_homo, depth_division_th)
+	geno_names = GenoNames(geno_ref, geno_alt)
+
+	geno_window = OrderedDict()
+	for key_window, value, cur_ratio_ref, cur_ratio_alt, geno_code in zip(snps_window, values, \
+			ratio_ref.tolist(), ratio_alt.tolist(), geno_codes.tolist()):
+		geno_window[key_window] = value[:2] + [cur_ratio_ref, cur_ratio_alt, geno_names[geno_code]]
+	return geno_window
 
 #==============================================================================
 
@@ -217,7 +257,6 @@ def NormalizeOffspringSlidingWindowsnps(parental_snps_window:OrderedDict, \
 
 	snps_window = OrderedDict() 
 	# snps_window[chr_window] = [start, stop, ADref, ADalt, DP]
-	geno_window = OrderedDict() 
 	# geno_window[chr_window] = [start, stop, ADref/DP, ADalt/DP, probHomoA,probHeteroAB, probHomoB, genotype]
 	nb_window_chr = OrderedDict()
 	# nb_window_chr[chr] = nb_window
@@ -242,7 +281,6 @@ def NormalizeOffspringSlidingWindowsnps(parental_snps_window:OrderedDict, \
 				cur_window = [start, stop, ad_ref, ad_alt, dp]
 									
 			snps_window[key_window] = cur_window
-			geno_window[key_window] = GetGenoWindowsnps(cur_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
 
 			# save the last window of each chromosome in a dictionnary nb_window_chr[chr]=num_last_window
 			chr = key_window.split("_")[0]
@@ -253,13 +291,15 @@ def NormalizeOffspringSlidingWindowsnps(parental_snps_window:OrderedDict, \
 			else:
 				nb_window_chr[chr] = win_id
 
+	geno_window = GenoSnpsWindowsnps(snps_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
+
 	return snps_window, geno_window, nb_window_chr
 
 #==============================================================================
 
 def SmoothNormalizedOsffspringSlidingWindowsnps(offspring_snps_window:OrderedDict,\
 		nb_windows_chr:OrderedDict, geno_ref:str,\
-		geno_alt:str, ratio_min_homo:float=0.1, depth_division_th:float=1.0):           # modify MY
+		geno_alt:str, ratio_min_homo:float=0.1, depth_division_th:float=1.0, genotype_track:bool=False):           # modify MY
 	"""
 	Description:	determine the sum of each parameters of all SNPs in the
 					window. Paramaters studied: ADref, ADalt, DP, SNP with at 
@@ -281,6 +321,7 @@ def SmoothNormalizedOsffspringSlidingWindowsnps(offspring_snps_window:OrderedDic
 	- nb_window_chr[chr_num-window] = number of window by chromosome
 	- check_smoothed : allow to check whether smoothing takes into account the right windows
 	check_smoothed[chr_window] = [start_window, stop_window, start_smooth, stop_smooth] 
+	- if genotype_track: GenotypeTrack of geno_window (4th output)
 	Notes: 
 	- All windows overlapping or inside centromeric region are associated 
 	with NA genotype. But to smooth window next to centromeric region, we use 
@@ -292,7 +333,6 @@ def SmoothNormalizedOsffspringSlidingWindowsnps(offspring_snps_window:OrderedDic
 	hues.info("Smooth normalized offspring sliding window")
 
 	snps_window = OrderedDict() 
-	geno_window = OrderedDict()
 	nb_window_chr = OrderedDict()
 	check_smoothed = OrderedDict()
 
@@ -331,10 +371,13 @@ def SmoothNormalizedOsffspringSlidingWindowsnps(offspring_snps_window:OrderedDic
 			
 			snps_window[key_window] = cur_window
 			
-			geno_window[key_window] = GetGenoWindowsnps(cur_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
-			
 			check_smoothed[key_window] = [pos_start_cur_win, pos_stop_cur_win, \
 				start_win_smooth, stop_win_smooth, win]
 
+	geno_window = GenoSnpsWindowsnps(snps_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
+
+	if genotype_track:
+		return snps_window, geno_window, check_smoothed, \
+			GenotypeTrack.from_windows(geno_window, nb_windows_chr)
 	return snps_window, geno_window, check_smoothed
 
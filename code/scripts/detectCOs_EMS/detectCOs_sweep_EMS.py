@@ -0,0 +1,282 @@
+import os, sys
+import yaml
+
+from detectCOs_read_files_EMS import *
+from detectCOs_sliding_window_EMS import *
+from detectCOs_identifyCOs_EMS import *
+from collections import OrderedDict
+
+#==============================================================================
+# Program		:	Sweep of the parameters of detectCOs EMS
+# Author		:	Mohamad Yassine [mohamad.yassine@inrae.fr]
+# Version		:	2.0
+#==============================================================================
+
+# Usage: python3 path/to/folder/detectCOs_sweep_EMS.py config_detectCOs.yaml
+#
+# Run the SNP-count windows, the normalization, the smoothing, the
+# identification of the candidate COs and the precise COs of
+# Test_laucher_With_diff_SNPs_EMS.py for every combination of the lists
+# sweep_snps_per_window and sweep_ratio_min_EMS of the config file (default:
+# [snps_per_window] and [ratio_min_EMS]).
+# The vcf files are read and the cumulative sums of the SNPs are computed once.
+# The windows of a number of SNPs do not depend on ratio_min_EMS: they are
+# computed once per number of SNPs, then only the genotypes and the COs are
+# computed for each ratio. The windows of new_snp_per_window SNPs that precise
+# the COs are computed once, with their genotypes for each ratio. The results
+# are saved in output_dir_in_polyrec/analyze_id/sweep/:
+# - <snps_per_window>_snps/: windows of snps_per_window SNPs
+# - <snps_per_window>_snps/ratio_<ratio_min_EMS>/: genotypes, candidate COs
+#   and precise COs (final COs of the combination)
+# - summary_COs.txt: number of candidate and precise COs of each combination
+
+
+###############################################################################
+
+def SweepDir(outdir:str, snps_per_window:int, ratio_min_EMS:float=None):
+    """
+    Description:    output directory of a combination of the sweep
+    Input:
+    - outdir:           output directory of the sample
+    - snps_per_window:  number of SNPs per window
+    - ratio_min_EMS:    None for the directory of the windows
+    Output:
+    - path of the directory (ends with "/")
+    """
+    sweep_dir = outdir + "sweep/" + str(snps_per_window) + "_snps/"
+    if ratio_min_EMS is not None:
+        sweep_dir = sweep_dir + "ratio_" + str(ratio_min_EMS) + "/"
+    return sweep_dir
+
+#==============================================================================
+
+def CandidateCOsLength(candidates_co:OrderedDict):
+    """
+    Description:    add the length of the COs to the candidate COs
+    Input:
+    - candidates_co:    first output of IdentifyCOs_snps()
+    Output:
+    - updated_candidates_co[chr_mean_win] = [start_win:stop_win, co_start,
+                        co_stop, co_stop - co_start, pre_geno, cur_geno]
+    """
+    updated_candidates_co = OrderedDict()
+    for chr_window, details in candidates_co.items():
+        start_win_stop_win, co_start, co_stop, pre_geno, cur_geno = details
+        updated_candidates_co[chr_window] = [start_win_stop_win, co_start, co_stop, \
+            co_stop - co_start, pre_geno, cur_geno]
+    return updated_candidates_co
+
+#==============================================================================
+
+def SweepSnpsPerWindow(config:dict, parental_snps:OrderedDict, offspring_snps:OrderedDict, \
+        snps_per_window:int, ratios_min_EMS:list, parental_runs:list=None, offspring_cumsum:list=None, \
+        genotypes_new:OrderedDict=None, identify_cos:bool=True):
+    """
+    Description:    windows of snps_per_window SNPs, and genotypes, candidate
+                    COs and precise COs of each ratio_min_EMS
+    Input:
+    - config:           config file of the launcher
+    - parental_snps:    first output of ReadParentalVCF()
+    - offspring_snps:   first output of ReadOffspringVCF()
+    - snps_per_window:  number of SNPs per window
+    - ratios_min_EMS:   list of ratio_min_EMS
+    - parental_runs:    output of ParentalSnpRuns()
+    - offspring_cumsum: output of OffspringCumulativeSNPs()
+    - genotypes_new:    second output of SweepSnpsPerWindow() for 
+                        new_snp_per_window SNPs, None to not precise the COs
+    - identify_cos:     False to compute only the genotypes of the windows
+                        (windows of new_snp_per_window SNPs)
+    Output:
+    - windows[name] = OrderedDict, outputs of the windowing, the normalization
+                      and the smoothing that do not depend on ratio_min_EMS
+    - genotypes[ratio_min_EMS][name] = OrderedDict, genotypes, candidate COs
+                      (with identify_cos) and precise COs (with genotypes_new)
+    """
+    for ratio_min_EMS in ratios_min_EMS:
+        if ratio_min_EMS <= 0 or ratio_min_EMS >= 1:
+            raise ValueError("Invalid homozygous frequency. This value must be between 0 and 1 excluded !")
+
+    windows = dict()
+    windows['parental_snps_windowsnps'] = ParentalSlidingWindowSNPs(parental_snps, \
+        snps_per_window, parental_runs)
+    windows['offspring_snps_windowsnps'] = OffspringSlidingWindowBySNPs(offspring_snps, \
+        snps_per_window, offspring_cumsum)
+
+    windows['offspring_snps_window_normalized'], genotype_window_normalized, \
+        windows['nb_windows_chr'] = NormalizeOffspringSlidingWindowsnps(
+            parental_snps_window=windows['parental_snps_windowsnps'],
+            offspring_snps_window=windows['offspring_snps_windowsnps'],
+            geno_ref=config['EMS_ref'],
+            geno_alt=config['EMS_alt'],
+            min_snp_num=config['min_snp_num'],
+            min_reads_num=config['min_reads_num'],
+            ratio_min_homo=ratios_min_EMS[0],
+            depth_division_th=config['depth_division_th']
+            )
+
+    windows['offspring_snps_window_smoothed'], genotype_window_smoothed, \
+        windows['check_smoothing'] = SmoothNormalizedOsffspringSlidingWindowsnps(
+            offspring_snps_window=windows['offspring_snps_window_normalized'],
+            nb_windows_chr=windows['nb_windows_chr'],
+            geno_ref=config['EMS_ref'],
+            geno_alt=config['EMS_alt'],
+            ratio_min_homo=ratios_min_EMS[0],
+            depth_division_th=config['depth_division_th']
+            )
+
+    genotypes = OrderedDict()
+    for ratio_min_EMS in ratios_min_EMS:
+        if ratio_min_EMS != ratios_min_EMS[0]:
+            genotype_window_normalized = GenoSnpsWindowsnps(windows['offspring_snps_window_normalized'], \
+                config['EMS_ref'], config['EMS_alt'], ratio_min_EMS, config['depth_division_th'])
+            genotype_window_smoothed = GenoSnpsWindowsnps(windows['offspring_snps_window_smoothed'], \
+                config['EMS_ref'], config['EMS_alt'], ratio_min_EMS, config['depth_division_th'])
+
+        genotypes[ratio_min_EMS] = {
+            'offspring_genotype_window_normalized': genotype_window_normalized,
+            'offspring_genotype_window_smoothed': genotype_window_smoothed}
+        if not identify_cos:
+            continue
+
+        candidates_co, db_co = IdentifyCOs_snps(genotype_window_smoothed, windows['nb_windows_chr'])
+        genotypes[ratio_min_EMS]['candidates_co'] = CandidateCOsLength(candidates_co)
+
+        if genotypes_new is not None:
+            precise_co, db_co_new = PreciseCOsEMS(
+                candidates_co=genotypes[ratio_min_EMS]['candidates_co'],
+                offspring_genotype_window=genotype_window_smoothed,
+                offspring_genotype_window_new=genotypes_new[ratio_min_EMS]['offspring_genotype_window_smoothed']
+                )
+            genotypes[ratio_min_EMS]['precise_co'] = CandidateCOsLength(precise_co)
+
+    return windows, genotypes
+
+#==============================================================================
+
+def ExportSweep(outdir:str, snps_per_window:int, windows:dict, genotypes:OrderedDict):
+    """
+    Description:    save the outputs of SweepSnpsPerWindow() in the directories
+                    of SweepDir()
+    Input:
+    - outdir:           output directory of the sample
+    - snps_per_window:  number of SNPs per window
+    - windows, genotypes:   outputs of SweepSnpsPerWindow()
+    """
+    windows_dir = SweepDir(outdir, snps_per_window)
+    os.makedirs(windows_dir, exist_ok=True)
+
+    export_dict_in_file(my_dict=windows['parental_snps_windowsnps'],
+                        output_file=windows_dir + "parental_snps_windowsnps.txt",
+                        header="chr_window\tstart\tstop\tnb_snps",
+                        overwrite=True)
+    export_dict_in_file(my_dict=windows['offspring_snps_windowsnps'],
+                        output_file=windows_dir + "offspring_snps_windowsnps.txt",
+                        header="chr_window\tstart\tstop\tADref\tADalt\tDP\tnbSNP_Aref\tnbSNP_Aalt\ttot_snps",
+                        overwrite=True)
+    export_dict_in_file(my_dict=windows['offspring_snps_window_normalized'],
+                        output_file=windows_dir + "offspring_snps_window_normalized.txt",
+                        header="chr_window\tstart\tstop\tADref\tADalt\tDP",
+                        overwrite=True)
+    export_dict_in_file(my_dict=windows['nb_windows_chr'],
+                        output_file=windows_dir + "nb_window_chr.txt",
+                        header="chr\tnb_window",
+                        overwrite=True)
+    export_dict_in_file(my_dict=windows['offspring_snps_window_smoothed'],
+                        output_file=windows_dir + "offspring_snps_window_normalized_smoothed.txt",
+                        header="chr_window\tstart\tstop\tADref\tADalt\tDP",
+                        overwrite=True)
+    export_dict_in_file(my_dict=windows['check_smoothing'],
+                        output_file=windows_dir + "check_smoothing.txt",
+                        header="chr_window\tstart_window\tstop_window\tstart_smooth\tstop_smooth\twindow_smoothed",
+                        overwrite=True)
+
+    for ratio_min_EMS, results in genotypes.items():
+        ratio_dir = SweepDir(outdir, snps_per_window, ratio_min_EMS)
+        os.makedirs(ratio_dir, exist_ok=True)
+
+        export_dict_in_file(my_dict=results['offspring_genotype_window_normalized'],
+                            output_file=ratio_dir + "offspring_genotype_window_normalized.txt",
+                            header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tgenotype",
+                            overwrite=True)
+        export_dict_in_file(my_dict=results['offspring_genotype_window_smoothed'],
+                            output_file=ratio_dir + "offspring_genotype_window_normalized_smoothed.txt",
+                            header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tgenotype",
+                            overwrite=True)
+        export_dict_in_file(my_dict=results['candidates_co'],
+                            output_file=ratio_dir + "candidateCO.txt",
+                            header="chr_mean_win\tstart_win:stop_win\tstart_co\tstop_co\t(stop_co-start_co)\tpre_geno\tcur_geno",
+                            overwrite=True)
+        if 'precise_co' in results:
+            export_dict_in_file(my_dict=results['precise_co'],
+                                output_file=ratio_dir + "preciseCOs.txt",
+                                header="chr_mean_win\tstart_win:stop_win\tstart_co\tstop_co\t(stop_co-start_co)\tpre_geno\tcur_geno",
+                                overwrite=True)
+
+
+###############################################################################
+
+if __name__ == "__main__":
+
+    print("# Load config file")
+    print("-------------------------------------")
+
+    if len(sys.argv) < 2:
+        raise ImportError("Please give the config file (.yaml) for detectCOs")
+
+    config_file = sys.argv[1]
+    with open(config_file, "r") as cf:
+        config = yaml.load(cf, Loader=yaml.FullLoader)
+
+    # Set current working directory at the root of polyrec project
+    os.chdir(config['path_to_polyrec_project'])
+
+    outdir = config['path_to_polyrec_project'] + config['output_dir_in_polyrec'] + \
+        config['analyze_id'] + "/"
+    os.makedirs(outdir + "sweep/", exist_ok=True)
+
+    snps_per_windows = config.get('sweep_snps_per_window', [config['snps_per_window']])
+    ratios_min_EMS = config.get('sweep_ratio_min_EMS', [config['ratio_min_EMS']])
+    print("Sweep snps_per_window " + str(snps_per_windows) + " x ratio_min_EMS " + str(ratios_min_EMS))
+
+    parental_snps, parental_last_snp_chr = ReadParentalVCF(
+        input_vcf=config['parental_vcf'],
+        prefix_chr=config['prefix_chr']
+        )
+    offspring_snps, offspring_last_snp_chr = ReadOffspringVCF(
+        input_vcf=config['sample_vcf'],
+        parental_snps=parental_snps,
+        prefix_chr=config['prefix_chr'],
+        geno_ref=config['genotype_ref'],
+        geno_alt=config['genotype_alt'],
+        analyze_id=config['analyze_id'],
+        snps_log=config.get('snps_log', True),
+        compress_log=config.get('compress_snps_log', False)
+        )
+
+    parental_runs = ParentalSnpRuns(parental_snps)
+    offspring_cumsum = OffspringCumulativeSNPs(offspring_snps)
+
+    # windows of new_snp_per_window SNPs, to precise the COs of each combination
+    print("\n# " + str(config['new_snp_per_window']) + " SNPs per window (precise COs)")
+    print("-------------------------------------")
+    windows_new, genotypes_new = SweepSnpsPerWindow(config, parental_snps, offspring_snps, \
+        config['new_snp_per_window'], ratios_min_EMS, parental_runs, offspring_cumsum, identify_cos=False)
+
+    summary = OrderedDict()
+    for snps_per_window in snps_per_windows:
+        print("\n# " + str(snps_per_window) + " SNPs per window")
+        print("-------------------------------------")
+        windows, genotypes = SweepSnpsPerWindow(config, parental_snps, offspring_snps, \
+            snps_per_window, ratios_min_EMS, parental_runs, offspring_cumsum, genotypes_new)
+        ExportSweep(outdir, snps_per_window, windows, genotypes)
+
+        for ratio_min_EMS, results in genotypes.items():
+            summary[str(snps_per_window) + "_snps_ratio_" + str(ratio_min_EMS)] = [snps_per_window, \
+                ratio_min_EMS, len(windows['offspring_snps_window_smoothed']), len(results['candidates_co']), \
+                len(results['precise_co'])]
+
+    print()
+    export_dict_in_file(my_dict=summary,
+                        output_file=outdir + "sweep/summary_COs.txt",
+                        header="combination\tsnps_per_window\tratio_min_EMS\tnb_windows\tnb_candidate_COs\tnb_precise_COs",
+                        overwrite=True)
@@ -36,21 +36,9 @@ if not os.path.exists(outdir):
 #outdir = "/home/mohamad.yassine/Bureau/IPS2_cluster/PolyRec/detectCOs_scripts_modify/RULES/111374_AA_A_test/"
 
 
-# Load the Excel file
-data = pd.read_excel(config['Path_info_RIL'] + "7RV498_window_call.xlsx")
-
-# Set the column names to the values of the first row
-data.columns = data.iloc[0]
-
-# Remove the first row from the dataframe
-df = data.iloc[1:].reset_index(drop=True)
-
-print(df.head())
-
-df_indexed = df.set_index('chr_window')
-
-# Now create the dictionary
-RILs = df_indexed.apply(lambda row: row.tolist(), axis=1).to_dict()
+# Load the window calls of the RIL (converted once in a cache of numpy arrays)
+RILs = ReadRILReference(config['Path_info_RIL'] + "7RV498_window_call.xlsx",
+                        cache_dir=config.get('RIL_cache_dir'))
 
 
 print("\n# STEP 8. Smooth offspring sliding window")
@@ -14,6 +14,7 @@
 
 
 import hues
+import bisect
 from collections import OrderedDict
 from detectCOs_required_functions import *
 
@@ -324,6 +325,39 @@ def IdentifyCOs_RILs(offspring_genotype_window_smoothed, nb_windows_chr):
 
 
 
+# Decision of the rules for a window: RIL_DECISIONS[(genotype_RIL, genotype
+# of the basic pipeline, response of the EMS pipeline)] = [WARNING, GT_Final]
+RIL_DECISIONS = {
+	("Col", "Col", "Yes"): ["A", "A"],
+	("Col", "Col", "No"): ["RIL", "RIL"],
+	("Col", "Col/Ct", "Yes"): ["IMPO", "NA"],
+	("Col", "Col/Ct", "No"): ["IMPO", "NA"],
+	("Col", "Ct", "Yes"): ["IMPO", "NA"],
+	("Col", "Ct", "No"): ["IMPO", "NA"],
+	("Ct", "Col", "Yes"): ["A", "A"],
+	("Ct", "Col", "No"): ["NEG_A", "A"],
+	("Ct", "Col/Ct", "Yes"): ["FALSE_A", "RIL"],
+	("Ct", "Col/Ct", "No"): ["RIL", "RIL"],
+	("Ct", "Ct", "Yes"): ["IMPO", "NA"],
+	("Ct", "Ct", "No"): ["IMPO", "NA"],
+}
+
+def RuleRIL(genotype_RIL, genotype, response):
+	"""
+	Description:	decision of the rules for a window
+	Input:
+	- genotype_RIL:	genotype of the RIL ("Col" or "Ct")
+	- genotype:		genotype of the basic pipeline
+	- response:		"Yes" if the EMS pipeline found mutations ("A"), "No" otherwise
+	Output:
+	- [WARNING, GT_Final]
+	"""
+	if genotype_RIL not in ("Col", "Ct"):
+		return ["RIL_NA", "NA"]
+	return RIL_DECISIONS.get((genotype_RIL, genotype, response), ["GT_NA", "NA"])
+
+#==============================================================================
+
 def Rules_RIls(info_RIL,offspring_EMS,offspring_basic ):
 	"""
     Analyzes genotype data across multiple datasets to determine genetic rules and discrepancies.
@@ -331,6 +365,14 @@ def Rules_RIls(info_RIL,offspring_EMS,offspring_basic ):
     This function cross-references genotype data from basic and EMS offspring datasets with RIL information,
     identifies overlapping windows, and evaluates genotype discrepancies to establish a final genotype
     decision with associated warnings based on predefined rules.
+
+    Each basic window takes the EMS window of the last overlapping or preceding EMS window
+    (the first EMS window of the chromosome for the windows before it), found with a binary
+    search on the EMS windows of the chromosome. A basic window without RIL genotype takes the
+    RIL genotype of the last window checked before it in the original pairwise scan (EMS
+    windows x basic windows), even on another chromosome: this carry-over of the original
+    scan is kept on purpose so that the RULEs are unchanged. Windows of a chromosome must be
+    sorted by position.
     
     Parameters:
         info_RIL (dict): Dictionary containing RIL genotype information with window identifiers as keys.
@@ -346,215 +388,104 @@ def Rules_RIls(info_RIL,offspring_EMS,offspring_basic ):
     """ 	
 	RULEs = OrderedDict()   
 	nb_window_chr = OrderedDict()
-	for EMS_key, EMS_value in offspring_EMS.items():
-		start_EMS, stop_EMS, *_ = EMS_value
-		genotype_EMS = EMS_value[4] 
-		
-		for key, snp_info in offspring_basic.items():
-			candidate = key
-			chromosome= candidate.split("_")[0]
+
+	EMS_windows = list(offspring_EMS.values())
+	EMS_indexes = OrderedDict()
+	for index, EMS_key in enumerate(offspring_EMS):
+		EMS_indexes.setdefault(EMS_key.split("_")[0], []).append(index)
+
+	basic_windows = OrderedDict()
+	for key, snp_info in offspring_basic.items():
+		basic_windows.setdefault(key.split("_")[0], []).append((key, snp_info))
+
+	# For each chromosome: stops of the basic windows, RIL genotypes, index of
+	# the last basic window with a RIL genotype up to each window and number
+	# of basic windows before the first EMS window
+	chr_info = OrderedDict()
+	# last_RIL[EMS index] = [genotype_RIL] of the last basic window with a RIL
+	# genotype checked with this EMS window
+	last_RIL = [None] * len(EMS_windows)
+
+	for chromosome, indexes in EMS_indexes.items():
+		if chromosome not in basic_windows:
+			continue
+
+		stops = []
+		genotypes_RIL = []
+		last_valid = []
+		for i, (key, snp_info) in enumerate(basic_windows[chromosome]):
+			stops.append(snp_info[1])
+			if key in info_RIL and info_RIL[key][:2] == [snp_info[0], snp_info[1]]:
+				genotypes_RIL.append([info_RIL[key][18]])
+				last_valid.append(i)
+			else:
+				genotypes_RIL.append(None)
+				last_valid.append(last_valid[-1] if last_valid else -1)
+
+		first_EMS = offspring_EMS[chromosome + "_" + str(1)]
+		nb_before = bisect.bisect_right(stops, first_EMS[0])
+		chr_info[chromosome] = [stops, genotypes_RIL, last_valid, nb_before]
+
+		# an EMS window checks the basic windows before the first EMS window
+		# and the basic windows that stop after its start
+		for index in indexes:
+			first_checked = bisect.bisect_left(stops, EMS_windows[index][0])
+			if last_valid[-1] >= first_checked:
+				last_RIL[index] = genotypes_RIL[last_valid[-1]]
+			elif nb_before > 0 and last_valid[nb_before - 1] >= 0:
+				last_RIL[index] = genotypes_RIL[last_valid[nb_before - 1]]
+
+	# RIL genotype carried after each EMS window
+	carried_RIL = []
+	for index in range(len(EMS_windows)):
+		if last_RIL[index] is not None:
+			carried_RIL.append(last_RIL[index])
+		else:
+			carried_RIL.append(carried_RIL[-1] if carried_RIL else None)
+
+	for chromosome, (stops, genotypes_RIL, last_valid, nb_before) in chr_info.items():
+		indexes = EMS_indexes[chromosome]
+		EMS_starts = [EMS_windows[index][0] for index in indexes]
+		first_EMS = offspring_EMS[chromosome + "_" + str(1)]
+
+		for i, (candidate, snp_info) in enumerate(basic_windows[chromosome]):
 			start, stop, *_, genotype = snp_info
-			if chromosome == EMS_key.split("_")[0]:
-				if start_EMS <= stop and start <= stop_EMS :
-					
-					if candidate in info_RIL and info_RIL[candidate][:2] == [start, stop]:
-						genotype_RIL = info_RIL[candidate][18]
-					
-					genotype_EMS = EMS_value[4]
-					
-					response = "Yes" if genotype_EMS == "A" else "No"
-					
-					if genotype_RIL == "Col":
-						if genotype == "Col":
-							if response == "Yes":
-								WARNING = "A"
-								GT_Final = "A"
-							else:
-								WARNING = "RIL"
-								GT_Final = "RIL"						
-						elif genotype == "Col/Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						elif genotype == "Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						else:
-							WARNING = "GT_NA"
-							GT_Final = "NA"
-					elif genotype_RIL == "Ct":
-						if genotype == "Col":
-							if response == "Yes":
-								WARNING = "A"
-								GT_Final = "A"
-							else:
-								WARNING = "NEG_A"
-								GT_Final = "A"			# modif			
-						elif genotype == "Col/Ct":
-							if response == "Yes":
-								WARNING = "FALSE_A"
-								GT_Final = "RIL"   # modif
-							else:
-								WARNING = "RIL"
-								GT_Final = "RIL"
-						elif genotype == "Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						else:
-							WARNING = "GT_NA"
-							GT_Final = "NA"
-					else:
-						WARNING = "RIL_NA"
-						GT_Final = "NA"
 
-					RULEs[candidate] = [start,stop,snp_info[2],snp_info[3],genotype, genotype_EMS, genotype_RIL,response,WARNING,GT_Final]
-				
-				elif (start <= offspring_EMS[chromosome + "_" + str(1)][0] and stop <= offspring_EMS[chromosome + "_" + str(1)][0]):
-					if candidate in info_RIL and info_RIL[candidate][:2] == [start, stop]:
-							genotype_RIL = info_RIL[candidate][18]
-					genotype_EMS = offspring_EMS[chromosome + "_" + str(1)][4]
-					response = "Yes" if genotype_EMS == "A" else "No"
-					
-					if genotype_RIL == "Col":
-						if genotype == "Col":
-							if response == "Yes":
-								WARNING = "A"
-								GT_Final = "A"
-							else:
-								WARNING = "RIL"
-								GT_Final = "RIL"						
-						elif genotype == "Col/Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						elif genotype == "Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						else:
-							WARNING = "GT_NA"
-							GT_Final = "NA"
-					elif genotype_RIL == "Ct":
-						if genotype == "Col":
-							if response == "Yes":
-								WARNING = "A"
-								GT_Final = "A"
-							else:
-								WARNING = "NEG_A"
-								GT_Final = "A"			# modif			
-						elif genotype == "Col/Ct":
-							if response == "Yes":
-								WARNING = "FALSE_A"
-								GT_Final = "RIL"   # modif
-							else:
-								WARNING = "RIL"
-								GT_Final = "RIL"
-						elif genotype == "Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						else:
-							WARNING = "GT_NA"
-							GT_Final = "NA"
-					else:
-						WARNING = "RIL_NA"
-						GT_Final = "NA"
-
-					RULEs[candidate] = [start,stop,snp_info[2],snp_info[3],genotype, genotype_EMS, genotype_RIL,response,WARNING,GT_Final]
-
-				elif (start > offspring_EMS[EMS_key][1] and stop > offspring_EMS[EMS_key][1]):
-					if candidate in info_RIL and info_RIL[candidate][:2] == [start, stop]:
-						genotype_RIL = info_RIL[candidate][18]
-					genotype_EMS = offspring_EMS[EMS_key][4]
-					response = "Yes" if genotype_EMS == "A" else "No"
-					
-					if genotype_RIL == "Col":
-						if genotype == "Col":
-							if response == "Yes":
-								WARNING = "A"
-								GT_Final = "A"
-							else:
-								WARNING = "RIL"
-								GT_Final = "RIL"						
-						elif genotype == "Col/Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						elif genotype == "Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						else:
-							WARNING = "GT_NA"
-							GT_Final = "NA"
-					elif genotype_RIL == "Ct":
-						if genotype == "Col":
-							if response == "Yes":
-								WARNING = "A"
-								GT_Final = "A"
-							else:
-								WARNING = "NEG_A"
-								GT_Final = "A"			# modif			
-						elif genotype == "Col/Ct":
-							if response == "Yes":
-								WARNING = "FALSE_A"
-								GT_Final = "RIL"   # modif
-							else:
-								WARNING = "RIL"
-								GT_Final = "RIL"
-						elif genotype == "Ct":
-							if response == "Yes":
-								WARNING = "IMPO"
-								GT_Final = "NA"
-							else:
-								WARNING = "IMPO"
-								GT_Final = "NA"
-						else:
-							WARNING = "GT_NA"
-							GT_Final = "NA"
-					else:
-						WARNING = "RIL_NA"
-						GT_Final = "NA"
-
-					RULEs[candidate] = [start,stop,snp_info[2],snp_info[3],genotype, genotype_EMS, genotype_RIL,response,WARNING,GT_Final]
-
-				chr = candidate.split("_")[0]
-				win_id = int(candidate.split("_")[1])
-				if chr in nb_window_chr:
-					if win_id > nb_window_chr[chr]:
-						nb_window_chr[chr] = win_id
+			# last EMS window checked with this basic window
+			if i < nb_before:
+				index = indexes[-1]
+			else:
+				index = indexes[bisect.bisect_right(EMS_starts, stop) - 1]
+			start_EMS, stop_EMS, *_ = EMS_windows[index]
+
+			if start_EMS <= stop and start <= stop_EMS:
+				genotype_EMS = EMS_windows[index][4]
+			elif i < nb_before:
+				genotype_EMS = first_EMS[4]
+			else:
+				genotype_EMS = EMS_windows[index][4]
+
+			if genotypes_RIL[i] is not None:
+				genotype_RIL = genotypes_RIL[i][0]
+			else:
+				# last basic window with a RIL genotype checked before this
+				# one with the same EMS window, else with the previous ones
+				first_checked = bisect.bisect_left(stops, start_EMS)
+				previous = last_valid[i - 1] if i > 0 else -1
+				if previous >= 0 and not (nb_before <= previous < first_checked):
+					genotype_RIL = genotypes_RIL[previous][0]
+				elif min(i, nb_before) > 0 and last_valid[min(i, nb_before) - 1] >= 0:
+					genotype_RIL = genotypes_RIL[last_valid[min(i, nb_before) - 1]][0]
+				elif index > 0 and carried_RIL[index - 1] is not None:
+					genotype_RIL = carried_RIL[index - 1][0]
 				else:
-					nb_window_chr[chr] = win_id
-	return RULEs, nb_window_chr
-
-
+					genotype_RIL = None
 
+			response = "Yes" if genotype_EMS == "A" else "No"
+			WARNING, GT_Final = RuleRIL(genotype_RIL, genotype, response)
 
+			RULEs[candidate] = [start,stop,snp_info[2],snp_info[3],genotype, genotype_EMS, genotype_RIL,response,WARNING,GT_Final]
 
+		nb_window_chr[chromosome] = max(int(candidate.split("_")[1]) for candidate, snp_info in basic_windows[chromosome])
 
+	return RULEs, nb_window_chr
@@ -19,60 +19,96 @@ import math
 
 #==============================================================================
 
+# Integer code of the genotype (GT field of the vcf) of each SNP, used to store
+# SNPs in numpy arrays instead of strings
+GT_OTHER = -1 # e.g. "1/2" or "./."
+GT_HOMO_REF = 0 # "0/0"
+GT_HETERO = 1 # "0/1"
+GT_HOMO_ALT = 2 # "1/1"
+GT_CODES = {"0/0": GT_HOMO_REF, "0/1": GT_HETERO, "1/1": GT_HOMO_ALT}
+
+#==============================================================================
+
+# Integer code of the genotype of a window, output of GetGenoWindowArray()
+GENO_NA = -1
+GENO_HOMO_REF = 0
+GENO_HETERO = 1
+GENO_HOMO_ALT = 2
+
+def GenoNames(genoRef:str, genoAlt:str):
+    """
+    Description:    names of the genotype codes of the windows
+    Output: geno_names[code] = genotype, with geno_names[GENO_NA] = 'NA'
+    """
+    return [genoRef, genoRef + "/" + genoAlt, genoAlt, 'NA']
+
+#==============================================================================
+
+def RoundArray(values, decimals:int=3):
+    """
+    Description:    round each value like the builtin round(value, decimals).
+                    np.round() scales the values by 10**decimals, which can
+                    move a value close to a tie (e.g. 0.0005) on the wrong
+                    side: these values are rounded one by one with round().
+    Input:  values = numpy array of floats
+    Output: numpy array of the rounded values
+    """
+    rounded = np.round(values, decimals)
+    scaled = values * 10**decimals
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in near_tie:
+        rounded[i] = round(float(values[i]), decimals)
+    return rounded
+
+#==============================================================================
+
+def GetGenoWindowArray(ADref, ADalt, depth, min_homo_freq:float=0.75, depth_division_th:float=1.0):
+    """
+    Description:    GetGenoWindow() for several windows at once.
+    Input:  ADref, ADalt, depth = numpy arrays (one value by window)
+    Output: [ratio_ADref_DP, ratio_ADalt_DP, prob_homoRef, prob_hetero, prob_homoAlt, geno_codes]
+            numpy arrays, geno_codes = GENO_* codes (see GenoNames())
+    """
+    ADref = np.asarray(ADref, dtype=np.float64)
+    ADalt = np.asarray(ADalt, dtype=np.float64)
+    depth = np.asarray(depth, dtype=np.float64)
+    min_hetero_freq = 1 - min_homo_freq
+
+    # Calculate ratio ADref/DP and ADalt/DP (0.0 if DP == 0)
+    covered = depth != 0
+    safe_depth = np.where(covered, depth, 1.0)
+    ratio_ADref_DP = np.where(covered, RoundArray(ADref/safe_depth, 3), 0.0)
+    ratio_ADalt_DP = np.where(covered, RoundArray(ADalt/safe_depth, 3), 0.0)
+
+    # Define the probability to be homozygous Ref/Alt and heterozygous
+    more_ref = ratio_ADref_DP > ratio_ADalt_DP
+    more_alt = ratio_ADref_DP < ratio_ADalt_DP
+    homo_ref = more_ref & ((ratio_ADref_DP >= min_homo_freq) | (ratio_ADalt_DP <= min_hetero_freq))
+    homo_alt = more_alt & ((ratio_ADalt_DP >= min_homo_freq) | (ratio_ADref_DP <= min_hetero_freq))
+    hetero = (more_ref & ~homo_ref) | (more_alt & ~homo_alt) \
+        | ((ratio_ADref_DP == ratio_ADalt_DP) & (ratio_ADref_DP != 0))
+    # else ratio ADref/DP == ADalt/DP == 0: prob_homoRef = prob_homoAlt = prob_hetero = 0.0
+
+    geno_codes = np.select([homo_ref, hetero, homo_alt], \
+        [GENO_HOMO_REF, GENO_HETERO, GENO_HOMO_ALT], default=GENO_NA)
+    geno_codes[depth < 1200*depth_division_th] = GENO_NA  # modif MY
+
+    return [ratio_ADref_DP, ratio_ADalt_DP, homo_ref.astype(np.float64), \
+        hetero.astype(np.float64), homo_alt.astype(np.float64), geno_codes]
+
+#==============================================================================
+
 def GetGenoWindow(cur_window:list, genoRef:str, genoAlt:str, min_homo_freq:float=0.75, depth_division_th:float=1.0):  # modif MY
     """
     Description:    determine the genotype according to the ratio of ADref/DP and ADalt/DP.
     Input:  cur_window = [start, stop, ADref, ADalt, DP, depth_division]
     Output: cur_geno = [start, stop, ADref/DP, ADalt/DP, genotype]
     """
-    min_hetero_freq = 1 - min_homo_freq
-    # Save each element of the list cur_window into specific variable
-    start, stop, ADref, ADalt, depth = cur_window  
-
-    # Calculate ratio ADref/DP and ADalt/DP
-    if depth == 0:
-        ratio_ADref_DP = ratio_ADalt_DP = 0.0
-    else: 
-        ratio_ADref_DP = round(ADref/depth, 3)  # modif MY
-        ratio_ADalt_DP = round(ADalt/depth, 3) # modif MY
-        
-    
-    # Define the probability to be homozygous Ref/Alt and heterozygous	
-    prob_homoRef = prob_homoAlt = prob_hetero = 0.0
-
-    if ratio_ADref_DP > ratio_ADalt_DP:
-        if ratio_ADref_DP >= min_homo_freq or ratio_ADalt_DP <= min_hetero_freq:
-            prob_homoRef = 1.0
-        else:
-            prob_hetero = 1.0
-
-    elif ratio_ADref_DP == ratio_ADalt_DP and ratio_ADref_DP != 0:
-        prob_hetero = 1.0
-
-    elif ratio_ADref_DP < ratio_ADalt_DP:
-        if ratio_ADalt_DP >= min_homo_freq or ratio_ADref_DP <= min_hetero_freq:
-            prob_homoAlt = 1.0
-        else:
-            prob_hetero = 1.0
-
-    else: # ratio ADref/DP == ADalt/DP == 0
-        # do nothing: prob_homoRef = prob_homoAlt = prob_hetero = 0.0
-        pass
-    
-    prob_geno = [prob_homoRef, prob_hetero, prob_homoAlt, 'NA']
-    if depth >= 1200*depth_division_th :  # modif MY
-        # Edit prob_geno
-        if prob_homoRef > prob_hetero and prob_homoRef > prob_homoAlt:
-            prob_geno[3] = genoRef
-        elif prob_homoAlt > prob_hetero and prob_homoAlt > prob_homoRef:
-            prob_geno[3] = genoAlt
-        elif prob_hetero > prob_homoRef and prob_hetero > prob_homoAlt:
-            prob_geno[3] = genoRef + "/" + genoAlt
-        else: # prob_homoRef == prob_homoAlt == heteroAB == 0.0
-            pass # do nothing: prob_geno = [0.0, 0.0, 0.0, "NA"]
-    else:
-        pass
-    cur_geno = [start, stop, ratio_ADref_DP, ratio_ADalt_DP] + prob_geno
+    start, stop, ADref, ADalt, depth = cur_window
+    geno = GetGenoWindowArray([ADref], [ADalt], [depth], min_homo_freq, depth_division_th)
+    ratio_ADref_DP, ratio_ADalt_DP, prob_homoRef, prob_hetero, prob_homoAlt = [values[0].item() for values in geno[:5]]
+    cur_geno = [start, stop, ratio_ADref_DP, ratio_ADalt_DP, prob_homoRef, prob_hetero, prob_homoAlt, \
+        GenoNames(genoRef, genoAlt)[geno[5][0]]]
     return cur_geno
 
 
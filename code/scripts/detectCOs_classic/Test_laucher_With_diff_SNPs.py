@@ -7,6 +7,7 @@ import yaml
 from detectCOs_read_files import *
 from detectCOs_sliding_window import *
 from detectCOs_identifyCOs import *
+from detectCOs_parallel import StreamByChromosome, ExportOffspringCOs
 from VisualiseGenotypesChromosome import *
 
 # Usage: python3 path/to/folder/launcher_detectCOs_v1_backcross.py config_detectCOs.yaml
@@ -60,207 +61,273 @@ print("\ncentromere[chr] = [left_border, right_border]")
 pprint.pprint(list(centromere.items()))
 
 
+###############################################################################
+
+# With stream_vcf, the vcf files are read one chromosome at a time in numpy
+# arrays (StreamParentalVCF(), StreamOffspringVCF()) and STEP 3 to STEP 10 run
+# on each chromosome before the next one is read (see StreamByChromosome()),
+# so only the SNPs of one chromosome are in memory. The vcf files must be
+# grouped by chromosome. The COs are saved as with detectCOs_parallel.py,
+# without checkpoints nor the outputs of the intermediate steps.
+if config.get('stream_vcf', False):
+    print("\n# STEP 3 to STEP 10. Stream the vcf files one chromosome at a time")
+    print("-------------------------------------")
+
+    results = StreamByChromosome(config)
+    ExportOffspringCOs(config, outdir, results)
+
+    visualsize_genotope({config['analyze_id']: outdir + 'offspring_genotype_window_normalized_smoothed.txt'},
+                        outdir,
+                        {config['genotype_ref']: 'blue', config['genotype_alt']: 'red', 'Col/Ct': 'green', 'NA': 'gray'},
+                        column = 'genotype')
+
+    print("\nrefinedCOs[chr_window] = [co_start, co_stop, pre_geno, cur_geno]")
+    pprint.pprint(list(results['refinedCOs'].items())[:5])
+    sys.exit()
+
+
 ###############################################################################
 
 print("\n# STEP 3. Load parental snps from vcf")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "parental_snps.txt") and \
-    os.path.exists(outdir + "parental_snps_last_pos_chr.txt"):
-    print("Load data...")
-    parental_snps = load_file_in_dict(outdir + "parental_snps.txt")
-    parental_last_snp_chr = load_file_in_dict(outdir + "parental_snps_last_pos_chr.txt")
+# Results of each step are saved in a binary checkpoint with the manifest of 
+# the step (checksums of the input files and parameters, including the key 
+# of the previous steps). A checkpoint is reloaded only if its manifest did 
+# not change. Text outputs are only a human-readable view.
+checkpoint_dir = outdir + "checkpoints/"
+checksums_file = checkpoint_dir + "checksums.json"
+text_outputs = config.get('text_outputs', True)
+
+parental_manifest = StageManifest(
+    input_files=[config['parental_vcf']],
+    params={'prefix_chr': config['prefix_chr']},
+    checksums_file=checksums_file
+    )
+parental_key = CheckpointKey(parental_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "parental_snps.npz", parental_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    parental_snps, parental_last_snp_chr = checkpoint
 
 else:
     print("Run ReadParentalVCF()...")
     parental_snps, parental_last_snp_chr = ReadParentalVCF(
-        input_vcf=config['parental_vcf'], 
+        input_vcf=config['parental_vcf'],
         prefix_chr=config['prefix_chr']
         )
+    SaveCheckpoint([parental_snps, parental_last_snp_chr],
+                   checkpoint_file=checkpoint_dir + "parental_snps.npz",
+                   manifest=parental_manifest)
+
+    #--------------------------------------------------------------------------
+    if text_outputs:
+        print ("\nSave outputs of ReadParentalVCF()")
+        export_dict_in_file(my_dict = parental_snps,
+                           output_file=outdir + "parental_snps.txt",
+                           header="chr_pos\tchr\tpos\tGT",
+                           overwrite=True)
 
 print("\nparental_snps[chr_pos] = [chr, pos, GT]")
 pprint.pprint(list(parental_snps.items())[:5])
 print("\nparental_last_snp_chr:")
 pprint.pprint(list(parental_last_snp_chr.items()))
 
-#------------------------------------------------------------------------------
-print ("\nSave outputs of ReadParentalVCF()")
-export_dict_in_file(my_dict = parental_snps, 
-                   output_file=outdir + "parental_snps.txt",
-                   header="chr_pos\tchr\tpos\tGT",
-                   overwrite=False)
 
-        
 ###############################################################################
 
 print("\n# STEP 4. Load offspring snps from vcf")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "offspring_snps.txt") and \
-    os.path.exists(outdir + "offspring_snps_last_pos_chr.txt"):
-    print("Load data...")
-    offspring_snps = load_file_in_dict(outdir + "offspring_snps.txt")
-    offspring_last_snp_chr = load_file_in_dict(outdir + "offspring_snps_last_pos_chr.txt")
+offspring_manifest = StageManifest(
+    input_files=[config['sample_vcf']],
+    params={'upstream': parental_key,
+            'genotype_ref': config['genotype_ref'],
+            'genotype_alt': config['genotype_alt']},
+    checksums_file=checksums_file
+    )
+offspring_key = CheckpointKey(offspring_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "offspring_snps.npz", offspring_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    offspring_snps, offspring_last_snp_chr = checkpoint
 
 else:
     print("Run ReadOffspringVCF()...")
     offspring_snps, offspring_last_snp_chr = ReadOffspringVCF(
-        input_vcf=config['sample_vcf'], 
+        input_vcf=config['sample_vcf'],
         parental_snps=parental_snps,
         prefix_chr=config['prefix_chr'],
-        geno_ref=config['genotype_ref'], 
+        geno_ref=config['genotype_ref'],
         geno_alt=config['genotype_alt'],
-        analyze_id=config['analyze_id']
+        analyze_id=config['analyze_id'],
+        snps_log=config.get('snps_log', True),
+        compress_log=config.get('compress_snps_log', False)
         )
+    SaveCheckpoint([offspring_snps, offspring_last_snp_chr],
+                   checkpoint_file=checkpoint_dir + "offspring_snps.npz",
+                   manifest=offspring_manifest)
+
+    #--------------------------------------------------------------------------
+    if text_outputs:
+        print ("\nSave outputs of ReadOffspringVCF()")
+        export_dict_in_file(my_dict = offspring_snps,
+                           output_file=outdir + "offspring_snps.txt",
+                           header="chr\tpos\tGT\tADref\tADalt\tgenotype",
+                           overwrite=True)
 
 print("\noffspring_snps[chr_pos] = [chr, pos,GT, ADref,ADalt, genotype]")
 pprint.pprint(list(offspring_snps.items())[:5])
 
-
-#------------------------------------------------------------------------------
-print ("\nSave outputs of ReadOffspringVCF()")
-export_dict_in_file(my_dict = offspring_snps, 
-                   output_file=outdir + "offspring_snps.txt",
-                   header="chr\tpos\tGT\tADref\tADalt\tgenotype",
-                   overwrite=False)
-
 last_snps_chr = parental_last_snp_chr
 
-
-export_dict_in_file(my_dict = last_snps_chr, 
-                   output_file=outdir + "last_snps_chr.txt",
-                   header="chr\tpos_last_SNP",
-                   overwrite=False)
+if text_outputs:
+    export_dict_in_file(my_dict = last_snps_chr,
+                       output_file=outdir + "last_snps_chr.txt",
+                       header="chr\tpos_last_SNP",
+                       overwrite=True)
 
 ###############################################################################
 
 print("\n# STEP 5. Summary info about parental SNPs by sliding window")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "parental_snps_window.txt"):
-    print("Load data...")
-    parental_snps_window = load_file_in_dict(outdir + "parental_snps_window.txt")
+# Both window sizes are computed in one pass on the SNPs (see STEP 5.bis)
+parental_window_manifest = StageManifest(
+    input_files=[config['chr_len']],
+    params={'upstream': parental_key,
+            'window_size': config['window_size'],
+            'new_window_size': config['new_window_size']},
+    checksums_file=checksums_file
+    )
+parental_window_key = CheckpointKey(parental_window_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "parental_snps_window.npz", parental_window_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    parental_snps_window, parental_snps_window_new = checkpoint
 
 else:
-    print("Run ParentalSlidingWindow()...")
-    parental_snps_window = ParentalSlidingWindow(
+    print("Run ParentalSlidingWindowPyramid()...")
+    parental_snps_windows = ParentalSlidingWindowPyramid(
         chr_len=chr_length,
         parental_snps=parental_snps,
         last_snps_chr=last_snps_chr,
-        window_size=config['window_size']
+        window_sizes=[config['window_size'], config['new_window_size']]
     )
+    parental_snps_window = parental_snps_windows[config['window_size']]
+    parental_snps_window_new = parental_snps_windows[config['new_window_size']]
+    SaveCheckpoint([parental_snps_window, parental_snps_window_new],
+                   checkpoint_file=checkpoint_dir + "parental_snps_window.npz",
+                   manifest=parental_window_manifest)
+
+#------------------------------------------------------------------------------
+if checkpoint is None and text_outputs:
+    print ("\nSave output of ParentalSlidingWindow()")
+    export_dict_in_file(my_dict = parental_snps_window,
+                       output_file=outdir + "parental_snps_window.txt",
+                       header="chr_window\tstart\tstop\tnb_snps",
+                       overwrite=True)
+
+    export_dict_in_file(my_dict = parental_snps_window_new,
+                       output_file=outdir + "parental_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt",
+                       header="chr_window\tstart\tstop\tnb_snps",
+                       overwrite=True)
 
 print("\nparental_snps_window[chr_window] = [start, stop, nb_snps]")
 pprint.pprint(list(parental_snps_window.items())[2012:2017])
 
-#------------------------------------------------------------------------------
-print ("\nSave output of ParentalSlidingWindow()")
-export_dict_in_file(my_dict = parental_snps_window, 
-                   output_file=outdir + "parental_snps_window.txt",
-                   header="chr_window\tstart\tstop\tnb_snps",
-                   overwrite=False)
-
 
 ############################################################################### # modify MY
 
 print("\n# STEP 5.bis. Summary info about parental SNPs by sliding window" + str(config['new_window_size']) + "kb")
 print("-------------------------------------")
 
-
-if os.path.exists(outdir + "parental_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt"):
-    print("Load data...")
-    parental_snps_window_new = load_file_in_dict(outdir + "parental_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt")
-
-else:
-    print("Run ParentalSlidingWindow()...")
-    parental_snps_window_new = ParentalSlidingWindow(
-        chr_len=chr_length,
-        parental_snps=parental_snps,
-        last_snps_chr=last_snps_chr,
-        window_size=config['new_window_size']
-    )
-
 print("\nparental_snps_window_" + str(config['new_window_size']) + "_kb" + "[chr_window] = [start, stop, nb_snps]")
 pprint.pprint(list(parental_snps_window_new.items())[2012:2017])
 
-#------------------------------------------------------------------------------
-print ("\nSave output of ParentalSlidingWindow()")
-export_dict_in_file(my_dict = parental_snps_window_new, 
-                   output_file=outdir + "parental_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr_window\tstart\tstop\tnb_snps",
-                   overwrite=False)
-
-
 
 ###############################################################################
 
 print("\n# STEP 6. Summary info about offspring SNPs by sliding window")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "offspring_snps_window.txt"):
-    print("Load data...")
-    offspring_snps_window = load_file_in_dict(outdir + "offspring_snps_window.txt")
+# Both window sizes are computed in one pass on the SNPs (see STEP 6.bis)
+offspring_window_manifest = StageManifest(
+    input_files=[config['chr_len']],
+    params={'upstream': offspring_key,
+            'window_size': config['window_size'],
+            'new_window_size': config['new_window_size']},
+    checksums_file=checksums_file
+    )
+offspring_window_key = CheckpointKey(offspring_window_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "offspring_snps_window.npz", offspring_window_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    offspring_snps_window, offspring_snps_window_new = checkpoint
 
 else:
-    print("Run OffspringSlidingWindow()...")
-    offspring_snps_window = OffspringSlidingWindow(
+    print("Run OffspringSlidingWindowPyramid()...")
+    offspring_snps_windows = OffspringSlidingWindowPyramid(
         chr_len=chr_length,
         offspring_snps=offspring_snps,
         last_snps_chr=last_snps_chr,
-        window_size=config['window_size']
+        window_sizes=[config['window_size'], config['new_window_size']]
     )
+    offspring_snps_window = offspring_snps_windows[config['window_size']]
+    offspring_snps_window_new = offspring_snps_windows[config['new_window_size']]
+    SaveCheckpoint([offspring_snps_window, offspring_snps_window_new],
+                   checkpoint_file=checkpoint_dir + "offspring_snps_window.npz",
+                   manifest=offspring_window_manifest)
+
+#------------------------------------------------------------------------------
+if checkpoint is None and text_outputs:
+    print ("\nSave output of OffspringSlidingWindow()")
+    export_dict_in_file(my_dict = offspring_snps_window,
+                       output_file=outdir + "offspring_snps_window.txt",
+                       header="chr_window\tstart\tstop\tADref\tADalt\tDP\tnbSNP_Aref\tnbSNP_Aalt\ttot_snps",
+                       overwrite=True)
+
+    export_dict_in_file(my_dict = offspring_snps_window_new,
+                       output_file=outdir + "offspring_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt",
+                       header="chr_window\tstart\tstop\tADref\tADalt\tDP\tnbSNP_Aref\tnbSNP_Aalt\ttot_snps",
+                       overwrite=True)
 
 print("\noffspring_snps_window[chr_window] = [start,stop,ADref,ADalt,DP,nbSNP_Aref,nbSNP_Aalt,TOTsnps-window]")
 pprint.pprint(list(offspring_snps_window.items())[2012:2017])
 
-#------------------------------------------------------------------------------
-print ("\nSave output of OffspringSlidingWindow()")
-export_dict_in_file(my_dict = offspring_snps_window, 
-                   output_file=outdir + "offspring_snps_window.txt",
-                   header="chr_window\tstart\tstop\tADref\tADalt\tDP\tnbSNP_Aref\tnbSNP_Aalt\ttot_snps",
-                   overwrite=False)
-
 
 ###############################################################################  # modify MY
 
 print("\n# STEP 6.bis. Summary info about offspring SNPs by sliding window" + str(config['new_window_size']) + "kb")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "offspring_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt"):
-    print("Load data...")
-    offspring_snps_window_new = load_file_in_dict(outdir + "offspring_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt")
-
-else:
-    print("Run OffspringSlidingWindow()...")
-    offspring_snps_window_new = OffspringSlidingWindow(
-        chr_len=chr_length,
-        offspring_snps=offspring_snps,
-        last_snps_chr=last_snps_chr,
-        window_size=config['new_window_size']
-    )
-
 print("\noffspring_snps_window_" + str(config['new_window_size']) + "_kb" + "[chr_window] = [start,stop,ADref,ADalt,DP,nbSNP_Aref,nbSNP_Aalt,TOTsnps-window]")
 pprint.pprint(list(offspring_snps_window_new.items())[2012:2017])
 
-#------------------------------------------------------------------------------
-print ("\nSave output of OffspringSlidingWindow()")
-export_dict_in_file(my_dict = offspring_snps_window_new, 
-                   output_file=outdir + "offspring_snps_window_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr_window\tstart\tstop\tADref\tADalt\tDP\tnbSNP_Aref\tnbSNP_Aalt\ttot_snps",
-                   overwrite=False)
-
 ###############################################################################
 
 print("\n# STEP 7. Identify the genotype of the offspring normalized sliding window")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "offspring_snps_window_normalized.txt") and \
-    os.path.exists(outdir + "offspring_genotype_window_normalized.txt") and \
-        os.path.exists(outdir + "offspring_nb_window_normalized.txt"):
-    print("Load data...")
-    offspring_snps_window_normalized = load_file_in_dict(outdir + "offspring_snps_window_normalized.txt")
-    offspring_genotype_window_normalized = load_file_in_dict(outdir + "offspring_genotype_window_normalized.txt")
-    nb_windows_chr = load_file_in_dict(outdir + "nb_window_chr.txt")
+normalized_manifest = StageManifest(
+    params={'upstream': [parental_window_key, offspring_window_key],
+            'min_snp_num': config['min_snp_num'],
+            'min_reads_num': config['min_reads_num'],
+            'ratio_min_homo': config['ratio_min_homo'],
+            'depth_division_th': config['depth_division_th']},
+    checksums_file=checksums_file
+    )
+normalized_key = CheckpointKey(normalized_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "offspring_snps_window_normalized.npz", normalized_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    offspring_snps_window_normalized, offspring_genotype_window_normalized, \
+        nb_windows_chr = checkpoint
 
 else:
     offspring_snps_window_normalized, offspring_genotype_window_normalized, \
@@ -274,6 +341,27 @@ else:
             ratio_min_homo=config['ratio_min_homo'],
             depth_division_th = config['depth_division_th']  # modify MY
             )
+    SaveCheckpoint([offspring_snps_window_normalized, offspring_genotype_window_normalized, nb_windows_chr],
+                   checkpoint_file=checkpoint_dir + "offspring_snps_window_normalized.npz",
+                   manifest=normalized_manifest)
+
+    #--------------------------------------------------------------------------
+    if text_outputs:
+        print ("\nSave outputs of NormalizeOffspringSlidingWindow()")
+        export_dict_in_file(my_dict = offspring_snps_window_normalized,
+                           output_file=outdir + "offspring_snps_window_normalized.txt",
+                           header="chr_window\tstart\tstop\tADref\tADalt\tDP",
+                           overwrite=True)
+
+        export_dict_in_file(my_dict = offspring_genotype_window_normalized,
+                           output_file=outdir + "offspring_genotype_window_normalized.txt",
+                           header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
+                           overwrite=True)
+
+        export_dict_in_file(my_dict = nb_windows_chr,
+                           output_file=outdir + "nb_window_chr.txt",
+                           header="chr\tnb_window",
+                           overwrite=True)
 
 print("\noffspring_snps_window_normalized: ")
 print("[chr_window] = [start, stop, ADref, ADalt, DP]")
@@ -286,38 +374,27 @@ pprint.pprint(list(offspring_genotype_window_normalized.items())[2012:2017], wid
 print("\nnb_windows_chr: ")
 pprint.pprint(list(nb_windows_chr.items()))
 
-#------------------------------------------------------------------------------    
-    
-print ("\nSave outputs of NormalizeOffspringSlidingWindow()")
-export_dict_in_file(my_dict = offspring_snps_window_normalized, 
-                   output_file=outdir + "offspring_snps_window_normalized.txt",
-                   header="chr_window\tstart\tstop\tADref\tADalt\tDP",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = offspring_genotype_window_normalized, 
-                   output_file=outdir + "offspring_genotype_window_normalized.txt",
-                   header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = nb_windows_chr, 
-                   output_file=outdir + "nb_window_chr.txt",
-                   header="chr\tnb_window",
-                   overwrite=False)
-
-
 
 ###############################################################################   # modify MY
 
 print("\n# STEP 7.bis. Identify the genotype of the offspring normalized sliding window" + str(config['new_window_size']) + " kb")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "offspring_snps_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt") and \
-    os.path.exists(outdir + "offspring_genotype_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt") and \
-        os.path.exists(outdir + "nb_window_chr_" + str(config['new_window_size']) + "_kb" + ".txt"):
-    print("Load data...")
-    offspring_snps_window_normalized_new = load_file_in_dict(outdir + "offspring_snps_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt")
-    offspring_genotype_window_normalized_new = load_file_in_dict(outdir + "offspring_genotype_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt")
-    nb_windows_chr_new = load_file_in_dict(outdir + "nb_window_chr_" + str(config['new_window_size']) + "_kb" + ".txt")
+normalized_new_manifest = StageManifest(
+    params={'upstream': [parental_window_key, offspring_window_key],
+            'min_snp_num': config['min_snp_num'],
+            'min_reads_num': config['min_reads_num'],
+            'ratio_min_homo': config['ratio_min_homo'],
+            'new_depth_division_th': config['new_depth_division_th']},
+    checksums_file=checksums_file
+    )
+normalized_new_key = CheckpointKey(normalized_new_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "offspring_snps_window_normalized_" + str(config['new_window_size']) + "_kb" + ".npz", normalized_new_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    offspring_snps_window_normalized_new, offspring_genotype_window_normalized_new, \
+        nb_windows_chr_new = checkpoint
 
 else:
     offspring_snps_window_normalized_new, offspring_genotype_window_normalized_new, \
@@ -331,6 +408,27 @@ else:
             ratio_min_homo=config['ratio_min_homo'],
             depth_division_th = config['new_depth_division_th']   # modify MY
             )
+    SaveCheckpoint([offspring_snps_window_normalized_new, offspring_genotype_window_normalized_new, nb_windows_chr_new],
+                   checkpoint_file=checkpoint_dir + "offspring_snps_window_normalized_" + str(config['new_window_size']) + "_kb" + ".npz",
+                   manifest=normalized_new_manifest)
+
+    #--------------------------------------------------------------------------
+    if text_outputs:
+        print ("\nSave outputs of NormalizeOffspringSlidingWindow() " + str(config['new_window_size']) + " kb")
+        export_dict_in_file(my_dict = offspring_snps_window_normalized_new,
+                           output_file=outdir + "offspring_snps_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt",
+                           header="chr_window\tstart\tstop\tADref\tADalt\tDP",
+                           overwrite=True)
+
+        export_dict_in_file(my_dict = offspring_genotype_window_normalized_new,
+                           output_file=outdir + "offspring_genotype_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt",
+                           header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
+                           overwrite=True)
+
+        export_dict_in_file(my_dict = nb_windows_chr_new,
+                           output_file=outdir + "nb_window_chr_" + str(config['new_window_size']) + "_kb" + ".txt",
+                           header="chr\tnb_window",
+                           overwrite=True)
 
 print("\noffspring_snps_window_normalized_" + str(config['new_window_size']) + "_kb: ")
 print("[chr_window] = [start, stop, ADref, ADalt, DP]")
@@ -343,38 +441,28 @@ pprint.pprint(list(offspring_genotype_window_normalized_new.items())[2012:2017],
 print("\nnb_windows_chr_" + str(config['new_window_size']) + "_kb: ")
 pprint.pprint(list(nb_windows_chr_new.items()))
 
-#------------------------------------------------------------------------------    
-    
-print ("\nSave outputs of NormalizeOffspringSlidingWindow() " + str(config['new_window_size']) + " kb")
-export_dict_in_file(my_dict = offspring_snps_window_normalized_new, 
-                   output_file=outdir + "offspring_snps_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr_window\tstart\tstop\tADref\tADalt\tDP",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = offspring_genotype_window_normalized_new, 
-                   output_file=outdir + "offspring_genotype_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = nb_windows_chr_new, 
-                   output_file=outdir + "nb_window_chr_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr\tnb_window",
-                   overwrite=False)
-
-
 
 ###############################################################################
 
 print("\n# STEP 8. Smooth offspring sliding window")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "offspring_snps_window_normalized_smoothed.txt") and \
-    os.path.exists(outdir + "offspring_genotype_window_normalized_smoothed.txt") and \
-        os.path.exists(outdir + "offspring_nb_window_normalized.txt"):
-    print("Load data...")
-    offspring_snps_window_smoothed = load_file_in_dict(outdir + "offspring_snps_window_normalized_smoothed.txt")
-    offspring_genotype_window_smoothed = load_file_in_dict(outdir + "offspring_genotype_window_normalized_smoothed.txt")
-    check_smoothing = load_file_in_dict(outdir + "check_smoothing.txt")
+smoothed_manifest = StageManifest(
+    input_files=[config['centromere_reg']],
+    params={'upstream': normalized_key,
+            'ratio_min_homo': config['ratio_min_homo'],
+            'depth_division_th': config['depth_division_th'],
+            'smooth_width': config.get('smooth_width', 3),
+            'smooth_weights': config.get('smooth_weights')},
+    checksums_file=checksums_file
+    )
+smoothed_key = CheckpointKey(smoothed_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "offspring_snps_window_normalized_smoothed.npz", smoothed_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    offspring_snps_window_smoothed, offspring_genotype_window_smoothed, \
+        check_smoothing = checkpoint
 
 else:
     offspring_snps_window_smoothed, offspring_genotype_window_smoothed, \
@@ -385,8 +473,33 @@ else:
             geno_ref=config['genotype_ref'],
             geno_alt=config['genotype_alt'],
             ratio_min_homo=config['ratio_min_homo'],
-            depth_division_th = config['depth_division_th']  # modify MY
+            depth_division_th = config['depth_division_th'],  # modify MY
+            smooth_width=config.get('smooth_width', 3),
+            smooth_weights=config.get('smooth_weights')
             )
+    SaveCheckpoint([offspring_snps_window_smoothed, offspring_genotype_window_smoothed, check_smoothing],
+                   checkpoint_file=checkpoint_dir + "offspring_snps_window_normalized_smoothed.npz",
+                   manifest=smoothed_manifest)
+
+    #--------------------------------------------------------------------------
+    if text_outputs:
+        print("\nSave outputs of SmoothNormalizedOsffspringSlidingWindow()")
+
+        export_dict_in_file(my_dict = offspring_snps_window_smoothed,
+                           output_file=outdir + "offspring_snps_window_normalized_smoothed.txt",
+                           header="chr_window\tstart\tstop\tADref\tADalt\tDP",
+                           overwrite=True)
+
+        export_dict_in_file(my_dict = check_smoothing,
+                           output_file=outdir + "check_smoothing.txt",
+                           header="chr_window\tstart_window\tstop_window\tstart_smooth\tstop_smooth\twindow_smoothed",
+                           overwrite=True)
+
+# always saved: input of the visualisation (STEP 8.bis)
+export_dict_in_file(my_dict = offspring_genotype_window_smoothed,
+                   output_file=outdir + "offspring_genotype_window_normalized_smoothed.txt",
+                   header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
+                   overwrite=checkpoint is None)
 
 
 print("\noffspring_snps_window_smoothed: ")
@@ -400,25 +513,6 @@ pprint.pprint(list(offspring_genotype_window_smoothed.items())[2012:2017], width
 print("\ncheck_smoothing[chr_window] = [start_window,stop_window,start_smooth,stop_smooth,window_smoothed")
 pprint.pprint(list(check_smoothing.items())[2012:2017])
 
-#------------------------------------------------------------------------------
-
-print("\nSave outputs of SmoothNormalizedOsffspringSlidingWindow()")
-
-export_dict_in_file(my_dict = offspring_snps_window_smoothed, 
-                   output_file=outdir + "offspring_snps_window_normalized_smoothed.txt",
-                   header="chr_window\tstart\tstop\tADref\tADalt\tDP",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = offspring_genotype_window_smoothed, 
-                   output_file=outdir + "offspring_genotype_window_normalized_smoothed.txt",
-                   header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = check_smoothing, 
-                   output_file=outdir + "check_smoothing.txt",
-                   header="chr_window\tstart_window\tstop_window\tstart_smooth\tstop_smooth\twindow_smoothed",
-                   overwrite=False)
-        
 
 
 ###############################################################################  # modify MY
@@ -426,13 +520,22 @@ export_dict_in_file(my_dict = check_smoothing,
 print("\n# STEP 8. Smooth offspring sliding window " + str(config['new_window_size']) + " kb")
 print("-------------------------------------")
 
-if os.path.exists(outdir + "offspring_snps_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt") and \
-    os.path.exists(outdir + "offspring_genotype_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt") and \
-        os.path.exists(outdir + "offspring_nb_window_normalized_" + str(config['new_window_size']) + "_kb" + ".txt"):
-    print("Load data...")
-    offspring_snps_window_smoothed_new = load_file_in_dict(outdir + "offspring_snps_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt")
-    offspring_genotype_window_smoothed_new = load_file_in_dict(outdir + "offspring_genotype_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt")
-    check_smoothing_new = load_file_in_dict(outdir + "check_smoothing_" + str(config['new_window_size']) + "_kb" + ".txt")
+smoothed_new_manifest = StageManifest(
+    input_files=[config['centromere_reg']],
+    params={'upstream': normalized_new_key,
+            'ratio_min_homo': config['ratio_min_homo'],
+            'new_depth_division_th': config['new_depth_division_th'],
+            'new_smooth_width': config.get('new_smooth_width', 3),
+            'new_smooth_weights': config.get('new_smooth_weights')},
+    checksums_file=checksums_file
+    )
+smoothed_new_key = CheckpointKey(smoothed_new_manifest)
+checkpoint = LoadCheckpoint(checkpoint_dir + "offspring_snps_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".npz", smoothed_new_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    offspring_snps_window_smoothed_new, offspring_genotype_window_smoothed_new, \
+        check_smoothing_new = checkpoint
 
 else:
     offspring_snps_window_smoothed_new, offspring_genotype_window_smoothed_new, \
@@ -443,8 +546,32 @@ else:
             geno_ref=config['genotype_ref'],
             geno_alt=config['genotype_alt'],
             ratio_min_homo=config['ratio_min_homo'],
-            depth_division_th = config['new_depth_division_th']  # modify MY
+            depth_division_th = config['new_depth_division_th'],  # modify MY
+            smooth_width=config.get('new_smooth_width', 3),
+            smooth_weights=config.get('new_smooth_weights')
             )
+    SaveCheckpoint([offspring_snps_window_smoothed_new, offspring_genotype_window_smoothed_new, check_smoothing_new],
+                   checkpoint_file=checkpoint_dir + "offspring_snps_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".npz",
+                   manifest=smoothed_new_manifest)
+
+    #--------------------------------------------------------------------------
+    if text_outputs:
+        print("\nSave outputs of SmoothNormalizedOsffspringSlidingWindow()")
+
+        export_dict_in_file(my_dict = offspring_snps_window_smoothed_new,
+                           output_file=outdir + "offspring_snps_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt",
+                           header="chr_window\tstart\tstop\tADref\tADalt\tDP",
+                           overwrite=True)
+
+        export_dict_in_file(my_dict = offspring_genotype_window_smoothed_new,
+                           output_file=outdir + "offspring_genotype_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt",
+                           header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
+                           overwrite=True)
+
+        export_dict_in_file(my_dict = check_smoothing_new,
+                           output_file=outdir + "check_smoothing_" + str(config['new_window_size']) + "_kb" + ".txt",
+                           header="chr_window\tstart_window\tstop_window\tstart_smooth\tstop_smooth\twindow_smoothed",
+                           overwrite=True)
 
 
 print("\noffspring_snps_window_smoothed_" + str(config['new_window_size']) + "_kb" + " : ")
@@ -458,25 +585,6 @@ pprint.pprint(list(offspring_genotype_window_smoothed_new.items())[2012:2017], w
 print("\ncheck_smoothing_" + str(config['new_window_size']) + "_kb" + "[chr_window] = [start_window,stop_window,start_smooth,stop_smooth,window_smoothed")
 pprint.pprint(list(check_smoothing_new.items())[2012:2017])
 
-#------------------------------------------------------------------------------
-
-print("\nSave outputs of SmoothNormalizedOsffspringSlidingWindow()")
-
-export_dict_in_file(my_dict = offspring_snps_window_smoothed_new, 
-                   output_file=outdir + "offspring_snps_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr_window\tstart\tstop\tADref\tADalt\tDP",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = offspring_genotype_window_smoothed_new, 
-                   output_file=outdir + "offspring_genotype_window_normalized_smoothed_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
-                   overwrite=False)
-
-export_dict_in_file(my_dict = check_smoothing_new, 
-                   output_file=outdir + "check_smoothing_" + str(config['new_window_size']) + "_kb" + ".txt",
-                   header="chr_window\tstart_window\tstop_window\tstart_smooth\tstop_smooth\twindow_smoothed",
-                   overwrite=False)
-
 
 ##############################################   # modify MY
 
@@ -506,7 +614,48 @@ visualsize_genotope(file_paths, outdir, genotype_colors, column = 'genotype')
 print("\n# STEP 9. Identify COs")
 print("-------------------------------------")
 
-candidates_co, db_co = IdentifyCOs(offspring_genotype_window_smoothed, nb_windows_chr)
+identify_manifest = StageManifest(
+    input_files=[config['centromere_reg']],
+    params={'upstream': [normalized_key, smoothed_key]},
+    checksums_file=checksums_file
+    )
+checkpoint = LoadCheckpoint(checkpoint_dir + "candidateCO.npz", identify_manifest)
+
+if checkpoint is not None:
+    print("Load checkpoint...")
+    candidates_co, db_co, candidates_co_qichao = checkpoint
+
+else:
+    offspring_genotype_track = GenotypeTrack.from_windows(offspring_genotype_window_smoothed, nb_windows_chr)
+    candidates_co, db_co = IdentifyCOs(offspring_genotype_track, nb_windows_chr)
+
+    if text_outputs:
+        export_dict_in_file(my_dict = offspring_genotype_track.runs_dict(),
+                           output_file=outdir + "offspring_genotype_runs.txt",
+                           header="chr_run\tstart_win\tend_win\tstart_bp\tend_bp\tgenotype",
+                           overwrite=True)
+
+    ### IdentifyCOs:  Qichao version
+    offspring_smooth_probs = OrderedDict()
+    for key, value in  offspring_genotype_window_smoothed.items():
+        offspring_smooth_probs[key] = value[0:2] + value[4:8]
+
+    offspring_sliding_geno_ratios = OrderedDict()
+    for key, value in  offspring_genotype_window_normalized.items():
+        offspring_sliding_geno_ratios[key] = value[0:4]
+
+    candidates_co_qichao = IdentifyCOsQichao(
+        Offspring_smoothProbs= offspring_smooth_probs, 
+        Offspring_smoothWinNums= nb_windows_chr, 
+        Offspring_slidingGenoNums= offspring_snps_window_normalized,
+        Offspring_slidingGenoRatios=offspring_sliding_geno_ratios, 
+        Centromere=centromere,
+        genoRef=config['genotype_ref'],
+        genoAlt=config['genotype_alt'])
+
+    SaveCheckpoint([candidates_co, db_co, candidates_co_qichao],
+                   checkpoint_file=checkpoint_dir + "candidateCO.npz",
+                   manifest=identify_manifest)
 
 updated_candidates_co = OrderedDict()  # modify MY
 warnings = []
@@ -562,23 +711,6 @@ if len(warnings_co) != 0:
 ### IdentifyCOs:  Qichao version
 print("\nCandidateCOs Qichao: ")
 
-offspring_smooth_probs = OrderedDict()
-for key, value in  offspring_genotype_window_smoothed.items():
-    offspring_smooth_probs[key] = value[0:2] + value[4:8]
-
-offspring_sliding_geno_ratios = OrderedDict()
-for key, value in  offspring_genotype_window_normalized.items():
-    offspring_sliding_geno_ratios[key] = value[0:4]
-
-candidates_co_qichao = IdentifyCOsQichao(
-    Offspring_smoothProbs= offspring_smooth_probs, 
-    Offspring_smoothWinNums= nb_windows_chr, 
-    Offspring_slidingGenoNums= offspring_snps_window_normalized,
-    Offspring_slidingGenoRatios=offspring_sliding_geno_ratios, 
-    Centromere=centromere,
-    genoRef=config['genotype_ref'],
-    genoAlt=config['genotype_alt'])
-
 pprint.pprint(list(candidates_co_qichao.items()))
 
 export_dict_in_file(my_dict = candidates_co_qichao, 
@@ -641,41 +773,7 @@ print("\n# STEP 9.bis. Precise COs")
 print("-------------------------------------")
 
 
-preciseCOs = OrderedDict()
-db_co_new = OrderedDict()
-
-for i in range (len(list(candidates_co.keys()))):
-    start_co=candidates_co[list(candidates_co.keys())[i]][1] - 100000
-    end_co=candidates_co[list(candidates_co.keys())[i]][2] + 100000
-
-    
-    candidate = list(candidates_co.keys())[i].split("_")[0]
-    new_offspring_genotype_window_smoothed = OrderedDict()
-    for cle, valeur in offspring_genotype_window_smoothed_new.items():
-        if valeur[0] >= start_co + 1 and valeur[1] <= end_co and cle.split("_")[0] == candidate:
-            new_offspring_genotype_window_smoothed[cle] = valeur
-            print(cle, valeur)
-    
-    start_window = int(list(new_offspring_genotype_window_smoothed.keys())[0].split("_")[1])
-    end_window = int(list(new_offspring_genotype_window_smoothed.keys())[-1].split("_")[1])
-    print(start_window, end_window)
-
-    #print(new_offspring_genotype_window_smoothed.items())    
-
-    candidates_co_2, db_co_2 = PreciseCOs(new_offspring_genotype_window_smoothed, start_window=start_window, end_window=end_window)
-    
-    if candidates_co_2 :
-        candidates_co_2 = candidates_co_2
-    else:
-        start_co=candidates_co[list(candidates_co.keys())[i]][1] 
-        end_co=candidates_co[list(candidates_co.keys())[i]][2]
-        pre_geno=candidates_co[list(candidates_co.keys())[i]][3]
-        cur_geno=candidates_co[list(candidates_co.keys())[i]][4]
-        cur_chr = list(candidates_co.keys())[i].split("_")[0]
-        key = cur_chr + "_" + str(round((start_window + end_window) / 2, 1))
-        candidates_co_2[key] = [str(start_window) + ":" + str(end_window), start_co, end_co, pre_geno, cur_geno]
-    preciseCOs.update(candidates_co_2)
-    db_co_new.update(db_co_2)
+preciseCOs, db_co_new = PreciseCOsCandidates(candidates_co, offspring_genotype_window_smoothed_new)
 
 
 updated_preciseCOs = OrderedDict() # modify MY
@@ -0,0 +1,351 @@
+import os, sys
+import multiprocessing
+import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from detectCOs_read_files import *
+from detectCOs_sliding_window import *
+from detectCOs_identifyCOs import *
+
+# Usage: python3 path/to/folder/detectCOs_batch.py config_detectCOs.yaml sample_sheet.tsv
+#
+# Run detectCOs on all the offspring of a sample sheet. The parental SNPs and
+# the parental sliding windows are computed once and shared with the workers.
+# The config file is the same as Test_laucher_With_diff_SNPs.py, analyze_id
+# and sample_vcf are read from the sample sheet (tab-separated file, one
+# offspring per line: analyze_id <tab> sample_vcf, lines starting with "#" are
+# ignored). The number of workers is set with the optional key batch_workers
+# (default: number of CPUs).
+
+
+###############################################################################
+
+def ReadSampleSheet(sample_sheet:str):
+    """
+    Description:    read the list of offspring to analyze
+    Input:
+    - sample_sheet: tab-separated file, one offspring per line:
+                    analyze_id <tab> sample_vcf
+    Output:
+    - samples[analyze_id] = sample_vcf
+    """
+    CheckInput(sample_sheet)
+    samples = OrderedDict()
+
+    with open(sample_sheet) as input_file:
+        for line in input_file:
+            if line.startswith("#") or line.strip() == "":
+                continue
+            lines = line.strip("\n").split("\t")
+            if len(lines) < 2:
+                raise ValueError("Invalid sample sheet line: " + line)
+            if lines[0] in samples:
+                raise ValueError("analyze_id found twice in the sample sheet: " + lines[0])
+            samples[lines[0]] = lines[1]
+
+    hues.log(str(len(samples)) + " offspring in the sample sheet")
+    return samples
+
+#==============================================================================
+
+# Parental data shared by all the offspring, set in each worker by InitWorker().
+# With the fork start method, the workers use the memory of the main process
+# without copying the data.
+PARENTAL_DATA = dict()
+
+def InitWorker(parental_data:dict):
+    """
+    Description:    set the parental data of a worker of the process pool
+    Input:          output of PrepareParentalData()
+    """
+    global PARENTAL_DATA
+    PARENTAL_DATA = parental_data
+
+#==============================================================================
+
+def PrepareParentalData(config:dict):
+    """
+    Description:    read the inputs shared by all the offspring: chromosome
+                    length, centromeric regions, parental SNPs and parental
+                    sliding windows for window_size and new_window_size.
+    Input:
+    - config:       config file of the launcher
+    Output:
+    - parental_data[name] = value
+    """
+    chr_length = ReadChrLen(input_chr_len=config['chr_len'],
+                            prefix_chr=config['prefix_chr'])
+    centromere = ReadCentroReg(input_centro_reg=config['centromere_reg'],
+                               prefix_chr=config['prefix_chr'])
+    parental_snps, parental_last_snp_chr = ReadParentalVCF(
+        input_vcf=config['parental_vcf'],
+        prefix_chr=config['prefix_chr']
+        )
+    parental_snps_windows = ParentalSlidingWindowPyramid(
+        chr_len=chr_length,
+        parental_snps=parental_snps,
+        last_snps_chr=parental_last_snp_chr,
+        window_sizes=[config['window_size'], config['new_window_size']]
+        )
+
+    return {'chr_length': chr_length,
+            'centromere': centromere,
+            'parental_snps': parental_snps,
+            'last_snps_chr': parental_last_snp_chr,
+            'parental_snps_window': parental_snps_windows[config['window_size']],
+            'parental_snps_window_new': parental_snps_windows[config['new_window_size']]}
+
+#==============================================================================
+
+def OffspringCOs(config:dict, offspring_snps:OrderedDict, parental_data:dict, re_refine:bool=True):
+    """
+    Description:    run the steps of the launcher from the offspring SNPs to
+                    the refined COs (STEP 6 to STEP 10)
+    Input:
+    - config:           config file of the launcher
+    - offspring_snps:   first output of ReadOffspringVCF()
+    - parental_data:    output of PrepareParentalData()
+    - re_refine:        merge the overlapping refined COs (see ReRefineCOs())
+    Output:
+    - results[name] = OrderedDict, see ExportOffspringCOs()
+    """
+    chr_length = parental_data['chr_length']
+    centromere = parental_data['centromere']
+    last_snps_chr = parental_data['last_snps_chr']
+
+    # STEP 6. Offspring sliding windows (both window sizes in one pass)
+    offspring_snps_windows = OffspringSlidingWindowPyramid(
+        chr_len=chr_length,
+        offspring_snps=offspring_snps,
+        last_snps_chr=last_snps_chr,
+        window_sizes=[config['window_size'], config['new_window_size']]
+        )
+
+    # STEP 7 and 8. Normalize and smooth for both window sizes
+    results = dict()
+    for suffix, prefix, window_size, depth_division_th, parental_snps_window in [
+            ("", "", config['window_size'], config['depth_division_th'],
+                parental_data['parental_snps_window']),
+            ("_new", "new_", config['new_window_size'], config['new_depth_division_th'],
+                parental_data['parental_snps_window_new'])]:
+
+        offspring_snps_window_normalized, offspring_genotype_window_normalized, \
+            nb_windows_chr = NormalizeOffspringSlidingWindow(
+                parental_snps_window=parental_snps_window,
+                offspring_snps_window=offspring_snps_windows[window_size],
+                geno_ref=config['genotype_ref'],
+                geno_alt=config['genotype_alt'],
+                min_snp_num=config['min_snp_num'],
+                min_reads_num=config['min_reads_num'],
+                ratio_min_homo=config['ratio_min_homo'],
+                depth_division_th=depth_division_th
+                )
+
+        offspring_snps_window_smoothed, offspring_genotype_window_smoothed, \
+            check_smoothing = SmoothNormalizedOsffspringSlidingWindow(
+                offspring_snps_window=offspring_snps_window_normalized,
+                nb_windows_chr=nb_windows_chr,
+                centromere=centromere,
+                geno_ref=config['genotype_ref'],
+                geno_alt=config['genotype_alt'],
+                ratio_min_homo=config['ratio_min_homo'],
+                depth_division_th=depth_division_th,
+                smooth_width=config.get(prefix + 'smooth_width', 3),
+                smooth_weights=config.get(prefix + 'smooth_weights')
+                )
+
+        results['offspring_snps_window_normalized' + suffix] = offspring_snps_window_normalized
+        results['offspring_genotype_window_normalized' + suffix] = offspring_genotype_window_normalized
+        results['nb_windows_chr' + suffix] = nb_windows_chr
+        results['offspring_genotype_window_smoothed' + suffix] = offspring_genotype_window_smoothed
+
+    # STEP 9. Identify COs
+    candidates_co, db_co = IdentifyCOs(results['offspring_genotype_window_smoothed'],
+        results['nb_windows_chr'])
+
+    offspring_smooth_probs = OrderedDict()
+    for key, value in results['offspring_genotype_window_smoothed'].items():
+        offspring_smooth_probs[key] = value[0:2] + value[4:8]
+
+    offspring_sliding_geno_ratios = OrderedDict()
+    for key, value in results['offspring_genotype_window_normalized'].items():
+        offspring_sliding_geno_ratios[key] = value[0:4]
+
+    candidates_co_qichao = IdentifyCOsQichao(
+        Offspring_smoothProbs=offspring_smooth_probs,
+        Offspring_smoothWinNums=results['nb_windows_chr'],
+        Offspring_slidingGenoNums=results['offspring_snps_window_normalized'],
+        Offspring_slidingGenoRatios=offspring_sliding_geno_ratios,
+        Centromere=centromere,
+        genoRef=config['genotype_ref'],
+        genoAlt=config['genotype_alt'])
+
+    # STEP 9.bis. Precise COs with the windows of new_window_size
+    preciseCOs, db_co_new = PreciseCOsCandidates(candidates_co,
+        results['offspring_genotype_window_smoothed_new'])
+
+    # STEP 10. Refines COs border
+    refinedCOs = RefineCOBorders(candidates_co, offspring_snps,
+        window_size=config['window_size'], re_refine=re_refine)
+    refinedCOs_qichao = RefineCOBordersQichao(candidates_co_qichao, offspring_snps,
+        window_size=config['window_size'], re_refine=re_refine)
+
+    return {'offspring_genotype_window_smoothed': results['offspring_genotype_window_smoothed'],
+            'candidates_co': candidates_co,
+            'candidates_co_qichao': candidates_co_qichao,
+            'preciseCOs': preciseCOs,
+            'refinedCOs': refinedCOs,
+            'refinedCOs_qichao': refinedCOs_qichao}
+
+#==============================================================================
+
+def ExportOffspringCOs(config:dict, outdir:str, results:dict):
+    """
+    Description:    save the genotype of the smoothed windows and the COs of
+                    an offspring in outdir
+    Input:
+    - config:       config file of the launcher
+    - outdir:       output directory of the offspring
+    - results:      output of OffspringCOs()
+    """
+    export_dict_in_file(my_dict = results['offspring_genotype_window_smoothed'],
+                       output_file=outdir + "offspring_genotype_window_normalized_smoothed.txt",
+                       header="chr_window\tstart\tstop\tADref/DP\tADalt/DP\tprobHomoRef\tprobHetero\tprobHomoAlt\tgenotype",
+                       overwrite=True)
+
+    for name, output_file in [('candidates_co', "candidateCO.txt"),
+            ('preciseCOs', "preciseCOs_" + str(config['new_window_size']) + "_kb" + ".txt")]:
+        updated_cos = OrderedDict()
+        for chr_window, details in results[name].items():
+            start_win_stop_win, co_start, co_stop, pre_geno, cur_geno = details
+            updated_cos[chr_window] =  [start_win_stop_win, co_start, co_stop,
+                co_stop - co_start, pre_geno, cur_geno]
+
+        export_dict_in_file(my_dict = updated_cos,
+                           output_file=outdir + output_file,
+                           header="chr_mean_win\tstart_win:stop_win\tstart_co\tstop_co\t(stop_co-start_co)\tpre_geno\tcur_geno",
+                           overwrite=True)
+
+    export_dict_in_file(my_dict = results['candidates_co_qichao'],
+                       output_file=outdir + "candidates_co_qichao.txt",
+                       header="chr_mean_win\tstart_win:stop_win\tstart_co\tstop_co\tpre_geno\tcur_geno",
+                       overwrite=True)
+
+    export_dict_in_file(my_dict = results['refinedCOs'],
+                       output_file=outdir + "refinedCOs.txt",
+                       header="chr_mean_win\tstart_co\tstop_co\tpre_geno\tcur_geno",
+                       overwrite=True)
+
+    export_dict_in_file(my_dict = results['refinedCOs_qichao'],
+                       output_file=outdir + "refinedCOs_qichao.txt",
+                       header="chr_mean_win\tstart_co\tstop_co\tpre_geno\tcur_geno",
+                       overwrite=True)
+
+#==============================================================================
+
+def ProcessOffspring(config:dict, analyze_id:str, sample_vcf:str):
+    """
+    Description:    run the steps of the launcher specific to one offspring
+                    (STEP 4 to STEP 10) with the parental data of the worker
+                    and save the COs in output_dir_in_polyrec/analyze_id/
+    Input:
+    - config:       config file of the launcher
+    - analyze_id:   name of the offspring
+    - sample_vcf:   offspring vcf
+    Output:
+    - analyze_id, number of candidate COs
+    """
+    outdir = config['path_to_polyrec_project'] + config['output_dir_in_polyrec'] + \
+        analyze_id + "/"
+    os.makedirs(outdir, exist_ok=True)
+
+    # STEP 4. Load offspring snps from vcf
+    offspring_snps, offspring_last_snp_chr = ReadOffspringVCF(
+        input_vcf=sample_vcf,
+        parental_snps=PARENTAL_DATA['parental_snps'],
+        prefix_chr=config['prefix_chr'],
+        geno_ref=config['genotype_ref'],
+        geno_alt=config['genotype_alt'],
+        analyze_id=analyze_id,
+        snps_log=config.get('snps_log', True),
+        compress_log=config.get('compress_snps_log', False)
+        )
+
+    results = OffspringCOs(config, offspring_snps, PARENTAL_DATA)
+    ExportOffspringCOs(config, outdir, results)
+
+    return analyze_id, len(results['candidates_co'])
+
+#==============================================================================
+
+def RunBatch(config:dict, samples:OrderedDict, workers:int):
+    """
+    Description:    run ProcessOffspring() for each offspring in a process
+                    pool, an error on one offspring does not stop the others.
+    Input:
+    - config:       config file of the launcher
+    - samples:      output of ReadSampleSheet()
+    - workers:      number of processes
+    Output:
+    - failed[analyze_id] = error message
+    """
+    parental_data = PrepareParentalData(config)
+
+    # fork shares the parental data with the workers without copy, other
+    # start methods (Windows, macOS) send it once to each worker
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = multiprocessing.get_context()
+
+    failed = OrderedDict()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                             initializer=InitWorker, initargs=(parental_data,)) as executor:
+        futures = {executor.submit(ProcessOffspring, config, analyze_id, sample_vcf): analyze_id
+                   for analyze_id, sample_vcf in samples.items()}
+
+        for future in as_completed(futures):
+            analyze_id = futures[future]
+            try:
+                analyze_id, nb_cos = future.result()
+                hues.success(analyze_id + ":\t" + str(nb_cos) + " candidate COs")
+            # CheckInput() exits when an input file is missing
+            except (Exception, SystemExit) as error:
+                hues.error(analyze_id + ":\t" + type(error).__name__ + ": " + str(error))
+                failed[analyze_id] = type(error).__name__ + ": " + str(error)
+
+    return failed
+
+
+###############################################################################
+
+if __name__ == "__main__":
+
+    print("# Load config file and sample sheet")
+    print("-------------------------------------")
+
+    if len(sys.argv) < 3:
+        raise ImportError("Please give the config file (.yaml) and the sample sheet for detectCOs")
+
+    config_file = sys.argv[1]
+    with open(config_file, "r") as cf:
+        config = yaml.load(cf, Loader=yaml.FullLoader)
+
+    # sample sheet path is relative to the directory where the script is run
+    samples = ReadSampleSheet(os.path.abspath(sys.argv[2]))
+
+    # Set current working directory at the root of polyrec project
+    os.chdir(config['path_to_polyrec_project'])
+
+    workers = config.get('batch_workers', os.cpu_count())
+    print("Run " + str(len(samples)) + " offspring with " + str(workers) + " workers")
+
+    failed = RunBatch(config, samples, workers)
+
+    print("\n# " + str(len(samples) - len(failed)) + " offspring done, " +
+          str(len(failed)) + " failed")
+    for analyze_id, error in failed.items():
+        print(analyze_id + "\t" + error)
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,99 @@
+import os, sys
+import yaml
+
+from detectCOs_read_files import *
+from detectCOs_sliding_window import *
+from collections import OrderedDict
+
+# Usage: python3 path/to/folder/detectCOs_check_stream.py config_detectCOs.yaml
+#
+# Check that the sliding windows computed with stream_vcf (StreamParentalVCF(),
+# StreamOffspringVCF(), ParentalSlidingWindowStream(),
+# OffspringSlidingWindowStream()) are the same as the windows computed from the
+# dictionnaries of ReadParentalVCF() and ReadOffspringVCF(), for window_size and
+# new_window_size of the config file. Exit with status 1 if they differ.
+
+
+###############################################################################
+
+def CompareWindows(name:str, expected:OrderedDict, streamed:OrderedDict):
+    """
+    Description:    compare two outputs of the sliding windows
+    Input:
+    - name:         name of the windows in the messages
+    - expected:     windows computed from the dictionnaries
+    - streamed:     windows computed from the stream
+    Output:
+    - True if the windows are the same
+    """
+    if list(expected.keys()) != list(streamed.keys()):
+        hues.error(name + ": " + str(len(expected)) + " windows expected, " + \
+            str(len(streamed)) + " windows streamed")
+        return False
+
+    different = [key for key, value in expected.items() if list(value) != list(streamed[key])]
+    if different:
+        hues.error(name + ": " + str(len(different)) + " different windows (first: " + \
+            different[0] + " " + str(expected[different[0]]) + " != " + \
+            str(streamed[different[0]]) + ")")
+        return False
+
+    hues.success(name + ": " + str(len(expected)) + " same windows")
+    return True
+
+
+###############################################################################
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 2:
+        raise ImportError("Please give the config file (.yaml) for detectCOs")
+
+    config_file = sys.argv[1]
+    with open(config_file, "r") as cf:
+        config = yaml.load(cf, Loader=yaml.FullLoader)
+
+    # Set current working directory at the root of polyrec project
+    os.chdir(config['path_to_polyrec_project'])
+
+    chr_length = ReadChrLen(input_chr_len=config['chr_len'],
+                            prefix_chr=config['prefix_chr'])
+
+    parental_snps, parental_last_snp_chr = ReadParentalVCF(
+        input_vcf=config['parental_vcf'],
+        prefix_chr=config['prefix_chr']
+        )
+    offspring_snps, offspring_last_snp_chr = ReadOffspringVCF(
+        input_vcf=config['sample_vcf'],
+        parental_snps=parental_snps,
+        prefix_chr=config['prefix_chr'],
+        geno_ref=config['genotype_ref'],
+        geno_alt=config['genotype_alt'],
+        analyze_id=config['analyze_id'],
+        snps_log=False
+        )
+
+    parental_batches = list(StreamParentalVCF(
+        input_vcf=config['parental_vcf'],
+        prefix_chr=config['prefix_chr']
+        ))
+    parental_positions = OrderedDict((cur_chr, positions) for cur_chr, positions, last_snp_pos in parental_batches)
+    offspring_batches = list(StreamOffspringVCF(
+        input_vcf=config['sample_vcf'],
+        parental_positions=parental_positions,
+        prefix_chr=config['prefix_chr'],
+        analyze_id=config['analyze_id'],
+        snps_log=False
+        ))
+
+    same = True
+    for window_size in [config['window_size'], config['new_window_size']]:
+        same &= CompareWindows("parental windows " + str(window_size) + " kb",
+            ParentalSlidingWindow(chr_length, parental_snps, parental_last_snp_chr, window_size),
+            ParentalSlidingWindowStream(chr_length, parental_batches, window_size)[0])
+        same &= CompareWindows("offspring windows " + str(window_size) + " kb",
+            OffspringSlidingWindow(chr_length, offspring_snps, parental_last_snp_chr, window_size),
+            OffspringSlidingWindowStream(chr_length, offspring_batches, parental_last_snp_chr, window_size)[0])
+
+    if not same:
+        sys.exit(1)
@@ -15,13 +15,253 @@
 
 
 
-import hues
+import hues, os, sys
+import numpy as np
 from collections import OrderedDict
 from detectCOs_required_functions import *
+# detectCOs_genotype_track.py is shared by detectCOs_classic and detectCOs_EMS
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detectCOs_genotype_track import GenotypeTrack
 
 #==============================================================================
 
 
+def EncodeGenotypes(genotypes:list):
+	"""
+	Description:	integer codes of the genotypes of consecutive windows
+	Input:
+	- genotypes:	list of genotypes ("NA" for missing genotype)
+	Output:
+	- codes:		numpy array, code of the genotype of each window
+	- names:		names[code] = genotype
+	"""
+	names = list(OrderedDict.fromkeys(genotypes))
+	code_of = {name: code for code, name in enumerate(names)}
+	codes = np.array([code_of[genotype] for genotype in genotypes], dtype=np.int32)
+	return codes, names
+
+#==============================================================================
+
+def GenotypeWindowsArrays(offspring_genotype_window_smoothed, cur_chr:str, first_win:int, last_win:int):
+	"""
+	Description:	borders and genotype codes of the windows first_win to 
+					last_win (included) of cur_chr
+	Input:
+	- offspring_genotype_window_smoothed:	[chr_window] = [start, stop, ..., genotype]
+											or GenotypeTrack
+	Output:
+	- starts, stops:	lists
+	- codes, names:		see EncodeGenotypes()
+	"""
+	if isinstance(offspring_genotype_window_smoothed, GenotypeTrack):
+		return offspring_genotype_window_smoothed.window_arrays(cur_chr, first_win, last_win)
+
+	windows = [offspring_genotype_window_smoothed[cur_chr + "_" + str(num_win)] \
+		for num_win in range(first_win, last_win + 1)]
+	codes, names = EncodeGenotypes([window[7] for window in windows])
+	return [window[0] for window in windows], [window[1] for window in windows], codes, names
+
+#==============================================================================
+
+def IdentifyCOsThresholds(codes, names:list, nb_win:int):
+	"""
+	Description:	number of windows required to support a genotype for each
+					pair of consecutive windows of a chromosome, see 
+					IdentifyCOs(): 2 for the 10 first and 10 last windows 
+					(with some exceptions), 5 elsewhere
+	Input:
+	- codes, names:	output of EncodeGenotypes() for the windows 1 to nb_win
+	- nb_win:		number of windows of the chromosome
+	Output:
+	- thr_support:	numpy array, thr_support[num_win - 1] for the windows 
+					num_win and num_win + 1
+	"""
+	na_code = names.index("NA") if "NA" in names else -1
+	start_wins = np.arange(1, nb_win)
+	geno_start = codes[:-1]
+	geno_stop = codes[1:]
+	same_geno = (geno_stop == geno_start) & (geno_start != na_code)
+
+	thr_support = np.full(nb_win - 1, 5)
+
+	first_wins = start_wins <= 10
+	thr_support[first_wins] = np.where((start_wins[first_wins] == 10) & same_geno[first_wins], 5, 2)
+
+	last_wins = ~first_wins & (start_wins >= nb_win - 10)
+	if last_wins.any():
+		ref_geno = codes[nb_win - 10 - 1]
+		thr_5 = ((start_wins <= nb_win - 6) & same_geno & (geno_start == ref_geno)) | \
+			((start_wins == nb_win - 10) & (geno_stop != geno_start) & (geno_start != na_code))
+		thr_support[last_wins] = np.where(thr_5[last_wins], 5, 2)
+
+	return thr_support
+
+#==============================================================================
+
+def IdentifyCOsGenotypeRuns(cur_chr:str, codes, names:list, starts:list, stops:list, \
+	thr_support, first_win:int, candidates_co:OrderedDict, db_co:OrderedDict, reset_pre_win:bool=True):
+	"""
+	Description:	state machine of IdentifyCOs() and PreciseCOs() on the
+					runs of windows with the same genotype of a chromosome.
+					Inside a run, the support of the genotype only grows, so
+					the window where it reaches thr_support is found by
+					comparing the run length to the thresholds; the state
+					machine is run window by window only at the genotype
+					changes.
+	Input:
+	- cur_chr:			chromosome
+	- codes, names:		output of EncodeGenotypes() for consecutive windows
+	- starts, stops:	borders of these windows
+	- thr_support:		number of windows required to support a genotype for 
+						each pair of consecutive windows (len(codes) - 1 values)
+	- first_win:		number of the first window
+	- candidates_co, db_co:	dictionnaries completed with the COs found (see 
+						IdentifyCOs())
+	- reset_pre_win:	reset the last window of the previous genotype after 
+						a CO found at a genotype change (IdentifyCOs())
+	"""
+	nb_windows = len(codes)
+	if nb_windows < 2:
+		return
+
+	na_code = names.index("NA") if "NA" in names else -1
+	hetero = ["/" in name for name in names]
+	thr_support = np.broadcast_to(np.asarray(thr_support), (nb_windows - 1,))
+	thresholds = thr_support.tolist()
+
+	# run-length encoding of the genotypes: first and last window of each run
+	run_bounds = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+	run_firsts = [0] + run_bounds.tolist()
+	run_lasts = (run_bounds - 1).tolist() + [nb_windows - 1]
+	run_codes = codes[run_firsts].tolist()
+
+	def MiddleWindow(num_win):
+		index = num_win - first_win
+		if not 0 <= index < nb_windows:
+			raise KeyError(cur_chr + "_" + str(num_win))
+		return int((starts[index] + stops[index]) / 2)
+
+	def AddCO(pre_win, stop_co_win, pre_geno, cur_geno):
+		co_start = MiddleWindow(pre_win)
+		co_stop = MiddleWindow(stop_co_win)
+		key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
+		candidates_co[key] = [str(pre_win) + ":" + str(stop_co_win), co_start, co_stop, \
+			names[pre_geno], names[cur_geno]]
+		if not hetero[pre_geno] and not hetero[cur_geno]:
+			db_co[key] = [cur_chr, str(pre_win) + ":" + str(stop_co_win), names[pre_geno], \
+				names[cur_geno], "supported"]
+
+	cur_support = 1 # number of window that support current genotype
+	pre_num = 1 # number of window that support current genotype after a NA transition
+	pre_geno = None # genotype of the window before the hypothetical CO (None = "")
+	pre_win = 0 # last window of the previous genotype
+	count_NA = 0 # number of consecutive NA window
+	support_preNA = 0 # support of genotype before starting NA region
+	geno_preNA = None
+	win_preNA = None
+
+	for num_run, (run_first, run_last, geno) in enumerate(zip(run_firsts, run_lasts, run_codes)):
+
+		# windows with the same genotype
+		nb_steps = run_last - run_first
+		if nb_steps > 0:
+			if geno == na_code:
+				count_NA += nb_steps
+			elif pre_geno is None or pre_geno == geno:
+				cur_support += nb_steps
+			else:
+				supported = np.flatnonzero(cur_support + np.arange(1, nb_steps + 1) >= \
+					thr_support[run_first:run_last])
+				if len(supported):
+					step = int(supported[0])
+					cur_win = first_win + run_first + step + 1
+					thr = thresholds[run_first + step]
+					cur_support += step + 1
+					if support_preNA < thr and support_preNA != 0:
+						# if there is some NA window during the count of cur_support
+						stop_co_win = cur_win - cur_support - count_NA + 1
+					else:
+						stop_co_win = cur_win - cur_support + 1
+					AddCO(pre_win, stop_co_win, pre_geno, geno)
+					pre_geno = None
+					count_NA = 0
+					support_preNA = 0
+					cur_support += nb_steps - step - 1
+				else:
+					cur_support += nb_steps
+
+		if num_run == len(run_codes) - 1:
+			break
+
+		# genotype change between the last window of the run and the next one
+		start_win = first_win + run_last
+		stop_win = start_win + 1
+		geno_start = geno
+		geno_stop = run_codes[num_run + 1]
+		thr = thresholds[run_last]
+
+		if geno_start == na_code or geno_stop == na_code:
+			if geno_stop == na_code:
+				# when enter in NA region
+				geno_preNA = geno_start
+				win_preNA = start_win
+				count_NA = 1
+				support_preNA = cur_support
+				continue
+
+			elif geno_stop == geno_preNA:
+				cur_support += 1
+				support_preNA = cur_support
+				if support_preNA >= thr and pre_geno is not None and pre_geno != geno_stop:
+					stop_co_win = stop_win - cur_support - count_NA + 1
+					AddCO(pre_win, stop_co_win, pre_geno, geno_stop)
+					pre_geno = None
+					if reset_pre_win:
+						pre_win = 0
+					count_NA = 0
+					support_preNA = 0
+					geno_preNA = None
+				continue
+
+			elif cur_support >= thr:
+				# edit pre_geno and pre_win with the information before NA region
+				pre_geno = geno_preNA
+				pre_win = win_preNA
+				geno_preNA = None
+				win_preNA = None
+			else:
+				cur_support = pre_num
+				support_preNA = 0
+				geno_preNA = None
+				continue
+
+		elif cur_support >= thr:
+			pre_geno = geno_start
+			pre_win = start_win
+			support_preNA = 0
+			pre_num = cur_support
+
+		cur_support = 1
+
+		if not hetero[geno_start] and not hetero[geno_stop] and geno_start != na_code and geno_stop != na_code:
+			key_db_co = cur_chr + "_" + str((start_win + stop_win) / 2)
+			db_co[key_db_co] = [cur_chr, str(start_win) + ":" + str(stop_win), names[geno_start], \
+				names[geno_stop], "not_supported"]
+
+		if pre_geno is not None and cur_support >= thr:
+			if support_preNA < thr and support_preNA != 0:
+				stop_co_win = stop_win - cur_support - count_NA + 1
+			else:
+				stop_co_win = stop_win - cur_support + 1
+			AddCO(pre_win, stop_co_win, pre_geno, geno_stop)
+			pre_geno = None
+			count_NA = 0
+			support_preNA = 0
+			if reset_pre_win:
+				pre_win = 0
+
+#==============================================================================
+
 def IdentifyCOs(offspring_genotype_window_smoothed, nb_windows_chr): 
 	"""
 	Description:	Find location of hypothetical cross-over according to the change of genotype
@@ -29,6 +269,7 @@ def IdentifyCOs(offspring_genotype_window_smoothed, nb_windows_chr):
 	Input:			- offspring_genotype_window_smoothed: Ordered dictionnary 
 					from SmoothNormalizedOsffspringSlidingWindow containing :
 					[chr_window] = [start, stop, ADref/DP, ADalt/DP, probHomoRef, probHetero, probHomoAlt, genotype]
+					or the GenotypeTrack of these windows
 					
 					- nb_windows_chr:	number of window per chromosome, determine with function
 					NormalizeOffspringSlidingWindow()
@@ -54,199 +295,16 @@ def IdentifyCOs(offspring_genotype_window_smoothed, nb_windows_chr):
 
 	candidates_co = OrderedDict()
 	db_co = OrderedDict() # save all homo to another homo genotype even if they are not enough supported
-	thr_support = int() # number of windows to support genotype = threshold support
 
 	for cur_chr, nb_win in nb_windows_chr.items(): ## iteration on each chromosome
 		nb_win = int(nb_win)
+		if nb_win < 2:
+			continue
 
-		# information about the window num_win
-		cur_support = 1 # number of window that support current genotype
-		pre_num = 1  # number of window that support current genotype after a NA transition # modif MY
-		cur_geno = str() # genotype of current window(=geno_stop)
-		cur_win = int() # current window = num_win + 1 
-
-		# information about the previous supported geonotype
-		pre_geno = "" # genotype of the window before the hypothetical COs
-		pre_win = int() # last window of the previous genotype (before hypothetical COs) 
-
-		# count between previous genotype and current genotype
-		count_NA = 0 # number of consecutive NA window
-		support_preNA = 0 # support of genotype before starting NA region
-		geno_preNA = "" # initialize geno_preNA at the start of processing each chromosome # modify MY
-
-
-		for num_win in range(1, nb_win): # iteration on the each window of each chromosome cur_chr
-
-			# Define genotype for window start and stop
-			start_win = num_win # from 1 to the penultimate num_win (due to range function)
-			key_start = cur_chr + "_" + str(start_win)
-			geno_start = offspring_genotype_window_smoothed[key_start][7]
-
-			stop_win = num_win + 1 # from 2 to the last num_win
-			key_stop = cur_chr + "_" + str(stop_win)
-			geno_stop = offspring_genotype_window_smoothed[key_stop][7]
-
-			## Edit the thr_support = min number of window to validate a COs   # modify MY
-			if start_win <= 10: 
-				# for 9 first  slides   # modify MY
-				if stop_win == 11 and geno_stop == geno_start != "NA":   # modify MY
-					thr_support = 5 
-				else:
-					thr_support = 2  
-			elif start_win >= (nb_win - 10):
-				# for 9 last slides
-				if start_win >= (nb_win - 10) and start_win <= (nb_win - 6) and geno_stop == geno_start == offspring_genotype_window_smoothed[cur_chr + "_" + str(nb_win - 10)][7] != "NA":  # modify MY
-					thr_support = 5
-				elif start_win == (nb_win - 10) and geno_stop != geno_start != "NA":
-					thr_support = 5
-				else:
-					thr_support = 2
-			else: # for all other windows 
-				thr_support = 5
-
-			## Initialization of the start and stop posistion of the CO
-			co_start = int() # mean position of the start window of the crossover
-			co_stop = int() # mean position of the stop window of the crossover
-			stop_co_win = int() # number of window of the end of the crossover region
-
-
-			if geno_start != geno_stop :
-
-				if geno_start == "NA" or geno_stop == "NA":
-					if geno_start != "NA" and geno_stop == "NA" : 
-						# when enter in NA region:
-						geno_preNA = geno_start
-						win_preNA = start_win
-						count_NA = 1
-						support_preNA = cur_support
-						continue
-					
-					elif geno_start == "NA" and geno_stop == geno_preNA :
-						cur_support +=1
-						support_preNA = cur_support  # modify MY
-
-
-						if support_preNA >= thr_support and pre_geno != "" and pre_geno !=  geno_stop:	## voir cas 13   # modif MY
-							cur_win = stop_win
-							cur_geno = geno_stop
-							stop_co_win = cur_win - cur_support - count_NA + 1 
-							
-							co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-							offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
-
-							co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-		    				offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
-
-							key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
-							candidates_co[key] = [str(pre_win) + ":" + str(stop_co_win), co_start, co_stop, pre_geno, cur_geno]
-
-							if ("/" not in pre_geno) and ("/" not in cur_geno) :
-								db_co[key] = [cur_chr, str(pre_win) + ":" + str(stop_co_win), pre_geno, cur_geno, "supported"]
-							
-							pre_geno = ""                             # modify MY
-							pre_win = int()                           # modify MY
-							count_NA = 0                              # modify MY
-							support_preNA = 0                         # modify MY
-							geno_preNA = ""  # Also reset geno_preNA  # modify MY
-							
-						continue
-
-					elif geno_start == "NA" and geno_stop != geno_preNA:
-						if cur_support >= thr_support:
-							# if geno_stop != geno_preNA, edit pre_geno and pre_win with the information before NA region
-							pre_geno = geno_preNA # genotype before NA region
-							pre_win = win_preNA # last window before NA region
-							geno_preNA = ""
-							win_preNA = ""
-						else: # Added by MY
-							pre_geno = pre_geno  # test MY
-							pre_win = pre_win # test MY
-							cur_support = pre_num # test MY
-							cur_geno = geno_stop # test MY
-							cur_win = stop_win # test MY
-							support_preNA = 0 # test MY
-							geno_preNA = "" # test MY
-							continue # test MY
-
-				elif cur_support >= thr_support:
-					# if genotype change between start and stop num_win and
-					# genotype supported by at least threshold support (2 or 5)
-					pre_geno = geno_start # genotype of window before CO
-					pre_win = start_win # window before CO
-					support_preNA = 0                                        # modify MY
-					pre_num = cur_support # useless # modify MY
-				
-				cur_support = 1 # reset cur_support
-
-				if ("/" not in geno_start) and ("/" not in geno_stop) and geno_start != "NA" and geno_stop != "NA":
-					key_db_co = cur_chr + "_" + str((start_win + stop_win) / 2)
-					db_co[key_db_co] = [cur_chr, str(start_win) + ":" + str(stop_win), geno_start, geno_stop, "not_supported"]
-		
-				if pre_geno != "" and cur_support >= thr_support:  # Added by MY
-					cur_geno = geno_stop
-					cur_win = stop_win
-					#log("Crossover candidate detected due to genotype change and validate thr_support in last window.")
-					if support_preNA < thr_support and support_preNA != 0 : 
-						# if there is some NA window during the count of cur_support
-						stop_co_win = cur_win - cur_support - count_NA + 1
-					else : 
-						stop_co_win = cur_win - cur_support + 1
-
-					co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-						offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
-
-					co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-		    			offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
-
-					## Edit candidate
-					key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
-					candidates_co[key] = [str(pre_win) + ":" + str(stop_co_win), co_start, co_stop, pre_geno, cur_geno]
-					#log(f"key {key} supported by {cur_support} in candidateCO at last window.")
-
-					if ("/" not in pre_geno) and ("/" not in cur_geno) :
-						db_co[key] = [cur_chr, str(pre_win) + ":" + str(stop_co_win), pre_geno, cur_geno, "supported"]
-
-					pre_geno = ""
-					count_NA = 0
-					support_preNA = 0
-					pre_win = int()                           # test MY
-			
-			else: # geno_start == geno_stop 
-				cur_geno = geno_stop
-				cur_win = stop_win
-
-				if cur_geno == "NA" :
-					count_NA += 1 
-					continue
-				
-				cur_support += 1
-
-				if pre_geno == cur_geno:
-					continue
-
-				elif pre_geno != "" and cur_support >= thr_support: # modify MY
-					if support_preNA < thr_support and support_preNA != 0 : 
-						# if there is some NA window during the count of cur_support
-						stop_co_win = cur_win - cur_support - count_NA + 1
-					else : 
-						stop_co_win = cur_win - cur_support + 1
-
-					co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-						offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
-
-					co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-		    			offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
-
-					## Edit candidate
-					key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
-					candidates_co[key] = [str(pre_win) + ":" + str(stop_co_win), co_start, co_stop, pre_geno, cur_geno]
-
-					if ("/" not in pre_geno) and ("/" not in cur_geno) :
-						db_co[key] = [cur_chr, str(pre_win) + ":" + str(stop_co_win), pre_geno, cur_geno, "supported"]
-
-					pre_geno = ""
-					count_NA = 0
-					support_preNA = 0
+		starts, stops, codes, names = GenotypeWindowsArrays(offspring_genotype_window_smoothed, cur_chr, 1, nb_win)
+		thr_support = IdentifyCOsThresholds(codes, names, nb_win)
+		IdentifyCOsGenotypeRuns(cur_chr, codes, names, starts, stops, thr_support, 1, \
+			candidates_co, db_co, reset_pre_win=True)
 
 	### Raise warning for all double COs found in the data
 	if len(db_co) != 0:
@@ -286,179 +344,12 @@ def PreciseCOs(offspring_genotype_window_smoothed, start_window=None, end_window
 		end_window = int(list(offspring_genotype_window_smoothed.keys())[-1].split("_")[1])
 	
 	cur_chr = list(offspring_genotype_window_smoothed.keys())[-1].split("_")[0]
-	
-
-	# Initial variables for tracking changes
-
-	cur_support, cur_geno, cur_win = 1, '', 0
-	pre_num = 1  # number of window that support current genotype after a NA transition # modif MY
-	pre_geno, pre_win = '', 0
-	count_NA, support_preNA, geno_preNA = 0, 0, ''
-
-	for num_win in range(start_win, end_window):  # Adjusted to work within specified window range
-		
-		# Define genotype for window start and stop
-		start_win = num_win # from 1 to the penultimate num_win (due to range function)
-		key_start = cur_chr + "_" + str(start_win)
-		geno_start = offspring_genotype_window_smoothed[key_start][7]
-
-		stop_win = num_win + 1 # from 2 to the last num_win
-		key_stop = cur_chr + "_" + str(stop_win)
-		geno_stop = offspring_genotype_window_smoothed[key_stop][7]
-		#(f"Window start genotype: {geno_start}, Window stop genotype: {geno_stop}")
-
-		relative_position = num_win - start_window + 1
-		relative_end_position = end_window - start_window + 1
-		
-		## Initialization of the start and stop posistion of the CO
-		co_start = int() # mean position of the start window of the crossover
-		co_stop = int() # mean position of the stop window of the crossover
-		stop_co_win = int() # number of window of the end of the crossover region
-
-
-		if geno_start != geno_stop :
-			#print("Genotype change detected between consecutive windows.")
-			
-			if geno_start == "NA" or geno_stop == "NA":
-				#print("Handling NA genotype scenario...")
-				if geno_start != "NA" and geno_stop == "NA" :
-					#print("Handling NA genotype scenario...")
-
-					# when enter in NA region:
-					geno_preNA = geno_start
-					win_preNA = start_win
-					count_NA = 1
-					support_preNA = cur_support
-
-					continue
-				
-				elif geno_start == "NA" and geno_stop == geno_preNA :
-					cur_support +=1
-					support_preNA = cur_support  # modify MY
-
-					if support_preNA >= thr_support and pre_geno != "" and pre_geno !=  geno_stop:	## voir cas 13  # modif MY
-						cur_win = stop_win
-						cur_geno = geno_stop
-						stop_co_win = cur_win - cur_support - count_NA + 1 
-						
-						co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-						offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
-
-						co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-						offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
-
-						key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
-						candidates_co[key] = [str(pre_win) + ":" + str(stop_co_win), co_start, co_stop, pre_geno, cur_geno]
-
-						if ("/" not in pre_geno) and ("/" not in cur_geno) :
-							db_co[key] = [cur_chr, str(pre_win) + ":" + str(stop_co_win), pre_geno, cur_geno, "supported"]
-						# Reset variables after detecting a CO
-						pre_geno = "" # modify MY
-						count_NA = 0  # modify MY
-						support_preNA = 0 # modify MY
-						geno_preNA = ""  # Also reset geno_preNA  # modify MY #test
-
-					continue
-
-				elif geno_start == "NA" and geno_stop != geno_preNA:
-					if cur_support >= thr_support:
-						# Logic to record crossover event
-						# if geno_stop != geno_preNA, edit pre_geno and pre_win with the information before NA region
-						pre_geno = geno_preNA # genotype before NA region
-						pre_win = win_preNA # last window before NA region
-						geno_preNA = ""
-						win_preNA = ""
-					else: # Added by MY
-						pre_geno = pre_geno  # test MY
-						pre_win = pre_win # test MY
-						cur_support = pre_num # test MY
-						cur_geno = geno_stop # test MY
-						cur_win = stop_win # test MY
-						support_preNA = 0 # test MY
-						geno_preNA = "" # test MY
-						continue # test MY
-					
-
-			elif cur_support >= thr_support:
-				# if genotype change between start and stop num_win and
-				# genotype supported by at least threshold support (2 or 5)
-				pre_geno = geno_start # genotype of window before CO
-				pre_win = start_win # window before CO
-				support_preNA = 0 # modify MY
-				pre_num = cur_support # useless
-			
-			cur_support = 1 # reset cur_support
-
-			if ("/" not in geno_start) and ("/" not in geno_stop) and geno_start != "NA" and geno_stop != "NA":
-				key_db_co = cur_chr + "_" + str((start_win + stop_win) / 2)
-				db_co[key_db_co] = [cur_chr, str(start_win) + ":" + str(stop_win), geno_start, geno_stop, "not_supported"]
-
-			if pre_geno != "" and cur_support >= thr_support:  # Added by MY
-				cur_geno = geno_stop
-				cur_win = stop_win
-				#log("Crossover candidate detected due to genotype change and validate thr_support in last window.")
-				if support_preNA < thr_support and support_preNA != 0 : 
-					# if there is some NA window during the count of cur_support
-					stop_co_win = cur_win - cur_support - count_NA + 1
-				else : 
-					stop_co_win = cur_win - cur_support + 1
-
-				co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-					offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
-
-				co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-					offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
-
-				## Edit candidate
-				key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
-				candidates_co[key] = [str(pre_win) + ":" + str(stop_co_win), co_start, co_stop, pre_geno, cur_geno]
-				#log(f"key {key} supported by {cur_support} in candidateCO at last window.")
-
-				if ("/" not in pre_geno) and ("/" not in cur_geno) :
-					db_co[key] = [cur_chr, str(pre_win) + ":" + str(stop_co_win), pre_geno, cur_geno, "supported"]
-
-				pre_geno = ""
-				count_NA = 0
-				support_preNA = 0	
-		
-		else: # geno_start == geno_stop 
-			cur_geno = geno_stop
-			cur_win = stop_win
 
-			if cur_geno == "NA" :
-				count_NA += 1 
-				continue
-			
-			cur_support += 1
-			#print(f"Genotype {geno_stop} supported by {cur_support} consecutive windows.")
-			
-			if pre_geno == cur_geno:
-				continue
-			
-			elif pre_geno != "" and cur_support >= thr_support:
-				#print("Crossover candidate detected due to genotype change.")
-				if support_preNA < thr_support and support_preNA != 0 : 
-					# if there is some NA window during the count of cur_support
-					stop_co_win = cur_win - cur_support - count_NA + 1
-				else : 
-					stop_co_win = cur_win - cur_support + 1
-
-				co_start = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][0] + \
-					offspring_genotype_window_smoothed[cur_chr + "_" + str(pre_win)][1]) / 2)
-
-				co_stop = int((offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][0] + \
-					offspring_genotype_window_smoothed[cur_chr + "_" + str(stop_co_win)][1]) / 2)
-
-				## Edit candidate
-				key = cur_chr + "_" + str(round((pre_win + stop_co_win) / 2, 1))
-				candidates_co[key] = [str(pre_win) + ":" + str(stop_co_win), co_start, co_stop, pre_geno, cur_geno]
-
-				if ("/" not in pre_geno) and ("/" not in cur_geno) :
-					db_co[key] = [cur_chr, str(pre_win) + ":" + str(stop_co_win), pre_geno, cur_geno, "supported"]
-
-				pre_geno = ""
-				count_NA = 0
-				support_preNA = 0
+	if end_window > start_win:
+		starts, stops, codes, names = GenotypeWindowsArrays(offspring_genotype_window_smoothed, cur_chr, \
+			start_win, end_window)
+		IdentifyCOsGenotypeRuns(cur_chr, codes, names, starts, stops, thr_support, start_win, \
+			candidates_co, db_co, reset_pre_win=False)
 
 	### Raise warning for all double COs found in the data
 	if len(db_co) != 0:
@@ -471,181 +362,246 @@ def PreciseCOs(offspring_genotype_window_smoothed, start_window=None, end_window
 	return candidates_co, db_co
 
 
-###############################################################################
+#==============================================================================
 
-def RefineCOBorders(CandidateCOs, Offspring_infoSNPs, window_size):
-	print()
-	hues.info("Refine crossover borders")
+def WindowIndex(offspring_genotype_window):
+	"""
+	Description:	borders of the sliding windows by chromosome, to find the
+					windows of a region with a binary search
+	Input:
+	- offspring_genotype_window:	[chr_window] = [start, stop, ...] (windows
+									of a chromosome sorted by position)
+	Output:
+	- window_index[chr] = [starts, stops, keys], starts and stops are numpy
+	  arrays, keys the list of chr_window keys
+	"""
+	rows = OrderedDict()
+	for key, value in offspring_genotype_window.items():
+		cur_chr = key.split("_")[0]
+		rows.setdefault(cur_chr, [[], [], []])
+		rows[cur_chr][0].append(value[0])
+		rows[cur_chr][1].append(value[1])
+		rows[cur_chr][2].append(key)
 
-	RefinedCOs = OrderedDict() 
+	window_index = OrderedDict()
+	for cur_chr, (starts, stops, keys) in rows.items():
+		window_index[cur_chr] = [np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64), keys]
 
-	for co_key, co_value in CandidateCOs.items():
+	return window_index
 
-		cur_chr, cur_pos = co_key.split("_")
-		win, cur_start, cur_stop, pre_geno, cur_geno = co_value
+#==============================================================================
 
-		cur_start = int(cur_start - window_size / 2 * 1000)
-		cur_stop = int(cur_stop + window_size / 2 * 1000)
+def WindowsInRegion(window_index, cur_chr, start, stop):
+	"""
+	Description:	keys of the windows of cur_chr included in [start, stop]
+	Input:
+	- window_index:	output of WindowIndex()
+	- cur_chr:		chromosome
+	- start:		first position of the region
+	- stop:			last position of the region
+	Output:
+	- list of chr_window keys, sorted by position
+	"""
+	if cur_chr not in window_index:
+		return []
+	starts, stops, keys = window_index[cur_chr]
+	first = int(np.searchsorted(starts, start, side="left"))
+	last = int(np.searchsorted(stops, stop, side="right"))
+	return keys[first:last]
 
-		if ("/" not in pre_geno) and ("/" in cur_geno):
+#==============================================================================
 
-			cur_geno1, cur_geno2 = cur_geno.split("/")
-			pre_geno_3 = pre_geno
-			cur_geno_3 = ""
-			comm_geno = ""
+def PreciseCOsCandidates(candidates_co, offspring_genotype_window_smoothed, flank=100000, window_index=None):
+	"""
+	Description:	run PreciseCOs() on the windows of a smaller size around
+					each candidate CO (the CO region +/- flank bp). If no CO is
+					found in these windows, the candidate CO is kept with
+					the first and last of these windows.
+	Input:
+	- candidates_co:	output of IdentifyCOs()
+	- offspring_genotype_window_smoothed:	smoothed windows of the smaller size
+	- flank:			bp added on each side of the CO region
+	- window_index:		output of WindowIndex() for these windows (computed
+						if None)
+	Output:
+	- preciseCOs[chr_window] = [start_win:stop_win, co_start, co_stop, pre_geno, cur_geno]
+	- db_co: double COs found by PreciseCOs()
+	"""
+	if window_index is None:
+		window_index = WindowIndex(offspring_genotype_window_smoothed)
 
-			if pre_geno == cur_geno1:
-				cur_geno_3 = cur_geno2
-			else:
-				cur_geno_3 = cur_geno1
-			comm_geno = pre_geno
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-					if refined_info_start != cur_start:
-						break
-
-			if refined_info_stop < refined_info_start:
-				refined_info_start = cur_start - 2000
-				# hues.warn("ERROR-info-2, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-2: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-2: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
-
-		elif ("/" in pre_geno) and ("/" not in cur_geno):
-
-			pre_geno1, pre_geno2 = pre_geno.split("/")
-			pre_geno_3 = ""
-			cur_geno_3 = cur_geno
-			comm_geno = ""
-
-			if pre_geno1 == cur_geno:
-				pre_geno_3 = pre_geno2
-			else:
-				pre_geno_3 = pre_geno1
-			comm_geno = pre_geno1
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(refined_infosnp_cnt - 1, 0, -1):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-
-					if refined_info_stop != cur_stop:
-						break
-
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-
-			if refined_info_stop < refined_info_start:
-				refined_info_stop = cur_stop + 2000
-				hues.warn("ERROR-info-3, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-3: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-3: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
+	preciseCOs = OrderedDict()
+	db_co = OrderedDict()
+
+	for co_key, co_value in candidates_co.items():
+		cur_chr = co_key.split("_")[0]
+		win, co_start, co_stop, pre_geno, cur_geno = co_value
+
+		keys = WindowsInRegion(window_index, cur_chr, co_start - flank + 1, co_stop + flank)
+		if not keys:
+			hues.warn("No window of the smaller size for the CO " + co_key + ", CO not refined")
+			preciseCOs[co_key] = co_value
+			continue
+
+		co_windows = OrderedDict((key, offspring_genotype_window_smoothed[key]) for key in keys)
+		start_window = int(keys[0].split("_")[1])
+		end_window = int(keys[-1].split("_")[1])
 
+		candidates_co_2, db_co_2 = PreciseCOs(co_windows, start_window=start_window, end_window=end_window)
+
+		if not candidates_co_2:
+			key = cur_chr + "_" + str(round((start_window + end_window) / 2, 1))
+			candidates_co_2[key] = [str(start_window) + ":" + str(end_window), co_start, co_stop, pre_geno, cur_geno]
+		preciseCOs.update(candidates_co_2)
+		db_co.update(db_co_2)
+
+	return preciseCOs, db_co
+
+
+###############################################################################
+
+def SnpGenotypesByChr(Offspring_infoSNPs):
+	"""
+	Description:	genotypes of the offspring SNPs sorted by position, by
+					chromosome, to find the SNPs of a CO with a binary search
+	Input:
+	- Offspring_infoSNPs:	output of ReadOffspringVCF() or SnpTable
+	Output:
+	- snp_genotypes[chr] = [positions, genotypes] numpy arrays
+	"""
+	snp_genotypes = OrderedDict()
+
+	if hasattr(Offspring_infoSNPs, "genotypes"):
+		# SnpTable: columns are already sorted by position
+		genotypes = np.array(Offspring_infoSNPs.genotypes)
+		for cur_chr, columns in Offspring_infoSNPs.columns.items():
+			snp_genotypes[cur_chr] = [columns[0], genotypes[columns[4]]]
+		return snp_genotypes
+
+	rows = OrderedDict()
+	for key, snp in Offspring_infoSNPs.items():
+		cur_chr, _, pos = key.rpartition("_")
+		if pos.isdigit():
+			rows.setdefault(cur_chr, [[], []])
+			rows[cur_chr][0].append(int(pos))
+			rows[cur_chr][1].append(snp[5])
+
+	for cur_chr, (positions, genotypes) in rows.items():
+		positions = np.array(positions, dtype=np.int64)
+		order = np.argsort(positions, kind="stable")
+		snp_genotypes[cur_chr] = [positions[order], np.array(genotypes)[order]]
+
+	return snp_genotypes
+
+#==============================================================================
+
+def RefineCOBorder(snp_genotypes, cur_chr, cur_start, cur_stop, pre_geno, cur_geno, window_size):
+	"""
+	Description:	refine the borders of one CO with the informative SNPs of
+					the CO interval widened by half a window on each side.
+					A SNP is of type 1 if it has the genotype specific to
+					the left side of the CO and of type 2 if it has the
+					genotype specific to the right side. The new start is the
+					last SNP of type 1 before the first SNP of type 2 and the
+					new stop is this SNP of type 2 (scan from the right for
+					a heterozygous to homozygous CO).
+	Input:
+	- snp_genotypes:	output of SnpGenotypesByChr()
+	- cur_chr:			chromosome of the CO
+	- cur_start:		start of the CO
+	- cur_stop:			stop of the CO
+	- pre_geno:			genotype on the left side of the CO
+	- cur_geno:			genotype on the right side of the CO
+	- window_size:		size of the sliding windows in kb
+	Output:
+	- [refined_start, refined_stop]
+	"""
+	cur_start = int(cur_start - window_size / 2 * 1000)
+	cur_stop = int(cur_stop + window_size / 2 * 1000)
+
+	if ("/" not in pre_geno) and ("/" in cur_geno):
+		case = 2
+		cur_geno1, cur_geno2 = cur_geno.split("/")
+		pre_geno_3 = pre_geno
+		cur_geno_3 = cur_geno2 if pre_geno == cur_geno1 else cur_geno1
+	elif ("/" in pre_geno) and ("/" not in cur_geno):
+		case = 3
+		pre_geno1, pre_geno2 = pre_geno.split("/")
+		pre_geno_3 = pre_geno2 if pre_geno1 == cur_geno else pre_geno1
+		cur_geno_3 = cur_geno
+	else:
+		case = 4
+		pre_geno_3 = pre_geno
+		cur_geno_3 = cur_geno
+
+	# informative SNPs of the interval [cur_start, cur_stop[
+	if cur_chr in snp_genotypes:
+		positions, genotypes = snp_genotypes[cur_chr]
+		first = np.searchsorted(positions, cur_start, side="left")
+		last = np.searchsorted(positions, cur_stop, side="left")
+		positions = positions[first:last]
+		genotypes = genotypes[first:last]
+	else:
+		positions = np.empty(0, dtype=np.int64)
+		genotypes = np.empty(0, dtype=str)
+	type1 = (genotypes == pre_geno_3) & (positions > cur_start)
+	type2 = genotypes == cur_geno_3
+	type1_index = np.flatnonzero(type1)
+	type2_index = np.flatnonzero(type2)
+
+	refined_info_start = cur_start
+	refined_info_stop = cur_stop
+	if case == 3:
+		# from the right: last SNP of type 1, then the first SNP of type 2
+		# at or after it, or the first SNP of type 2 if there is none
+		if len(type1_index):
+			last_type1 = type1_index[-1]
+			refined_info_start = int(positions[last_type1])
+			if type2[last_type1:].any():
+				type2_index = np.flatnonzero(type2[last_type1:]) + last_type1
+		if len(type2_index):
+			refined_info_stop = int(positions[type2_index[0]])
+	else:
+		# from the left: first SNP of type 2 and the last SNP of type 1 at
+		# or before it, or the last SNP of type 1 if there is none
+		if len(type2_index):
+			refined_info_stop = int(positions[type2_index[0]])
+			first_type2 = type2_index[0]
+			if type1[:first_type2 + 1].any():
+				type1_index = np.flatnonzero(type1[:first_type2 + 1])
+		if len(type1_index):
+			refined_info_start = int(positions[type1_index[-1]])
+
+	if refined_info_stop < refined_info_start:
+		if case == 2:
+			refined_info_start = cur_start - 2000
+			# hues.warn("ERROR-info-2, stop < start!")
+		elif case == 3:
+			refined_info_stop = cur_stop + 2000
+			hues.warn("ERROR-info-3, stop < start!")
 		else:
+			refined_info_start = int(cur_start + window_size / 2 * 1000)
+			refined_info_stop = int(cur_stop - window_size / 2 * 1000)
+			hues.warn("ERROR-info-4, stop < start!")
 
-			pre_geno_3 = pre_geno
-			cur_geno_3 = cur_geno
-			comm_geno = ""
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			refined_totalsnp = OrderedDict()
-			refined_totalsnp_cnt = 1
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-
-					if refined_info_start != cur_start:
-						break
-
-			if refined_info_stop < refined_info_start:
-				refined_info_start = int(cur_start + window_size / 2 * 1000)
-				refined_info_stop = int(cur_stop - window_size / 2 * 1000)
-				hues.warn("ERROR-info-4, stop < start!")
-
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			hues.info("#CandidateCOs-4: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			hues.info("#RefinedInfoCOs-4: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
+	if case == 4:
+		cur_start = int(cur_start + window_size / 2 * 1000)
+		cur_stop = int(cur_stop - window_size / 2 * 1000)
+		hues.info("#CandidateCOs-4: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
+		hues.info("#RefinedInfoCOs-4: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
 
+	return [refined_info_start, refined_info_stop]
+
+#==============================================================================
+
+def ReRefineCOs(RefinedCOs):
+	"""
+	Description:	merge the refined COs that overlap on a chromosome
+	Input:
+	- RefinedCOs[chr_win] = [start, stop, pre_geno, cur_geno]
+	Output:
+	- Re_RefinedCOs[chr_win] = [start, stop, pre_geno, cur_geno]
+	"""
 	hues.info("Re-refined crossovers")
 	Re_RefinedCOs = OrderedDict()
 	pre_co_chr = ""
@@ -716,9 +672,52 @@ def RefineCOBorders(CandidateCOs, Offspring_infoSNPs, window_size):
 		
 	return Re_RefinedCOs
 
+#==============================================================================
+
+def RefineCOBorders(CandidateCOs, Offspring_infoSNPs, window_size, re_refine=True):
+	print()
+	hues.info("Refine crossover borders")
+
+	snp_genotypes = SnpGenotypesByChr(Offspring_infoSNPs)
+	RefinedCOs = OrderedDict()
+
+	for co_key, co_value in CandidateCOs.items():
+
+		cur_chr, cur_pos = co_key.split("_")
+		win, cur_start, cur_stop, pre_geno, cur_geno = co_value
+
+		RefinedCOs[co_key] = RefineCOBorder(snp_genotypes, cur_chr, cur_start, cur_stop, \
+			pre_geno, cur_geno, window_size) + [pre_geno, cur_geno]
+
+	if not re_refine: # COs of the chromosomes run separately, merged by ReRefineCOs() after
+		return RefinedCOs
+
+	return ReRefineCOs(RefinedCOs)
+
+
 
 ###############################################################################
 ###############################################################################
+def GenotypesQichao(Offspring_slidingGenoNums, genoRef, genoAlt):
+	"""
+	Description:	genotype of each normalized window, as computed by 
+					GetGenoWindow() with its default thresholds in 
+					CorrectLargeCOsQichao()
+	Input:
+	- Offspring_slidingGenoNums[chr_window] = [start, stop, ADref, ADalt, DP]
+	Output:
+	- Offspring_slidingGenos[chr_window] = genotype
+	"""
+	values = list(Offspring_slidingGenoNums.values())
+	geno_codes = GetGenoWindowArray([value[2] for value in values], \
+		[value[3] for value in values], [value[4] for value in values])[5]
+	geno_names = GenoNames(genoRef, genoAlt)
+
+	return OrderedDict((key, geno_names[geno_code]) for key, geno_code \
+		in zip(Offspring_slidingGenoNums, geno_codes.tolist()))
+
+#==============================================================================
+
 def IdentifyCOsQichao(Offspring_smoothProbs, Offspring_smoothWinNums, \
 					Offspring_slidingGenoNums, Offspring_slidingGenoRatios, \
 					Centromere, genoRef, genoAlt):
@@ -726,6 +725,7 @@ def IdentifyCOsQichao(Offspring_smoothProbs, Offspring_smoothWinNums, \
 	hues.info("Identify candidate crossovers")
 
 	CandidateCOs = OrderedDict()
+	Offspring_slidingGenos = None # genotypes of the normalized windows, computed at the first correction
 
 	window = 2
 
@@ -847,9 +847,13 @@ def IdentifyCOsQichao(Offspring_smoothProbs, Offspring_smoothWinNums, \
 							if cor_cur_pos > win_num - 1:
 								cor_cur_pos = win_num - 1
 							
+							if Offspring_slidingGenos is None:
+								Offspring_slidingGenos = GenotypesQichao(Offspring_slidingGenoNums, genoRef, genoAlt)
+
 							rawCO = [cur_chr, cor_pre_pos, cor_cur_pos, pre_geno, cur_geno]
 							correctCO = CorrectLargeCOsQichao(Offspring_slidingGenoNums,\
-										Offspring_slidingGenoRatios, rawCO, Centromere, genoRef, genoAlt)
+										Offspring_slidingGenoRatios, rawCO, Centromere, genoRef, genoAlt,\
+										Offspring_slidingGenos=Offspring_slidingGenos)
 
 							if len(correctCO.keys()) != 0:
 								for key, value in correctCO.items():
@@ -876,13 +880,20 @@ def IdentifyCOsQichao(Offspring_smoothProbs, Offspring_smoothWinNums, \
 
 ###############################################################################
 
-def CorrectLargeCOsQichao(Offspring_slidingGenoNums, Offspring_slidingGenoRatios, rawCO, Centromere, genoRef,genoAlt, min_homo_freq=0.9):
+def CorrectLargeCOsQichao(Offspring_slidingGenoNums, Offspring_slidingGenoRatios, rawCO, Centromere, genoRef,genoAlt, min_homo_freq=0.9,\
+		Offspring_slidingGenos=None):
 	hues.info("Correct large crossovers (centromere regions)")
 
 	CandidateCOs = OrderedDict()
 	CorrectedCO = OrderedDict()
 	cur_chr, rawCO_start, rawCO_stop, rawCO_geno1, rawCO_geno2 = rawCO
 
+	if Offspring_slidingGenos is None:
+		# only the windows of the crossover (and the next one) are read
+		keys = [cur_chr + "_" + str(x) for x in range(rawCO_start, rawCO_stop + 2)]
+		Offspring_slidingGenos = GenotypesQichao(OrderedDict((key, \
+			Offspring_slidingGenoNums[key]) for key in keys), genoRef, genoAlt)
+
 	cur_chr_centro_left = int(Centromere[cur_chr][0]) - 150 * 1000
 	cur_chr_centro_right = int(Centromere[cur_chr][1]) + 150 * 1000
 
@@ -906,10 +917,10 @@ def CorrectLargeCOsQichao(Offspring_slidingGenoNums, Offspring_slidingGenoRatios
 		stop = start + window # x+2
 
 		key1 = cur_chr + "_" + str(start) # window = x
-		geno1 =	GetGenoWindow(Offspring_slidingGenoNums[key1], genoRef=genoRef, genoAlt=genoAlt)[7]
+		geno1 =	Offspring_slidingGenos[key1]
 
 		key2 = cur_chr + "_" + str(stop - 1) # window = x +1
-		geno2 = GetGenoWindow(Offspring_slidingGenoNums[key2], genoRef=genoRef, genoAlt=genoAlt)[7]
+		geno2 = Offspring_slidingGenos[key2]
 		
 		if geno1 == geno2:
 
@@ -1023,247 +1034,24 @@ def CorrectLargeCOsQichao(Offspring_slidingGenoNums, Offspring_slidingGenoRatios
 
 ###############################################################################
 
-def RefineCOBordersQichao(CandidateCOs, Offspring_infoSNPs, window_size):
+def RefineCOBordersQichao(CandidateCOs, Offspring_infoSNPs, window_size, re_refine=True):
 	print()
 	hues.info("Refine crossover borders")
 
-	RefinedCOs = OrderedDict() 
+	snp_genotypes = SnpGenotypesByChr(Offspring_infoSNPs)
+	RefinedCOs = OrderedDict()
 
 	for co_key, co_value in CandidateCOs.items():
 
 		cur_chr, cur_pos = co_key.split("_")
 		cur_start, cur_stop, pre_geno, cur_geno = co_value
 
-		cur_start = int(cur_start - window_size / 2 * 1000)
-		cur_stop = int(cur_stop + window_size / 2 * 1000)
-
-		if ("/" not in pre_geno) and ("/" in cur_geno):
-
-			cur_geno1, cur_geno2 = cur_geno.split("/")
-			pre_geno_3 = pre_geno
-			cur_geno_3 = ""
-			comm_geno = ""
-
-			if pre_geno == cur_geno1:
-				cur_geno_3 = cur_geno2
-			else:
-				cur_geno_3 = cur_geno1
-			comm_geno = pre_geno
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-					if refined_info_start != cur_start:
-						break
-
-			if refined_info_stop < refined_info_start:
-				refined_info_start = cur_start - 2000
-				# hues.warn("ERROR-info-2, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-2: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-2: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
-
-		elif ("/" in pre_geno) and ("/" not in cur_geno):
-
-			pre_geno1, pre_geno2 = pre_geno.split("/")
-			pre_geno_3 = ""
-			cur_geno_3 = cur_geno
-			comm_geno = ""
-
-			if pre_geno1 == cur_geno:
-				pre_geno_3 = pre_geno2
-			else:
-				pre_geno_3 = pre_geno1
-			comm_geno = pre_geno1
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(refined_infosnp_cnt - 1, 0, -1):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-
-					if refined_info_stop != cur_stop:
-						break
-
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-
-			if refined_info_stop < refined_info_start:
-				refined_info_stop = cur_stop + 2000
-				hues.warn("ERROR-info-3, stop < start!")
-				
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			# hues.info("#CandidateCOs-3: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			# hues.info("#RefinedInfoCOs-3: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
-
-		else:
+		RefinedCOs[co_key] = RefineCOBorder(snp_genotypes, cur_chr, cur_start, cur_stop, \
+			pre_geno, cur_geno, window_size) + [pre_geno, cur_geno]
 
-			pre_geno_3 = pre_geno
-			cur_geno_3 = cur_geno
-			comm_geno = ""
-
-			refined_infosnp = OrderedDict()
-			refined_infosnp_cnt = 1
-			refined_infosnp_pos = OrderedDict()
-			refined_totalsnp = OrderedDict()
-			refined_totalsnp_cnt = 1
-			for i in range(cur_start, cur_stop):
-				key = cur_chr + "_" + str(i)
-
-				if key in Offspring_infoSNPs.keys():
-					snp_geno = Offspring_infoSNPs[key][5]
-
-					if pre_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 1]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 1
-					if cur_geno_3 == snp_geno:
-						refined_infosnp[refined_infosnp_cnt] = [i, 2]
-						refined_infosnp_cnt += 1
-						refined_infosnp_pos[i] = 2
-
-			refined_info_start = cur_start
-			refined_info_stop = cur_stop
-			for i in range(1, refined_infosnp_cnt):
-				
-				snp_pos, snp_type = refined_infosnp[i]
-				if snp_type == 1 and snp_pos > refined_info_start:
-					refined_info_start = snp_pos
-
-				if snp_type == 2 and snp_pos < refined_info_stop:
-					refined_info_stop = snp_pos
-
-					if refined_info_start != cur_start:
-						break
-
-			if refined_info_stop < refined_info_start:
-				refined_info_start = int(cur_start + window_size / 2 * 1000)
-				refined_info_stop = int(cur_stop - window_size / 2 * 1000)
-				hues.warn("ERROR-info-4, stop < start!")
-
-			cur_start = int(cur_start + window_size / 2 * 1000)
-			cur_stop = int(cur_stop - window_size / 2 * 1000)
-			hues.info("#CandidateCOs-4: " + str(cur_start) + ", " + str(cur_stop) + ", " + pre_geno + ", " + cur_geno)
-			hues.info("#RefinedInfoCOs-4: " + str(refined_info_start) + ", " + str(refined_info_stop) + ", " + pre_geno + ", " + cur_geno)
-			RefinedCOs[co_key] = [refined_info_start, refined_info_stop, pre_geno, cur_geno]			
+	if not re_refine: # COs of the chromosomes run separately, merged by ReRefineCOs() after
+		return RefinedCOs
 
-	hues.info("Re-refined crossovers")
-	Re_RefinedCOs = OrderedDict()
-	pre_co_chr = ""
-	pre_co_pos = ""
-	pre_co_start = ""
-	pre_co_stop = ""
-	pre_co_geno1 = ""
-	pre_co_geno2 = ""
-	cur_item = 0
-	for co_key, co_value in RefinedCOs.items():
-
-		co_chr, co_pos = co_key.split("_")
-		co_start, co_stop, co_geno1, co_geno2 = co_value
-
-		if co_chr != pre_co_chr:
-			if pre_co_chr == "":
-				pass
-			else:
-				Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-
-			pre_co_chr = co_chr
-			pre_co_pos = float(co_pos)
-			pre_co_start = int(co_start)
-			pre_co_stop = int(co_stop)
-			pre_co_geno1 = co_geno1
-			pre_co_geno2 = co_geno2
-		else:
-			if co_start <= pre_co_stop:
-				if (pre_co_geno2 == co_geno1):
-					if pre_co_geno1 == co_geno2:
-						pre_co_chr = ""
-						pre_co_pos = ""
-						pre_co_start = ""
-						pre_co_stop = ""
-						pre_co_geno1 = ""
-						pre_co_geno2 = ""
-					else:
-						pre_co_chr = co_chr
-						pre_co_pos = round((pre_co_pos + float(co_pos)) / 2, 1)
-						pre_co_start = int(pre_co_start)
-						pre_co_stop = int(co_stop)
-						pre_co_geno1 = pre_co_geno1
-						pre_co_geno2 = co_geno2
-						Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-				else:
-					hues.error("#3#" + "\t" + "Diff GENO!")
-			else:
-				if (co_start % 1000 == 0) and (pre_co_geno1 in co_geno1) and (pre_co_geno2 in co_geno1) and (pre_co_geno2 == co_geno2):
-					pre_co_chr = co_chr
-					pre_co_pos = round((pre_co_pos + float(co_pos)) / 2, 1)
-					pre_co_start = int(pre_co_start)
-					pre_co_stop = int(pre_co_stop)
-					pre_co_geno1 = pre_co_geno1
-					pre_co_geno2 = co_geno2
-					Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-				else:
-					Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-					pre_co_chr = co_chr
-					pre_co_pos = round(float(co_pos), 1)
-					pre_co_start = int(co_start)
-					pre_co_stop = int(co_stop)
-					pre_co_geno1 = co_geno1
-					pre_co_geno2 = co_geno2
-
-		cur_item += 1
-		if cur_item == len(RefinedCOs.keys()):
-			Re_RefinedCOs[pre_co_chr + "_" + str(pre_co_pos)] = [pre_co_start, pre_co_stop, pre_co_geno1, pre_co_geno2]
-		
-	return Re_RefinedCOs
+	return ReRefineCOs(RefinedCOs)
  
  
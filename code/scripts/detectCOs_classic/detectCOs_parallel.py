@@ -0,0 +1,288 @@
+import os, sys
+import multiprocessing
+import yaml
+from concurrent.futures import ProcessPoolExecutor
+
+from detectCOs_batch import *
+
+# Usage: python3 path/to/folder/detectCOs_parallel.py config_detectCOs.yaml
+#
+# Run detectCOs on the offspring of the config file with one process per
+# chromosome. The vcf files are read once, then the sliding windows, the
+# normalization, the smoothing, the identification and the refinement of the
+# COs run for each chromosome in a process pool. The COs are merged back in
+# the order of the chromosomes of the parental vcf and saved in
+# output_dir_in_polyrec/analyze_id/ (same files as detectCOs_batch.py).
+# The number of workers is set with the optional key chr_workers (default:
+# number of CPUs). With the optional key stream_vcf, the vcf files are read
+# one chromosome at a time and the chromosomes run one after the other in the
+# main process (see StreamByChromosome()).
+
+
+###############################################################################
+
+def SplitByChromosome(snps:OrderedDict):
+    """
+    Description:    split the SNPs by chromosome
+    Input:
+    - snps[chr_pos] = [chr, pos, ...], output of ReadParentalVCF() or
+                      ReadOffspringVCF()
+    Output:
+    - snps_chr[chr] = OrderedDict of the SNPs of the chromosome
+    """
+    snps_chr = OrderedDict()
+    for key, value in snps.items():
+        if value[0] not in snps_chr:
+            snps_chr[value[0]] = OrderedDict()
+        snps_chr[value[0]][key] = value
+
+    return snps_chr
+
+#==============================================================================
+
+# SNPs of each chromosome, set in each worker by InitChromosomeWorker(). With
+# the fork start method, the workers use the memory of the main process
+# without copying the data.
+CHROMOSOME_DATA = dict()
+
+def InitChromosomeWorker(chromosome_data:dict):
+    """
+    Description:    set the data of a worker of the process pool
+    Input:          chromosome_data[name] = value, see RunByChromosome()
+    """
+    global CHROMOSOME_DATA
+    CHROMOSOME_DATA = chromosome_data
+
+#==============================================================================
+
+def ProcessChromosome(config:dict, cur_chr:str):
+    """
+    Description:    run OffspringCOs() on one chromosome, with the data of the
+                    worker
+    Input:
+    - config:       config file of the launcher
+    - cur_chr:      chromosome name (e.g. "Chr1")
+    Output:
+    - cur_chr, output of OffspringCOs() without the merge of the refined COs
+    """
+    chr_length = OrderedDict([(cur_chr, CHROMOSOME_DATA['chr_length'][cur_chr])])
+    centromere = OrderedDict([(cur_chr, CHROMOSOME_DATA['centromere'][cur_chr])])
+    last_snps_chr = OrderedDict([(cur_chr, CHROMOSOME_DATA['last_snps_chr'][cur_chr])])
+
+    parental_snps_windows = ParentalSlidingWindowPyramid(
+        chr_len=chr_length,
+        parental_snps=CHROMOSOME_DATA['parental_snps'].get(cur_chr, OrderedDict()),
+        last_snps_chr=last_snps_chr,
+        window_sizes=[config['window_size'], config['new_window_size']]
+        )
+    parental_data = {'chr_length': chr_length,
+                     'centromere': centromere,
+                     'last_snps_chr': last_snps_chr,
+                     'parental_snps_window': parental_snps_windows[config['window_size']],
+                     'parental_snps_window_new': parental_snps_windows[config['new_window_size']]}
+
+    results = OffspringCOs(config,
+        CHROMOSOME_DATA['offspring_snps'].get(cur_chr, OrderedDict()),
+        parental_data, re_refine=False)
+
+    return cur_chr, results
+
+#==============================================================================
+
+def MergeChromosomes(chr_results:OrderedDict):
+    """
+    Description:    merge the results of the chromosomes, the overlapping
+                    refined COs are merged as in RefineCOBorders()
+    Input:
+    - chr_results[chr] = second output of ProcessChromosome()
+    Output:
+    - results[name] = OrderedDict, same as OffspringCOs()
+    """
+    results = dict()
+    for cur_results in chr_results.values():
+        for name, cur_dict in cur_results.items():
+            if name not in results:
+                results[name] = OrderedDict()
+            results[name].update(cur_dict)
+
+    results['refinedCOs'] = ReRefineCOs(results['refinedCOs'])
+    results['refinedCOs_qichao'] = ReRefineCOs(results['refinedCOs_qichao'])
+
+    return results
+
+#==============================================================================
+
+def RunByChromosome(config:dict, workers:int):
+    """
+    Description:    read the vcf files of the config file and run
+                    ProcessChromosome() for each chromosome in a process pool
+    Input:
+    - config:       config file of the launcher
+    - workers:      number of processes
+    Output:
+    - results[name] = OrderedDict, see MergeChromosomes()
+    """
+    chr_length = ReadChrLen(input_chr_len=config['chr_len'],
+                            prefix_chr=config['prefix_chr'])
+    centromere = ReadCentroReg(input_centro_reg=config['centromere_reg'],
+                               prefix_chr=config['prefix_chr'])
+    parental_snps, parental_last_snp_chr = ReadParentalVCF(
+        input_vcf=config['parental_vcf'],
+        prefix_chr=config['prefix_chr']
+        )
+    offspring_snps, offspring_last_snp_chr = ReadOffspringVCF(
+        input_vcf=config['sample_vcf'],
+        parental_snps=parental_snps,
+        prefix_chr=config['prefix_chr'],
+        geno_ref=config['genotype_ref'],
+        geno_alt=config['genotype_alt'],
+        analyze_id=config['analyze_id'],
+        snps_log=config.get('snps_log', True),
+        compress_log=config.get('compress_snps_log', False)
+        )
+
+    chromosome_data = {'chr_length': chr_length,
+                       'centromere': centromere,
+                       'last_snps_chr': parental_last_snp_chr,
+                       'parental_snps': SplitByChromosome(parental_snps),
+                       'offspring_snps': SplitByChromosome(offspring_snps)}
+    del parental_snps, offspring_snps
+
+    # fork shares the data with the workers without copy, other start methods
+    # (Windows, macOS) send it once to each worker
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = multiprocessing.get_context()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                             initializer=InitChromosomeWorker, initargs=(chromosome_data,)) as executor:
+        futures = [executor.submit(ProcessChromosome, config, cur_chr)
+                   for cur_chr in parental_last_snp_chr.keys()]
+        chr_results = OrderedDict(future.result() for future in futures)
+
+    return MergeChromosomes(chr_results)
+
+#==============================================================================
+
+def StreamChromosome(config:dict, chr_length:OrderedDict, centromere:OrderedDict,
+                     parental_batch:list, offspring_batch:list):
+    """
+    Description:    run OffspringCOs() on one chromosome read by
+                    StreamParentalVCF() and StreamOffspringVCF()
+    Input:
+    - config:           config file of the launcher
+    - chr_length:       output of ReadChrLen()
+    - centromere:       output of ReadCentroReg()
+    - parental_batch:   batch of the chromosome of StreamParentalVCF()
+    - offspring_batch:  batch of the chromosome of StreamOffspringVCF(), None
+                        if the offspring has no SNP on the chromosome
+    Output:
+    - output of OffspringCOs() without the merge of the refined COs
+    """
+    cur_chr, positions, last_snp_pos = parental_batch
+    chr_length = OrderedDict([(cur_chr, chr_length[cur_chr])])
+    parental_data = {'chr_length': chr_length,
+                     'centromere': OrderedDict([(cur_chr, centromere[cur_chr])]),
+                     'last_snps_chr': OrderedDict([(cur_chr, last_snp_pos)])}
+    for name, window_size in [('parental_snps_window', config['window_size']),
+                              ('parental_snps_window_new', config['new_window_size'])]:
+        parental_data[name] = ParentalSlidingWindowStream(
+            chr_len=chr_length,
+            parental_batches=[parental_batch],
+            window_size=window_size
+            )[0]
+
+    offspring_batches = [] if offspring_batch is None else [offspring_batch]
+    offspring_snps = SnpTable.from_batches(offspring_batches,
+        config['genotype_ref'], config['genotype_alt'])
+
+    return OffspringCOs(config, offspring_snps, parental_data, re_refine=False)
+
+#==============================================================================
+
+def StreamByChromosome(config:dict):
+    """
+    Description:    read the vcf files of the config file one chromosome at a
+                    time and run StreamChromosome() on each chromosome before
+                    the next one is read, so only the SNPs of one chromosome
+                    are in a SnpTable. The positions of the parental SNPs are
+                    kept for all the chromosomes (input of StreamOffspringVCF()).
+                    The vcf files must be grouped by chromosome.
+    Input:
+    - config:       config file of the launcher
+    Output:
+    - results[name] = OrderedDict, see MergeChromosomes()
+    """
+    chr_length = ReadChrLen(input_chr_len=config['chr_len'],
+                            prefix_chr=config['prefix_chr'])
+    centromere = ReadCentroReg(input_centro_reg=config['centromere_reg'],
+                               prefix_chr=config['prefix_chr'])
+
+    parental_batches = OrderedDict()
+    for parental_batch in StreamParentalVCF(input_vcf=config['parental_vcf'],
+                                            prefix_chr=config['prefix_chr']):
+        parental_batches[parental_batch[0]] = parental_batch
+    parental_positions = OrderedDict((cur_chr, parental_batch[1])
+                                     for cur_chr, parental_batch in parental_batches.items())
+
+    chr_results = dict()
+    offspring_batches = StreamOffspringVCF(
+        input_vcf=config['sample_vcf'],
+        parental_positions=parental_positions,
+        prefix_chr=config['prefix_chr'],
+        analyze_id=config['analyze_id'],
+        snps_log=config.get('snps_log', True),
+        compress_log=config.get('compress_snps_log', False)
+        )
+    for offspring_batch in offspring_batches:
+        cur_chr = offspring_batch[0]
+        # the offspring SNPs of a chromosome without parental SNP are not
+        # informative (as in ReadOffspringVCF())
+        if cur_chr in parental_batches:
+            chr_results[cur_chr] = StreamChromosome(config, chr_length, centromere,
+                parental_batches[cur_chr], offspring_batch)
+
+    # chromosomes without offspring SNP, then merge in the order of the
+    # chromosomes of the parental vcf
+    for cur_chr, parental_batch in parental_batches.items():
+        if cur_chr not in chr_results:
+            chr_results[cur_chr] = StreamChromosome(config, chr_length, centromere,
+                parental_batch, None)
+
+    return MergeChromosomes(OrderedDict((cur_chr, chr_results[cur_chr])
+                                        for cur_chr in parental_batches.keys()))
+
+
+###############################################################################
+
+if __name__ == "__main__":
+
+    print("# Load config file")
+    print("-------------------------------------")
+
+    if len(sys.argv) < 2:
+        raise ImportError("Please give the config file (.yaml) for detectCOs")
+
+    config_file = sys.argv[1]
+    with open(config_file, "r") as cf:
+        config = yaml.load(cf, Loader=yaml.FullLoader)
+
+    # Set current working directory at the root of polyrec project
+    os.chdir(config['path_to_polyrec_project'])
+
+    outdir = config['path_to_polyrec_project'] + config['output_dir_in_polyrec'] + \
+        config['analyze_id'] + "/"
+    os.makedirs(outdir, exist_ok=True)
+
+    if config.get('stream_vcf', False):
+        print("Run " + config['analyze_id'] + " one chromosome at a time")
+        results = StreamByChromosome(config)
+    else:
+        workers = config.get('chr_workers', os.cpu_count())
+        print("Run " + config['analyze_id'] + " with " + str(workers) + " workers")
+        results = RunByChromosome(config, workers)
+
+    ExportOffspringCOs(config, outdir, results)
+
+    print("\n# " + str(len(results['candidates_co'])) + " candidate COs")
@@ -11,9 +11,203 @@
 # Version		:	2.0
 #==============================================================================
 
-import hues
+import hues, os, sys
+import math
+import numpy as np
 from collections import OrderedDict
 from detectCOs_required_functions import *
+from detectCOs_snp_table import SnpTable
+# detectCOs_genotype_track.py is shared by detectCOs_classic and detectCOs_EMS
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detectCOs_genotype_track import GenotypeTrack
+
+#==============================================================================
+
+def SlidingWindowBorders(chr_length:int, window_size:int=100):
+	"""
+	Description:	determine the start and stop position of each sliding window
+					of a chromosome, the sliding size is half of window size.
+	Input:
+	- chr_length:	length of the chromosome
+	- window_size:	size of the window in kb
+	Output:
+	- starts, stops: numpy arrays of positions (bp), starts[num_win - 1] is the
+					first position of window num_win. The last window is 
+					truncated to the length of the chromosome.
+	"""
+	window = window_size * 1000
+	sliding = int(window / 2)
+	nb_win = int(chr_length / sliding) # Note: round to inf integer
+
+	offsets = sliding * np.arange(nb_win, dtype=np.int64)
+	starts = 1 + offsets
+	stops = np.minimum(window + offsets, chr_length)
+
+	return starts, stops
+
+#==============================================================================
+
+def SnpsPositionsByChr(snps:OrderedDict):
+	"""
+	Description:	gather the positions of the SNPs of each chromosome in a 
+					sorted array, to count SNPs of a region without scanning 
+					each base pair.
+	Input:
+	- snps:			snps[chr_pos] = [chr, pos, ...], e.g. first element of the 
+					output of ReadParentalVCF(), or SnpTable
+	Output:
+	- positions[chr] = sorted numpy array of SNPs positions
+	"""
+	if isinstance(snps, SnpTable):
+		return OrderedDict((cur_chr, columns[0]) for cur_chr, columns in \
+			snps.columns_by_chr().items())
+
+	positions = OrderedDict()
+	for snp in snps.values():
+		positions.setdefault(snp[0], []).append(int(snp[1]))
+
+	for cur_chr, pos in positions.items():
+		positions[cur_chr] = np.sort(np.array(pos, dtype=np.int64))
+
+	return positions
+
+#==============================================================================
+
+def OffspringSnpsColumnsByChr(offspring_snps:OrderedDict):
+	"""
+	Description:	store the offspring SNPs of each chromosome in numpy arrays
+					sorted by position, the genotype GT is encoded with 
+					GT_CODES (GT_OTHER if not 0/0, 0/1 or 1/1).
+	Input:
+	- offspring_snps:	first element of the output of ReadOffspringVCF()
+						[chr_pos] = [chr, pos, GT, ADref, ADalt, genotype]
+						or SnpTable
+	Output:
+	- columns[chr] = [positions, ADref, ADalt, GT_code]
+	Note: ADref and ADalt are only read for SNPs with a GT code, the others 
+	are not counted in sliding windows.
+	"""
+	if isinstance(offspring_snps, SnpTable):
+		return offspring_snps.columns_by_chr()
+
+	rows = OrderedDict()
+	for snp in offspring_snps.values():
+		gt_code = GT_CODES.get(snp[2], GT_OTHER)
+		if gt_code == GT_OTHER:
+			rows.setdefault(snp[0], []).append((int(snp[1]), 0, 0, gt_code))
+		else:
+			rows.setdefault(snp[0], []).append((int(snp[1]), int(snp[3]), int(snp[4]), gt_code))
+
+	columns = OrderedDict()
+	for cur_chr, chr_rows in rows.items():
+		chr_rows = np.array(chr_rows, dtype=np.int64).reshape(-1, 4)
+		chr_rows = chr_rows[np.argsort(chr_rows[:, 0], kind="stable")]
+		columns[cur_chr] = [chr_rows[:, 0], chr_rows[:, 1], chr_rows[:, 2], chr_rows[:, 3]]
+
+	return columns
+
+#==============================================================================
+
+def OffspringSnpsValues(ad_ref, ad_alt, gt_codes):
+	"""
+	Description:	determine the contribution of each offspring SNP to the 
+					parameters of its windows.
+	Input:
+	- ad_ref, ad_alt, gt_codes:	arrays of one chromosome (see 
+					OffspringSnpsColumnsByChr())
+	Output:
+	- values:	numpy array, one line per SNP = [ADref, ADalt, DP, nbSNP_Aref, 
+				nbSNP_Aalt, TOTsnps-window]
+	"""
+	with_ref = (gt_codes == GT_HOMO_REF) | (gt_codes == GT_HETERO)
+	with_alt = (gt_codes == GT_HETERO) | (gt_codes == GT_HOMO_ALT)
+
+	values = np.zeros((len(gt_codes), 6), dtype=np.int64)
+	values[:, 0] = np.where(with_ref, ad_ref, 0) # ADref
+	values[:, 1] = np.where(with_alt, ad_alt, 0) # ADalt
+	values[:, 2] = values[:, 0] + values[:, 1] # DP
+	values[:, 3] = with_ref # nbSNPref
+	values[:, 4] = with_alt # nbSNPalt
+	values[:, 5] = with_ref | with_alt # TOTsnps-window
+
+	return values
+
+#==============================================================================
+
+def SnpsCumulativeSums(values):
+	"""
+	Description:	cumulative sums of the SNPs values, preceded by a line of 0
+					so that cumsum[j] - cumsum[i] is the sum of SNPs i to j-1.
+	Input:
+	- values:	numpy array, one line per SNP sorted by position
+	Output:
+	- cumsum:	numpy array with one more line than values
+	"""
+	cumsum = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+	np.cumsum(values, axis=0, out=cumsum[1:])
+
+	return cumsum
+
+#==============================================================================
+
+def SumOffspringSnpsWindows(positions, ad_ref, ad_alt, gt_codes, starts, stops):
+	"""
+	Description:	sum the parameters of the offspring SNPs of each window of 
+					a chromosome with prefix sums: each window costs two 
+					searchsorted and a difference of cumulative sums.
+	Input:
+	- positions, ad_ref, ad_alt, gt_codes:	arrays of one chromosome, sorted 
+					by position (see OffspringSnpsColumnsByChr())
+	- starts, stops:	borders of the windows (see SlidingWindowBorders())
+	Output:
+	- sums:	numpy array, one line per window = [ADref, ADalt, DP, nbSNP_Aref, 
+			nbSNP_Aalt, TOTsnps-window]
+	"""
+	cumsum = SnpsCumulativeSums(OffspringSnpsValues(ad_ref, ad_alt, gt_codes))
+
+	first = np.searchsorted(positions, starts, side="left")
+	last = np.searchsorted(positions, stops, side="right")
+
+	return cumsum[last] - cumsum[first]
+
+#==============================================================================
+
+def SumSnpsWindowsPyramid(chr_length:int, positions, values, window_sizes:list):
+	"""
+	Description:	sum the values of the SNPs of a chromosome in the sliding 
+					windows of several sizes at once. The chromosome is cut in 
+					bins of the greatest common divisor of the sliding sizes, 
+					every window of every size is a whole number of bins, so 
+					the SNPs are read once and each window is a difference of 
+					the cumulative sums of the bins.
+	Input:
+	- chr_length:	length of the chromosome
+	- positions:	sorted numpy array of the SNPs positions
+	- values:		numpy array, one line per SNP (e.g. OffspringSnpsValues())
+	- window_sizes:	list of window sizes in kb
+	Output:
+	- pyramid[window_size] = [starts, stops, sums], sums has one line per 
+							window (see SlidingWindowBorders())
+	"""
+	bin_size = 0
+	for window_size in window_sizes:
+		bin_size = math.gcd(bin_size, int(window_size * 1000 / 2))
+	nb_bins = -(-chr_length // bin_size) # Note: round to sup integer
+
+	# cumulative sums at the border of each bin, the SNPs after the end of 
+	# the chromosome are not counted as in a truncated window
+	bin_borders = np.minimum(bin_size * np.arange(nb_bins + 1, dtype=np.int64), chr_length)
+	bins_cumsum = SnpsCumulativeSums(values)[np.searchsorted(positions, bin_borders, side="right")]
+
+	pyramid = OrderedDict()
+	for window_size in window_sizes:
+		starts, stops = SlidingWindowBorders(chr_length, window_size)
+		sliding = int(window_size * 1000 / 2)
+		first_bin = (starts - 1) // bin_size
+		last_bin = np.minimum(first_bin + 2 * sliding // bin_size, nb_bins)
+		pyramid[window_size] = [starts, stops, bins_cumsum[last_bin] - bins_cumsum[first_bin]]
+
+	return pyramid
 
 #==============================================================================
 
@@ -45,11 +239,14 @@ def ParentalSlidingWindow(chr_len:OrderedDict, parental_snps:OrderedDict, \
 		" kb / sliding size = " + str(window_size/2) + " kb")
 
 	snps_window = OrderedDict()
+	snps_positions = SnpsPositionsByChr(parental_snps)
+	no_snp = np.empty(0, dtype=np.int64)
 
 	for cur_chr , last_snp_pos in last_snps_chr.items():
 		chr_length = int(chr_len[cur_chr])
 		last_snp_pos = int(last_snp_pos)
-		nb_win = int(chr_length / sliding) # Note: round to inf integer
+		starts, stops = SlidingWindowBorders(chr_length, window_size)
+		nb_win = len(starts)
 
 		hues.log(
 			cur_chr + "\n- length:\t\t\t" + str(chr_length) + \
@@ -57,20 +254,14 @@ def ParentalSlidingWindow(chr_len:OrderedDict, parental_snps:OrderedDict, \
 			"\n- number of window:\t\t" + str(nb_win) 
 		)
 
-		for num_win in range(1, nb_win + 1):
-			start = 1 + sliding * (num_win - 1)
-			stop = window + sliding * (num_win - 1)
-			if stop > chr_length:
-				stop = chr_length
+		# number of SNPs in [start, stop] = SNPs <= stop - SNPs < start
+		positions = snps_positions.get(cur_chr, no_snp)
+		nb_snps = np.searchsorted(positions, stops, side="right") - \
+			np.searchsorted(positions, starts, side="left")
 
-			cur_window = [start,stop,0] ## [start, stop, total_snps]
-
-			for pos in range(start, stop + 1):
-				key = cur_chr  + "_" + str(pos)
-				if key in parental_snps.keys():
-					cur_window[2] += 1
-
-			snps_window[cur_chr  + "_" + str(num_win)] = cur_window
+		for num_win, (start, stop, total_snps) in enumerate(zip(starts.tolist(), \
+				stops.tolist(), nb_snps.tolist()), start=1):
+			snps_window[cur_chr  + "_" + str(num_win)] = [start, stop, total_snps] ## [start, stop, total_snps]
 
 	return snps_window
 
@@ -87,6 +278,7 @@ def OffspringSlidingWindow(chr_len:OrderedDict, offspring_snps:OrderedDict,\
 	Input: 
 	- chr_len:			length of each chromosome
 	- offspring_snps:	first element of the output of ReadOffspringVCF()
+						or SnpTable
 	- last_snps_chr:	position of the last SNPs per chromosome
 	- window_size:		size of the window in kb (default = 100kb),
 						the sliding size is half of window size
@@ -111,63 +303,253 @@ def OffspringSlidingWindow(chr_len:OrderedDict, offspring_snps:OrderedDict,\
 		" kb / sliding size = " + str(window_size/2) + " kb")
 	
 	snps_window = OrderedDict()
+	snps_columns = OffspringSnpsColumnsByChr(offspring_snps)
+	no_snp = [np.empty(0, dtype=np.int64)] * 4
 	
 	for cur_chr, last_snp_pos in last_snps_chr.items():
 		chr_length = int(chr_len[cur_chr])
 		last_snp_pos = int(last_snp_pos)
-		nb_win = int(chr_length / sliding) # Note: round to inf integer
+		starts, stops = SlidingWindowBorders(chr_length, window_size)
+		nb_win = len(starts)
 		
 		hues.log(cur_chr + "\n- length:\t\t\t" + str(chr_length) + \
 	   			"\n- position of the last SNPs:\t" + str(last_snp_pos) + \
 				"\n- number of window:\t\t" + str(nb_win))
 		
-		for num_win in range(1, nb_win + 1):
-			start = 1 + sliding * (num_win - 1)
-			stop = window + sliding * (num_win - 1)
-			
-			if stop > chr_length:
-				stop = chr_length
-
-			cur_window = [start,stop,0,0,0,0,0,0] 
+		sums = SumOffspringSnpsWindows(*snps_columns.get(cur_chr, no_snp), starts, stops)
+
+		for num_win, (start, stop, window_sums) in enumerate(zip(starts.tolist(), \
+				stops.tolist(), sums.tolist()), start=1):
 			## cur_window = [start,stop,ADref,ADalt,DP,nbSNPref,nbSNPalt,TOTsnps-window] 
+			snps_window[cur_chr  + "_" + str(num_win)] = [start, stop] + window_sums
+
+	return snps_window
+
+#==============================================================================
+
+def ParentalSlidingWindowStream(chr_len:OrderedDict, parental_batches, \
+	window_size:int=100):
+	"""
+	Description:	same as ParentalSlidingWindow() but the SNPs are read one 
+					chromosome at a time, so only one chromosome is in memory.
+	Input: 
+	- chr_len:			length of each chromosome
+	- parental_batches:	output of StreamParentalVCF() (generator or list)
+	- window_size:		size of the window in kb (default = 100kb),
+						the sliding size is half of window size
+	Output: 
+	- snps_window[chr_num-window] = [start, stop, nb-snps] 
+	- last_snps_chr[chr] = position-last-snp-per-chr
+	"""
+	hues.info("Parental SNPs sliding window (stream)")
+
+	# Check the window size 
+	if window_size > 1000 :
+		raise ValueError("The maximum of window size is 1Mb (1000 kb) !")
+	elif window_size % 2 != 0:
+		raise ValueError("Please enter an even number to avoid half step when calculting sliding size !")
+
+	snps_window = OrderedDict()
+	last_snps_chr = OrderedDict()
 
-			for pos in range(start, stop + 1):
-				key = cur_chr  + "_" + str(pos)
+	for cur_chr, positions, last_snp_pos in parental_batches:
+		last_snps_chr[cur_chr] = last_snp_pos
+		starts, stops = SlidingWindowBorders(int(chr_len[cur_chr]), window_size)
+		nb_snps = np.searchsorted(positions, stops, side="right") - \
+			np.searchsorted(positions, starts, side="left")
+
+		for num_win, (start, stop, total_snps) in enumerate(zip(starts.tolist(), \
+				stops.tolist(), nb_snps.tolist()), start=1):
+			snps_window[cur_chr  + "_" + str(num_win)] = [start, stop, total_snps]
+
+	return snps_window, last_snps_chr
+
+#==============================================================================
+
+def OffspringSlidingWindowStream(chr_len:OrderedDict, offspring_batches, \
+	last_snps_chr:OrderedDict, window_size:int=100):
+	"""
+	Description:	same as OffspringSlidingWindow() but the SNPs are read one 
+					chromosome at a time. The windows are made for each 
+					chromosome of last_snps_chr, a chromosome without SNP in 
+					the offspring gets windows with 0 values. When the 
+					chromosomes are in the same order in the parental and the 
+					offspring vcf, only one chromosome is in memory.
+	Input: 
+	- chr_len:				length of each chromosome
+	- offspring_batches:	output of StreamOffspringVCF() (generator or list)
+	- last_snps_chr:		position of the last SNPs per chromosome (parental)
+	- window_size:			size of the window in kb (default = 100kb),
+							the sliding size is half of window size
+	Output:
+	- snps_window[chr_num-window] = [start, stop, ADref, ADalt, DP, 
+									nbSNP_Aref, nbSNP_Aalt, TOTsnps-window] 
+	- offspring_last_snps_chr[chr] = position-last-snp-per-chr of the offspring
+	"""
+	hues.info("Offspring SNPs sliding window (stream)")
 
-				if key in offspring_snps.keys():
-					snp = offspring_snps[key] ## snp = [chr,pos,GT,ADref,ADalt,genotype]
+	# Check the window size 
+	if window_size > 1000 :
+		raise ValueError("The maximum of window size is 1Mb (1000 kb) !")
+	elif window_size % 2 != 0:
+		raise ValueError("Please enter a even number to avoid half step when calculting sliding size !")
 
-					# HomoA
-					if snp[2] == "0/0":
-						cur_window[2] += int(snp[3]) # ADref += snp[ADref]
-						cur_window[4] += int(snp[3]) # DP += snp[ADref]
+	snps_window = OrderedDict()
+	offspring_last_snps_chr = OrderedDict()
+	no_snp = [np.empty(0, dtype=np.int64)] * 4
+	offspring_batches = iter(offspring_batches)
+	# batches read before their chromosome (vcf not in the parental order)
+	pending = OrderedDict()
 
-						cur_window[5] += 1 # nbSNPref += 1
-						cur_window[7] += 1 # TOTsnps-window += 1
+	for cur_chr in last_snps_chr.keys():
+		while cur_chr not in pending:
+			batch = next(offspring_batches, None)
+			if batch is None:
+				break
+			pending[batch[0]] = batch
 
-					# HeteAB
-					if snp[2] == "0/1":
-						cur_window[2] += int(snp[3]) # ADref += snp[ADref]
-						cur_window[4] += int(snp[3]) # DP += snp[ADref]
-						cur_window[5] += 1 # nbSNPref += 1
+		columns = no_snp
+		if cur_chr in pending:
+			columns, offspring_last_snps_chr[cur_chr] = pending.pop(cur_chr)[1:]
 
-						cur_window[3] += int(snp[4]) # ADalt += snp[ADalt]
-						cur_window[4] += int(snp[4]) # DP += snp[ADalt]
-						cur_window[6] += 1 # nbSNPalt += 1
+		starts, stops = SlidingWindowBorders(int(chr_len[cur_chr]), window_size)
+		sums = SumOffspringSnpsWindows(*columns, starts, stops)
 
-						cur_window[7] += 1 # TOTsnps-window += 1
+		for num_win, (start, stop, window_sums) in enumerate(zip(starts.tolist(), \
+				stops.tolist(), sums.tolist()), start=1):
+			snps_window[cur_chr  + "_" + str(num_win)] = [start, stop] + window_sums
 
-					# HomoB
-					if snp[2] == "1/1":
-						cur_window[3] += int(snp[4]) # ADalt += snp[ADalt]
-						cur_window[4] += int(snp[4]) # DP += snp[ADalt]
+	return snps_window, offspring_last_snps_chr
 
-						cur_window[6] += 1 # nbSNPalt += 1
-						cur_window[7] += 1 # TOTsnps-window += 1
-			
-			snps_window[cur_chr  + "_" + str(num_win)] = cur_window
+#==============================================================================
 
-	return snps_window
+def ParentalSlidingWindowPyramid(chr_len:OrderedDict, parental_snps:OrderedDict, \
+	last_snps_chr:OrderedDict, window_sizes:list=None):
+	"""
+	Description:	determine the number of SNPs in each sliding window for 
+					several window sizes from one pass on the SNPs (see 
+					SumSnpsWindowsPyramid()).
+	Input:
+	- chr_len:			length of each chromosome
+	- parental_snps:	first element of the output of ReadParentalVCF()
+	- last_snps_chr:	position of the last SNPs per chromosome
+	- window_sizes:		list of window sizes in kb (default = [10, 100]),
+						the sliding size is half of window size
+	Output: 
+	- snps_windows[window_size] = output of ParentalSlidingWindow() for this
+								window size
+	"""
+	hues.info("Parental SNPs sliding window pyramid")
+	if window_sizes is None:
+		window_sizes = [10, 100]
+
+	# Check the window sizes
+	for window_size in window_sizes:
+		if window_size > 1000 :
+			raise ValueError("The maximum of window size is 1Mb (1000 kb) !")
+		elif window_size % 2 != 0:
+			raise ValueError("Please enter an even number to avoid half step when calculting sliding size !")
+	hues.log("Parental SNPs:\twindow sizes = " + ", ".join(str(window_size) \
+		for window_size in window_sizes) + " kb")
+
+	snps_windows = OrderedDict((window_size, OrderedDict()) for window_size in window_sizes)
+	snps_positions = SnpsPositionsByChr(parental_snps)
+	no_snp = np.empty(0, dtype=np.int64)
+
+	for cur_chr in last_snps_chr.keys():
+		positions = snps_positions.get(cur_chr, no_snp)
+		pyramid = SumSnpsWindowsPyramid(int(chr_len[cur_chr]), positions, \
+			np.ones((len(positions), 1), dtype=np.int64), window_sizes)
+
+		for window_size, (starts, stops, nb_snps) in pyramid.items():
+			hues.log(cur_chr + " (" + str(window_size) + " kb)" + \
+				"\n- number of window:\t\t" + str(len(starts)))
+
+			for num_win, (start, stop, total_snps) in enumerate(zip(starts.tolist(), \
+					stops.tolist(), nb_snps[:, 0].tolist()), start=1):
+				snps_windows[window_size][cur_chr  + "_" + str(num_win)] = [start, stop, total_snps]
+
+	return snps_windows
+
+#==============================================================================
+
+def OffspringSlidingWindowPyramid(chr_len:OrderedDict, offspring_snps:OrderedDict,\
+	last_snps_chr:OrderedDict, window_sizes:list=None):
+	"""
+	Description:	determine the sum of each parameters of all SNPs in the 
+					sliding windows for several window sizes from one pass on 
+					the SNPs (see OffspringSlidingWindow() and 
+					SumSnpsWindowsPyramid()).
+	Input: 
+	- chr_len:			length of each chromosome
+	- offspring_snps:	first element of the output of ReadOffspringVCF()
+						or SnpTable
+	- last_snps_chr:	position of the last SNPs per chromosome
+	- window_sizes:		list of window sizes in kb (default = [10, 100]),
+						the sliding size is half of window size
+	Output:
+	- snps_windows[window_size] = output of OffspringSlidingWindow() for this
+								window size
+	"""
+	hues.info("Offspring SNPs sliding window pyramid")
+	if window_sizes is None:
+		window_sizes = [10, 100]
+
+	# Check the window sizes
+	for window_size in window_sizes:
+		if window_size > 1000 :
+			raise ValueError("The maximum of window size is 1Mb (1000 kb) !")
+		elif window_size % 2 != 0:
+			raise ValueError("Please enter a even number to avoid half step when calculting sliding size !")
+	hues.log("Offspring SNPs:\twindow sizes = " + ", ".join(str(window_size) \
+		for window_size in window_sizes) + " kb")
+
+	snps_windows = OrderedDict((window_size, OrderedDict()) for window_size in window_sizes)
+	snps_columns = OffspringSnpsColumnsByChr(offspring_snps)
+	no_snp = [np.empty(0, dtype=np.int64)] * 4
+
+	for cur_chr in last_snps_chr.keys():
+		positions, ad_ref, ad_alt, gt_codes = snps_columns.get(cur_chr, no_snp)
+		pyramid = SumSnpsWindowsPyramid(int(chr_len[cur_chr]), positions, \
+			OffspringSnpsValues(ad_ref, ad_alt, gt_codes), window_sizes)
+
+		for window_size, (starts, stops, sums) in pyramid.items():
+			hues.log(cur_chr + " (" + str(window_size) + " kb)" + \
+				"\n- number of window:\t\t" + str(len(starts)))
+
+			for num_win, (start, stop, window_sums) in enumerate(zip(starts.tolist(), \
+					stops.tolist(), sums.tolist()), start=1):
+				## [start,stop,ADref,ADalt,DP,nbSNPref,nbSNPalt,TOTsnps-window] 
+				snps_windows[window_size][cur_chr  + "_" + str(num_win)] = [start, stop] + window_sums
+
+	return snps_windows
+
+#==============================================================================
+
+def GenoSnpsWindows(snps_window:OrderedDict, geno_ref:str, geno_alt:str, \
+		ratio_min_homo:float=0.9, depth_division_th:float=1.0):
+	"""
+	Description:	GetGenoWindow() of all windows, computed with one call of
+					GetGenoWindowArray()
+	Input:
+	- snps_window[chr_num-window] = [start, stop, ADref, ADalt, DP]
+	Output:
+	- geno_window[chr_num-window] = [start, stop, ratio_ADref/DP, 
+									ratio_ADalt_DP, prob_homo_ref, prob_hetero,
+									prob_homo_alt, genotype]
+	"""
+	values = list(snps_window.values())
+	ratio_ref, ratio_alt, prob_homo_ref, prob_hetero, prob_homo_alt, geno_codes = \
+		GetGenoWindowArray([value[2] for value in values], [value[3] for value in values],\
+			[value[4] for value in values], ratio_min_homo, depth_division_th)
+	geno_names = GenoNames(geno_ref, geno_alt)
+
+	geno_window = OrderedDict()
+	for key_window, value, ratios_probs, geno_code in zip(snps_window, values, \
+			zip(ratio_ref.tolist(), ratio_alt.tolist(), prob_homo_ref.tolist(), \
+				prob_hetero.tolist(), prob_homo_alt.tolist()), geno_codes.tolist()):
+		geno_window[key_window] = value[:2] + list(ratios_probs) + [geno_names[geno_code]]
+	return geno_window
 
 #==============================================================================
 
@@ -203,7 +585,6 @@ def NormalizeOffspringSlidingWindow(parental_snps_window:OrderedDict, \
 
 	snps_window = OrderedDict() 
 	# snps_window[chr_window] = [start, stop, ADref, ADalt, DP]
-	geno_window = OrderedDict() 
 	# geno_window[chr_window] = [start, stop, ADref/DP, ADalt/DP, probHomoA,probHeteroAB, probHomoB, genotype]
 	nb_window_chr = OrderedDict()
 	# nb_window_chr[chr] = nb_window
@@ -228,7 +609,6 @@ def NormalizeOffspringSlidingWindow(parental_snps_window:OrderedDict, \
 				cur_window = [start, stop, ad_ref, ad_alt, dp]
 									
 			snps_window[key_window] = cur_window
-			geno_window[key_window] = GetGenoWindow(cur_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
 
 			# save the last window of each chromosome in a dictionnary nb_window_chr[chr]=num_last_window
 			chr = key_window.split("_")[0]
@@ -239,13 +619,48 @@ def NormalizeOffspringSlidingWindow(parental_snps_window:OrderedDict, \
 			else:
 				nb_window_chr[chr] = win_id
 
+	geno_window = GenoSnpsWindows(snps_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
+
 	return snps_window, geno_window, nb_window_chr
 
 #==============================================================================
 
+def SmoothWindowsArray(values, smooth_width:int=3, smooth_weights=None):
+	"""
+	Description:	sum the values of each window of a chromosome with the 
+					values of its neighbors: smooth_width windows centered on 
+					the window, cut at the ends of the chromosome.
+	Input:
+	- values:			numpy array of int, one line per window
+	- smooth_width:		odd number of windows summed (default: 3)
+	- smooth_weights:	weight of each of these windows (default: None, all 
+						windows have a weight of 1)
+	Output:
+	- smoothed:	numpy array of int64, same shape as values. Weighted sums 
+				are truncated to int.
+	"""
+	half = smooth_width // 2
+	nb_win = len(values)
+
+	if smooth_weights is None:
+		cumsum = SnpsCumulativeSums(values)
+		num_win = np.arange(nb_win)
+		return cumsum[np.minimum(num_win + half + 1, nb_win)] - cumsum[np.maximum(num_win - half, 0)]
+
+	padding = np.zeros((half,) + values.shape[1:])
+	padded = np.concatenate([padding, values, padding])
+	smoothed = np.zeros(values.shape)
+	for shift, weight in enumerate(smooth_weights):
+		smoothed += weight * padded[shift:shift + nb_win]
+
+	return np.trunc(smoothed).astype(np.int64)
+
+#==============================================================================
+
 def SmoothNormalizedOsffspringSlidingWindow(offspring_snps_window:OrderedDict,\
 		nb_windows_chr:OrderedDict, centromere:OrderedDict, geno_ref:str,\
-		geno_alt:str, ratio_min_homo:float=0.9, depth_division_th:float=1.0):           # modify MY
+		geno_alt:str, ratio_min_homo:float=0.9, depth_division_th:float=1.0, genotype_track:bool=False,\
+		smooth_width:int=3, smooth_weights:list=None):           # modify MY
 	"""
 	Description:	determine the sum of each parameters of all SNPs in the
 					window. Paramaters studied: ADref, ADalt, DP, SNP with at 
@@ -262,6 +677,12 @@ def SmoothNormalizedOsffspringSlidingWindow(offspring_snps_window:OrderedDict,\
 	- geno_alt:	genotype of alternative
 	- ratio_min_homo:	minimum ratio of AD/DP to consider SNPs as homozygous
 	- depth_division_th:   depth division based on window size, default = 1 when window_size = 100 kb              # modify MY
+	- smooth_width:	odd number of windows summed to smooth a window: the 
+					window and its (smooth_width-1)/2 neighbors on each side
+					(default: 3)
+	- smooth_weights:	weight of each of these windows, e.g. [1, 2, 1]. 
+						smooth_width is then len(smooth_weights) (default: 
+						None, same weight for all windows)
 	Output:
 	- snps_window[chr_num-window] = [start, stop, ADref, ADalt, DP]
 	- geno_window[chr_num-window]  = [start, stop, ratio_ADref/DP, ratio_ADalt_DP,
@@ -269,6 +690,7 @@ def SmoothNormalizedOsffspringSlidingWindow(offspring_snps_window:OrderedDict,\
 	- nb_window_chr[chr_num-window] = number of window by chromosome
 	- check_smoothed : allow to check whether smoothing takes into account the right windows
 	check_smoothed[chr_window] = [start_window, stop_window, start_smooth, stop_smooth] 
+	- if genotype_track: GenotypeTrack of geno_window (4th output)
 	Notes: 
 	- All windows overlapping or inside centromeric region are associated 
 	with NA genotype. But to smooth window next to centromeric region, we use 
@@ -280,53 +702,46 @@ def SmoothNormalizedOsffspringSlidingWindow(offspring_snps_window:OrderedDict,\
 	hues.info("Smooth normalized offspring sliding window")
 
 	snps_window = OrderedDict() 
-	geno_window = OrderedDict()
 	nb_window_chr = OrderedDict()
 	check_smoothed = OrderedDict()
 
+	if smooth_weights is not None:
+		smooth_width = len(smooth_weights)
+	if smooth_width < 1 or smooth_width % 2 == 0:
+		raise ValueError("Invalid smooth width. This value must be an odd number !")
+	half = smooth_width // 2
+
 	for cur_chr, nb_win_chr in nb_windows_chr.items():
 		cen_left, cen_right = centromere[cur_chr]
 		nb_window_chr[cur_chr] = nb_win_chr # nb window for each chromosome
 
-		for num_win in range(1, nb_win_chr + 1): 
-			key_window = cur_chr + "_" + str(num_win)
-			start_win_smooth = num_win - 1
-			stop_win_smooth = num_win + 1 
+		keys = [cur_chr + "_" + str(num_win) for num_win in range(1, nb_win_chr + 1)]
+		# Note: Offspring_slidingGenoWindow[chr_num-window] = [start,stop,ADref,ADalt,DP]
+		starts = [int(offspring_snps_window[key][0]) for key in keys]
+		stops = [int(offspring_snps_window[key][1]) for key in keys]
+		values = np.array([[int(value) for value in offspring_snps_window[key][2:5]] \
+			for key in keys], dtype=np.int64).reshape(nb_win_chr, 3)
 
-			if start_win_smooth < 1:
-				start_win_smooth = 1
-			if stop_win_smooth > nb_win_chr:
-				stop_win_smooth = nb_win_chr
+		# windows overlapping or inside the centromeric region are not smoothed (NA)
+		outside_cen = (np.array(stops) <= cen_left) | (np.array(starts) >= cen_right)
+		smoothed = SmoothWindowsArray(values, smooth_width, smooth_weights)
+		smoothed[~outside_cen] = 0
 
-			pos_start_cur_win = int(offspring_snps_window[key_window][0])
-			pos_stop_cur_win = int(offspring_snps_window[key_window][1])
-			# Note: Offspring_slidingGenoWindow[chr_num-window] = [start,stop,ADref,ADalt,DP]
-						
-			cur_window = [pos_start_cur_win, pos_stop_cur_win, 0.0, 0.0, 0.0]
-			# cur_window = [pos_start_cur_win, pos_stop_cur_wind, ADref, ADalt, depth]]
+		for num_win, (key_window, start, stop, sums, outside) in enumerate(zip(keys, \
+				starts, stops, smoothed.tolist(), outside_cen.tolist()), 1):
+			start_win_smooth = max(num_win - half, 1)
+			stop_win_smooth = min(num_win + half, nb_win_chr)
 
 			win = ""
-			for window in range(start_win_smooth, stop_win_smooth + 1):
-				key = cur_chr + "_" + str(window) 
-
-				if pos_stop_cur_win <= cen_left or pos_start_cur_win >= cen_right:
-					cur_window = [pos_start_cur_win, pos_stop_cur_win,\
-		       		int(cur_window[2] + offspring_snps_window[key][2]),\
-					int(cur_window[3] + offspring_snps_window[key][3]),\
-					int(cur_window[4] + offspring_snps_window[key][4])]
-					if win == "" :
-						win = str(window)
-					else:
-						win = win + ":" + str(window)
-				else:
-					cur_window = [pos_start_cur_win, pos_stop_cur_win,\
-		       		int(cur_window[2] + 0), int(cur_window[3] + 0), int(cur_window[4] + 0)]
-			
-			snps_window[key_window] = cur_window
-			
-			geno_window[key_window] = GetGenoWindow(cur_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
-			
-			check_smoothed[key_window] = [pos_start_cur_win, pos_stop_cur_win, \
-				start_win_smooth, stop_win_smooth, win]
+			if outside:
+				win = ":".join(str(window) for window in range(start_win_smooth, stop_win_smooth + 1))
+
+			snps_window[key_window] = [start, stop] + sums
+			check_smoothed[key_window] = [start, stop, start_win_smooth, stop_win_smooth, win]
+
+	geno_window = GenoSnpsWindows(snps_window, geno_ref, geno_alt, ratio_min_homo, depth_division_th)
 
+	if genotype_track:
+		return snps_window, geno_window, check_smoothed, \
+			GenotypeTrack.from_windows(geno_window, nb_windows_chr)
 	return snps_window, geno_window, check_smoothed 
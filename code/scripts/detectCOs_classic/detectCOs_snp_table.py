@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#==============================================================================
+# Program		:	compact storage of the offspring SNPs for detectCOs
+# Version		:	2.0
+# Description	:	SnpTable, the offspring SNPs of ReadOffspringVCF() stored 
+#					in numpy arrays by chromosome, read like the dictionary of 
+#					ReadOffspringVCF() by the sliding windows and the COs
+#==============================================================================
+
+import numpy as np
+from collections import OrderedDict
+from collections.abc import Mapping
+from detectCOs_required_functions import *
+
+#==============================================================================
+
+# Columns of a chromosome in a SnpTable
+POSITION = 0
+GT_CODE = 1
+AD_REF = 2
+AD_ALT = 3
+GENOTYPE_CODE = 4
+
+#==============================================================================
+
+class SnpTable(Mapping):
+	"""
+	Description:	informative offspring SNPs stored by chromosome in numpy
+					arrays sorted by position, instead of a dictionnary of
+					lists keyed by "chr_pos" strings. A SNP is found with a
+					binary search on the positions of its chromosome.
+					The table can still be read as the output of
+					ReadOffspringVCF(): table["Chr1_1234"] returns
+					[chr, pos, GT, ADref, ADalt, genotype], the SNPs are
+					iterated by chromosome and by position.
+	Input:
+	- columns:		columns[chr] = [positions, GT_code, ADref, ADalt,
+					genotype_code] numpy arrays sorted by position (see
+					GT_CODES for GT_code)
+	- genotypes:	list of genotypes, genotype_code is the index of the
+					genotype of the SNP in this list
+	Usage:
+	snp_table = SnpTable.from_dict(offspring_snps, geno_ref, geno_alt)
+	snp_table.find("Chr1", 1234)
+	positions, gt_codes, ad_ref, ad_alt, geno_codes = snp_table.between("Chr1", 1, 10000)
+	"""
+	def __init__(self, columns:OrderedDict, genotypes:list):
+		self.columns = columns
+		self.genotypes = genotypes
+		self.gt_names = {code: gt for gt, code in GT_CODES.items()}
+
+	@classmethod
+	def from_dict(cls, offspring_snps:OrderedDict, geno_ref:str, geno_alt:str):
+		"""
+		Description:	create the table from the output of ReadOffspringVCF()
+		Input:
+		- offspring_snps:	info_snps[chr_pos] = [chr,pos,GT,ADref,ADalt,genotype]
+		- geno_ref: 		reference genotype
+		- geno_alt: 		alternative genotype
+		Output:
+		- SnpTable
+		"""
+		genotypes = [geno_ref, geno_ref + "/" + geno_alt, geno_alt]
+		rows = OrderedDict()
+
+		for snp in offspring_snps.values():
+			if snp[2] not in GT_CODES:
+				raise ValueError("Not informative SNP: " + snp[0] + "_" + str(snp[1]) + \
+					" (GT = " + snp[2] + ")")
+			if snp[5] not in genotypes:
+				genotypes.append(snp[5])
+			rows.setdefault(snp[0], []).append((int(snp[1]), GT_CODES[snp[2]], \
+				int(snp[3]), int(snp[4]), genotypes.index(snp[5])))
+
+		columns = OrderedDict()
+		for cur_chr, chr_rows in rows.items():
+			chr_rows = np.array(chr_rows, dtype=np.int64).reshape(-1, 5)
+			chr_rows = chr_rows[np.argsort(chr_rows[:, POSITION], kind="stable")]
+			columns[cur_chr] = [chr_rows[:, POSITION], chr_rows[:, GT_CODE].astype(np.int8), \
+				chr_rows[:, AD_REF].astype(np.int32), chr_rows[:, AD_ALT].astype(np.int32), \
+				chr_rows[:, GENOTYPE_CODE].astype(np.int16)]
+
+		return cls(columns, genotypes)
+
+	@classmethod
+	def from_batches(cls, offspring_batches, geno_ref:str, geno_alt:str):
+		"""
+		Description:	create the table from the output of StreamOffspringVCF(),
+						the genotype of each SNP is deduced from its GT code.
+		Input:
+		- offspring_batches:	output of StreamOffspringVCF() (generator or list)
+		- geno_ref: 			reference genotype
+		- geno_alt: 			alternative genotype
+		Output:
+		- SnpTable
+		"""
+		genotypes = [geno_ref, geno_ref + "/" + geno_alt, geno_alt]
+		columns = OrderedDict()
+
+		for cur_chr, (positions, ad_ref, ad_alt, gt_codes), last_snp_pos in offspring_batches:
+			# genotypes are in the same order than GT codes (0/0, 0/1, 1/1)
+			columns[cur_chr] = [positions, gt_codes.astype(np.int8), ad_ref.astype(np.int32), \
+				ad_alt.astype(np.int32), gt_codes.astype(np.int16)]
+
+		return cls(columns, genotypes)
+
+	def find(self, chr:str, pos:int):
+		"""
+		Description:	index of the SNP at the position pos of chr
+		Output:			index in the columns of chr, -1 if there is no SNP
+		"""
+		if chr not in self.columns:
+			return -1
+		positions = self.columns[chr][POSITION]
+		index = int(np.searchsorted(positions, pos))
+		if index < len(positions) and positions[index] == pos:
+			return index
+		return -1
+
+	def between(self, chr:str, start:int, stop:int):
+		"""
+		Description:	SNPs of chr between start and stop (included)
+		Output:			[positions, GT_code, ADref, ADalt, genotype_code]
+						views on the columns of chr
+		"""
+		if chr not in self.columns:
+			return [np.empty(0, dtype=dtype) for dtype in \
+				(np.int64, np.int8, np.int32, np.int32, np.int16)]
+		positions = self.columns[chr][POSITION]
+		first = np.searchsorted(positions, start, side="left")
+		last = np.searchsorted(positions, stop, side="right")
+		return [column[first:last] for column in self.columns[chr]]
+
+	def snp(self, chr:str, index:int):
+		"""
+		Description:	SNP of chr at index in the format of ReadOffspringVCF()
+		Output:			[chr, pos, GT, ADref, ADalt, genotype]
+		"""
+		pos, gt_code, ad_ref, ad_alt, geno_code = (int(column[index]) \
+			for column in self.columns[chr])
+		return [chr, pos, self.gt_names[gt_code], str(ad_ref), str(ad_alt), \
+			self.genotypes[geno_code]]
+
+	def columns_by_chr(self):
+		"""
+		Description:	columns used by the sliding windows
+		Output:			columns[chr] = [positions, ADref, ADalt, GT_code] (see
+						OffspringSnpsColumnsByChr())
+		"""
+		return OrderedDict((cur_chr, [columns[POSITION], columns[AD_REF], \
+			columns[AD_ALT], columns[GT_CODE]]) for cur_chr, columns in self.columns.items())
+
+	def __getitem__(self, key:str):
+		chr, _, pos = key.rpartition("_")
+		index = self.find(chr, int(pos)) if pos.isdigit() else -1
+		if index == -1:
+			raise KeyError(key)
+		return self.snp(chr, index)
+
+	def __iter__(self):
+		for cur_chr, columns in self.columns.items():
+			for pos in columns[POSITION].tolist():
+				yield cur_chr + "_" + str(pos)
+
+	def __len__(self):
+		return sum(len(columns[POSITION]) for columns in self.columns.values())
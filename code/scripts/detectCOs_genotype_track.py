@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#==============================================================================
+# Program		:	run-length encoded genotypes of the sliding windows
+# Version		:	2.0
+# Description	:	GenotypeTrack, the genotypes of the windows of each 
+#					chromosome stored as runs, shared by detectCOs_classic 
+#					(IdentifyCOs()) and detectCOs_EMS (IdentifyCOs_snps())
+#==============================================================================
+
+import numpy as np
+from collections import OrderedDict
+
+#==============================================================================
+
+class GenotypeTrack:
+	"""
+	Description:	genotypes of the sliding windows of each chromosome stored
+					as runs of consecutive windows with the same genotype:
+					(start_win, end_win, genotype, start_bp, end_bp). The
+					genotype of a window is found with a binary search on the
+					runs. The borders of each window are kept in numpy arrays
+					to place the COs.
+	Input:
+	- runs:			runs[chr] = [first_wins, last_wins, codes] numpy arrays
+	- borders:		borders[chr] = [starts, stops] numpy arrays of the windows
+					1 to nb_win
+	- names:		names[code] = genotype
+	Usage:
+	track = GenotypeTrack.from_windows(geno_window, nb_windows_chr)
+	track.genotype("Chr1", 12)
+	for start_win, end_win, genotype, start_bp, end_bp in track.runs("Chr1"):
+	for left_win, right_win, left_geno, right_geno in track.transitions("Chr1"):
+	"""
+	def __init__(self, runs:OrderedDict, borders:OrderedDict, names:list):
+		self.runs_by_chr = runs
+		self.borders = borders
+		self.names = names
+
+	@classmethod
+	def from_windows(cls, geno_window:OrderedDict, nb_windows_chr:OrderedDict=None):
+		"""
+		Description:	create the track from the genotypes of the windows
+		Input:
+		- geno_window:		[chr_window] = [start, stop, ..., genotype] (output of
+							SmoothNormalizedOsffspringSlidingWindow())
+		- nb_windows_chr:	number of windows by chromosome, the windows of
+							geno_window by chromosome in their order if None
+		Output:
+		- GenotypeTrack
+		"""
+		if nb_windows_chr is None:
+			keys = OrderedDict()
+			for key in geno_window:
+				keys.setdefault(key.split("_")[0], []).append(key)
+		else:
+			keys = OrderedDict((cur_chr, [cur_chr + "_" + str(num_win) for num_win in \
+				range(1, int(nb_win) + 1)]) for cur_chr, nb_win in nb_windows_chr.items())
+
+		names = []
+		code_of = dict()
+		runs = OrderedDict()
+		borders = OrderedDict()
+		for cur_chr, chr_keys in keys.items():
+			windows = [geno_window[key] for key in chr_keys]
+			for window in windows:
+				if window[-1] not in code_of:
+					code_of[window[-1]] = len(names)
+					names.append(window[-1])
+			codes = np.array([code_of[window[-1]] for window in windows], dtype=np.int32)
+			borders[cur_chr] = [np.array([window[0] for window in windows], dtype=np.int64), \
+				np.array([window[1] for window in windows], dtype=np.int64)]
+
+			# first window of each run (windows are numbered from 1)
+			run_firsts = np.flatnonzero(np.diff(codes) != 0) + 1
+			run_firsts = np.concatenate(([0], run_firsts)) if len(codes) else run_firsts
+			run_lasts = np.append(run_firsts[1:] - 1, len(codes) - 1) if len(codes) else run_firsts
+			runs[cur_chr] = [run_firsts + 1, run_lasts + 1, codes[run_firsts]]
+
+		return cls(runs, borders, names)
+
+	def chromosomes(self):
+		return list(self.runs_by_chr.keys())
+
+	def nb_windows(self, chr:str):
+		return len(self.borders[chr][0])
+
+	def nb_runs(self, chr:str=None):
+		if chr is None:
+			return sum(len(runs[0]) for runs in self.runs_by_chr.values())
+		return len(self.runs_by_chr[chr][0])
+
+	def run_index(self, chr:str, num_win:int):
+		"""
+		Description:	index of the run of the window num_win of chr
+		"""
+		first_wins, last_wins, codes = self.runs_by_chr[chr]
+		index = int(np.searchsorted(last_wins, num_win, side="left"))
+		if index == len(last_wins) or first_wins[index] > num_win:
+			raise KeyError(chr + "_" + str(num_win))
+		return index
+
+	def genotype(self, chr:str, num_win:int):
+		"""
+		Description:	genotype of the window num_win of chr
+		"""
+		return self.names[self.runs_by_chr[chr][2][self.run_index(chr, num_win)]]
+
+	def runs(self, chr:str):
+		"""
+		Description:	runs of chr
+		Output:			iterator of (start_win, end_win, genotype, start_bp, end_bp)
+		"""
+		starts, stops = self.borders[chr]
+		for first_win, last_win, code in zip(*(column.tolist() for column in self.runs_by_chr[chr])):
+			yield first_win, last_win, self.names[code], int(starts[first_win - 1]), \
+				int(stops[last_win - 1])
+
+	def transitions(self, chr:str):
+		"""
+		Description:	genotype changes of chr
+		Output:			iterator of (left_win, right_win, left_geno, right_geno), 
+						left_win is the last window of a run and right_win the
+						first window of the next run
+		"""
+		first_wins, last_wins, codes = (column.tolist() for column in self.runs_by_chr[chr])
+		for index in range(1, len(codes)):
+			yield last_wins[index - 1], first_wins[index], self.names[codes[index - 1]], \
+				self.names[codes[index]]
+
+	def window_arrays(self, chr:str, first_win:int, last_win:int):
+		"""
+		Description:	borders and genotype codes of the windows first_win to
+						last_win (included) of chr, see IdentifyCOs()
+		Output:
+		- starts, stops:	lists
+		- codes:			numpy array
+		- names:			names[code] = genotype
+		"""
+		if chr not in self.borders:
+			raise KeyError(chr + "_" + str(first_win))
+		for num_win in (first_win, last_win):
+			if not 1 <= num_win <= self.nb_windows(chr):
+				raise KeyError(chr + "_" + str(num_win))
+
+		first_wins, last_wins, codes = self.runs_by_chr[chr]
+		codes = np.repeat(codes, last_wins - first_wins + 1)[first_win - 1:last_win]
+		starts, stops = self.borders[chr]
+		return starts[first_win - 1:last_win].tolist(), stops[first_win - 1:last_win].tolist(), \
+			codes, self.names
+
+	def runs_dict(self):
+		"""
+		Description:	runs of all chromosomes, to save them with export_dict_in_file()
+		Output:			runs[chr_run] = [start_win, end_win, start_bp, end_bp, genotype]
+		"""
+		runs = OrderedDict()
+		for cur_chr in self.runs_by_chr:
+			for num_run, (first_win, last_win, genotype, start_bp, end_bp) in enumerate(self.runs(cur_chr)):
+				runs[cur_chr + "_" + str(num_run + 1)] = [first_win, last_win, start_bp, end_bp, genotype]
+		return runs